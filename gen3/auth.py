@@ -1,7 +1,30 @@
+import asyncio
+import base64
+import contextlib
+import hashlib
 import json
+import os
+import threading
+import time
 from requests.auth import AuthBase
 import requests
 
+try:
+    import fcntl
+except ImportError:
+    # file locking isn't available on Windows, the token cache still works but
+    # processes starting at the same time may each request an access token
+    fcntl = None
+
+# Number of seconds before the access token's expiration at which we proactively
+# request a new one, so in-flight requests don't race the expiration
+DEFAULT_EXPIRATION_MARGIN = 60
+
+# Suggested location for the on-disk access token cache shared between processes
+DEFAULT_TOKEN_CACHE_FILE = os.path.join(
+    os.path.expanduser("~"), ".gen3", "token_cache.json"
+)
+
 
 class Gen3AuthError(Exception):
     pass
@@ -12,12 +35,20 @@ class Gen3Auth(AuthBase):
 
     Implements requests.auth.AuthBase in order to support JWT authentication.
     Generates access tokens from the provided refresh token file or string.
-    Automatically refreshes access tokens when they expire.
+    Automatically refreshes access tokens shortly before they expire, based on
+    the ``exp`` claim of the access token. Instances can be shared between
+    threads, only one of them requests a new access token at a time.
 
     Args:
         endpoint (str): The URL of the data commons.
         refresh_file (str): The file containing the downloaded json web token.
         refresh_token (str): The json web token.
+        expiration_margin (int): Number of seconds before the access token
+            expires at which a new access token is requested.
+        token_cache_file (str): Optional file where access tokens are shared
+            between processes using the same credentials, for example
+            ``DEFAULT_TOKEN_CACHE_FILE``. A valid cached access token is used
+            instead of requesting a new one.
 
     Examples:
         This generates the Gen3Auth class pointed at the sandbox commons while
@@ -25,9 +56,24 @@ class Gen3Auth(AuthBase):
 
         >>> auth = Gen3Auth("https://nci-crdc-demo.datacommons.io", refresh_file="credentials.json")
 
+        This shares access tokens between all the processes of a tool.
+
+        >>> auth = Gen3Auth(
+        ...     "https://nci-crdc-demo.datacommons.io",
+        ...     refresh_file="credentials.json",
+        ...     token_cache_file=DEFAULT_TOKEN_CACHE_FILE,
+        ... )
+
     """
 
-    def __init__(self, endpoint, refresh_file=None, refresh_token=None):
+    def __init__(
+        self,
+        endpoint,
+        refresh_file=None,
+        refresh_token=None,
+        expiration_margin=DEFAULT_EXPIRATION_MARGIN,
+        token_cache_file=None,
+    ):
         if not refresh_file and not refresh_token:
             raise ValueError(
                 "Either parameter 'refresh_file' or parameter 'refresh_token' must be specified."
@@ -53,7 +99,20 @@ class Gen3Auth(AuthBase):
                 )
 
         self._access_token = None
+        self._access_token_expiration = None
+        self._expiration_margin = expiration_margin
         self._endpoint = endpoint
+        self._token_cache_file = token_cache_file
+        self._refresh_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_refresh_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._refresh_lock = threading.Lock()
 
     def __call__(self, request):
         """Adds authorization header to the request
@@ -90,7 +149,7 @@ class Gen3Auth(AuthBase):
         # copy the request to resend
         newreq = response.request.copy()
 
-        self._access_token = None
+        self._expire_access_token(response.request.headers.get("Authorization"))
         newreq.headers["Authorization"] = self._get_auth_value()
 
         _response = response.connection.send(newreq, **kwargs)
@@ -99,22 +158,195 @@ class Gen3Auth(AuthBase):
 
         return _response
 
+    def _expire_access_token(self, auth_value=None):
+        """Forgets the current access token so the next request gets a new one.
+
+        Args:
+            auth_value (str): The Authorization header value of the failed request.
+                If another thread already replaced that token, nothing is expired
+                so concurrent failures only trigger one refresh.
+
+        """
+        with self._refresh_lock:
+            if auth_value and auth_value != "Bearer {}".format(self._access_token):
+                return
+
+            if self._token_cache_file and self._access_token:
+                # don't let other processes reuse a token the services rejected
+                with _locked_token_cache(self._token_cache_file) as tokens:
+                    if tokens.get(self._token_cache_key()) == self._access_token:
+                        del tokens[self._token_cache_key()]
+
+            self._access_token = None
+            self._access_token_expiration = None
+
+    def _access_token_is_valid(self):
+        """Returns whether the cached access token can still be used.
+
+        Tokens without a readable ``exp`` claim are considered valid until
+        a request fails with 401/403.
+
+        """
+        if not self._access_token:
+            return False
+
+        if self._access_token_expiration is None:
+            return True
+
+        return time.time() + self._expiration_margin < self._access_token_expiration
+
     def _get_auth_value(self):
         """Returns the Authorization header value for the request
 
         This gets called when added the Authorization header to the request.
-        This fetches the access token from the refresh token if the access token is missing.
+        This fetches the access token from the refresh token if the access token
+        is missing or about to expire. Callers waiting on a refresh reuse its
+        result instead of requesting their own access token.
 
         """
-        if not self._access_token:
-            auth_url = "{}/user/credentials/cdis/access_token".format(self._endpoint)
+        with self._refresh_lock:
+            if not self._access_token_is_valid():
+                if self._token_cache_file:
+                    self._load_access_token_from_cache()
+                else:
+                    self._refresh_access_token()
+
+            return "Bearer " + self._access_token
+
+    async def async_get_auth_value(self):
+        """Returns the Authorization header value for asynchronous requests
+
+        The asynchronous clients call this since aiohttp doesn't support
+        requests' auth hooks. The event loop is only left when a new access
+        token is needed.
+
+        """
+        access_token = self._access_token
+        if access_token and self._access_token_is_valid():
+            return "Bearer " + access_token
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._get_auth_value)
+
+    def _token_cache_key(self):
+        """Returns the key of this endpoint and refresh token in the token cache.
+
+        The API key itself is never written to the cache, only its key id.
+
+        """
+        key_id = None
+        if isinstance(self._refresh_token, dict):
+            key_id = self._refresh_token.get("key_id")
+        if not key_id:
+            key_id = hashlib.sha256(
+                json.dumps(self._refresh_token, sort_keys=True).encode("utf-8")
+            ).hexdigest()
+        return "{}|{}".format(self._endpoint.rstrip("/"), key_id)
+
+    def _load_access_token_from_cache(self):
+        """Uses the cached access token, or requests one and caches it.
+
+        The cache file stays locked while requesting the access token, so
+        processes starting at the same time wait for the first one instead of
+        all requesting access tokens. Must be called while holding
+        ``_refresh_lock``.
+
+        """
+        key = self._token_cache_key()
+        with _locked_token_cache(self._token_cache_file) as tokens:
+            if tokens.get(key):
+                self._set_access_token(tokens[key])
+
+            if not self._access_token_is_valid():
+                self._refresh_access_token()
+                if self._access_token_expiration is not None:
+                    tokens[key] = self._access_token
+
+            now = time.time()
+            for cached_key, token in list(tokens.items()):
+                if decode_token(token).get("exp", now) <= now:
+                    del tokens[cached_key]
+
+    def _set_access_token(self, access_token):
+        self._access_token = access_token
+        self._access_token_expiration = decode_token(access_token).get("exp")
+
+    def _refresh_access_token(self):
+        """Exchanges the refresh token for a new access token.
+
+        Must be called while holding ``_refresh_lock``.
+
+        """
+        auth_url = "{}/user/credentials/cdis/access_token".format(self._endpoint)
+        try:
+            access_token = requests.post(auth_url, json=self._refresh_token).json()[
+                "access_token"
+            ]
+        except Exception as e:
+            raise Gen3AuthError(
+                "Failed to authenticate to {}\n{}".format(auth_url, str(e))
+            )
+        self._set_access_token(access_token)
+
+
+@contextlib.contextmanager
+def _locked_token_cache(token_cache_file):
+    """Holds an exclusive lock on the token cache file and yields its content.
+
+    Changes made to the yielded dict are written back before the lock is
+    released. The file is only readable by its owner since it holds credentials.
+
+    Args:
+        token_cache_file (str): path to the token cache file
+
+    Yields:
+        dict: cache key to access token
+
+    """
+    cache_dir = os.path.dirname(os.path.abspath(token_cache_file))
+    os.makedirs(cache_dir, exist_ok=True)
+
+    with open(token_cache_file + ".lock", "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
             try:
-                self._access_token = requests.post(
-                    auth_url, json=self._refresh_token
-                ).json()["access_token"]
-            except Exception as e:
-                raise Gen3AuthError(
-                    "Failed to authenticate to {}\n{}".format(auth_url, str(e))
-                )
+                with open(token_cache_file) as cache:
+                    tokens = json.load(cache)
+            except (OSError, ValueError):
+                tokens = {}
+            original_tokens = dict(tokens)
+
+            yield tokens
 
-        return "Bearer " + self._access_token
+            if tokens != original_tokens:
+                tmp_file = "{}.{}.tmp".format(token_cache_file, os.getpid())
+                fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "w") as cache:
+                    json.dump(tokens, cache)
+                os.replace(tmp_file, token_cache_file)
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def decode_token(token):
+    """Returns the claims of a JWT without verifying its signature.
+
+    The SDK only uses the claims to decide when to refresh a token, the
+    services verify the signature.
+
+    Args:
+        token (str): The encoded json web token.
+
+    Returns:
+        dict: the token claims, or an empty dict if the token can't be decoded
+
+    """
+    try:
+        payload = token.split(".")[1]
+        # restore the base64 padding that JWTs strip
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload.encode("utf-8")))
+    except Exception:
+        return {}
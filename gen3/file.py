@@ -1,5 +1,6 @@
 import json
-import requests
+
+from gen3.session import get_default_session
 
 
 class Gen3FileError(Exception):
@@ -15,6 +16,8 @@ class Gen3File:
     Args:
         endpoint (str): The URL of the data commons.
         auth_provider (Gen3Auth): A Gen3Auth class instance.
+        session (requests.Session): Optional session to send requests with,
+            defaults to the pooled session shared by the SDK classes.
 
     Examples:
         This generates the Gen3File class pointed at the sandbox commons while
@@ -26,9 +29,10 @@ class Gen3File:
 
     """
 
-    def __init__(self, endpoint, auth_provider):
+    def __init__(self, endpoint, auth_provider, session=None):
         self._auth_provider = auth_provider
         self._endpoint = endpoint
+        self._session = session or get_default_session()
 
     def get_presigned_url(self, guid, protocol="http"):
         """Generates a presigned URL for a file.
@@ -47,7 +51,7 @@ class Gen3File:
         api_url = "{}/user/data/download/{}?protocol={}".format(
             self._endpoint, guid, protocol
         )
-        output = requests.get(api_url, auth=self._auth_provider).text
+        output = self._session.get(api_url, auth=self._auth_provider).text
         try:
             data = json.loads(output)
         except:
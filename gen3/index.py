@@ -1,12 +1,27 @@
 import aiohttp
+import asyncio
 import backoff
+import collections
+import concurrent.futures
+import copy
+import itertools
+import json
 import requests
 import urllib.parse
 import logging
 import sys
+import threading
+import time
 
 import indexclient.client as client
 
+from gen3.session import (
+    DEFAULT_ASYNC_CONNECTION_LIMIT,
+    async_request,
+    create_async_session,
+    get_default_session,
+)
+
 
 def __log_backoff_retry(details):
     args_str = ", ".join(map(str, details["args"]))
@@ -45,6 +60,123 @@ BACKOFF_SETTINGS = {
     "max_tries": 2,
 }
 
+# Default number of seconds to wait on indexd before giving up on a request
+DEFAULT_TIMEOUT = 60
+
+# Number of dids sent in each request to indexd's bulk/documents endpoint, and the
+# maximum number of those requests sent at once
+BULK_DOCUMENTS_BATCH_SIZE = 500
+BULK_DOCUMENTS_MAX_CONCURRENT_REQUESTS = 8
+
+# Default number of seconds records stay in a Gen3Index cache
+DEFAULT_CACHE_TTL = 300
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "maxsize", "currsize"]
+)
+
+
+class _PooledIndexClient(client.IndexClient):
+    """
+    IndexClient sending its requests through a pooled requests.Session instead
+    of opening a new connection for every request.
+    """
+
+    def __init__(self, baseurl, version="v0", auth=None, session=None):
+        super().__init__(baseurl, version=version, auth=auth)
+        self.session = session or get_default_session()
+
+    # retried right away like the requests of IndexClient
+    @backoff.on_exception(
+        backoff.constant,
+        requests.exceptions.ReadTimeout,
+        max_tries=client.MAX_RETRIES,
+        interval=0,
+    )
+    def _request(self, method, *path, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        resp = self.session.request(method, self.url_for(*path), **kwargs)
+        client.handle_error(resp)
+        return resp
+
+    def _get(self, *path, **kwargs):
+        return self._request("GET", *path, **kwargs)
+
+    def _post(self, *path, **kwargs):
+        return self._request("POST", *path, **kwargs)
+
+    def _put(self, *path, **kwargs):
+        return self._request("PUT", *path, **kwargs)
+
+    def _delete(self, *path, **kwargs):
+        return self._request("DELETE", *path, **kwargs)
+
+
+class _RecordCache:
+    """
+    Bounded read-through cache of index records, evicting the least recently
+    used entries and the ones older than ttl seconds.
+
+    Keys are tuples of (method name, guid, *other arguments). Values are copied
+    in and out so callers can't modify cached records, and empty results are
+    not cached so records created later are found.
+    """
+
+    _VERSION_METHODS = ("get_latest_version", "get_versions")
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # incremented by every invalidation so that a read racing with a write
+        # doesn't put the record as it was before the write back in the cache
+        self._generation = 0
+
+    def get_or_read(self, key, read):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (entry[0] is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self._entries.pop(key, None)
+            self.misses += 1
+            generation = self._generation
+
+        value = read()
+
+        if value:
+            expiration = time.monotonic() + self.ttl if self.ttl else None
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (expiration, copy.deepcopy(value))
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, guid):
+        """
+        Drop the entries of the given guid. Version lookups of every guid are
+        dropped as well since the guid may be a version of them.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                if key[1] == guid or key[0] in self._VERSION_METHODS:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
 
 class Gen3Index:
     """
@@ -54,6 +186,14 @@ class Gen3Index:
     Args:
         endpoint (str): The URL of the data commons.
         auth_provider (Gen3Auth): A Gen3Auth class instance.
+        session (requests.Session): Optional session to send requests with,
+            defaults to the pooled session shared by the SDK classes.
+        cache_size (int): Optional maximum number of results of get,
+            get_record, get_latest_version and get_versions to cache. Writes
+            through this instance invalidate the affected entries; writes by
+            other clients are only seen once entries expire.
+        cache_ttl (float): number of seconds cached results stay valid, None
+            to only evict the least recently used results.
 
     Examples:
         This generates the Gen3Index class pointed at the sandbox commons while
@@ -65,17 +205,49 @@ class Gen3Index:
 
     """
 
-    def __init__(self, endpoint, auth_provider=None, service_location="index"):
-        endpoint = endpoint.strip("/")
-        # if running locally, indexd is deployed by itself without a location relative
-        # to the commons
-        if "http://localhost" in endpoint:
-            service_location = ""
+    def __init__(
+        self,
+        endpoint,
+        auth_provider=None,
+        service_location="index",
+        session=None,
+        cache_size=0,
+        cache_ttl=DEFAULT_CACHE_TTL,
+    ):
+        endpoint = _get_index_url(endpoint, service_location)
+        self.client = _PooledIndexClient(endpoint, auth=auth_provider, session=session)
+        self._cache = _RecordCache(cache_size, cache_ttl) if cache_size else None
+
+    ### Cache
+    def cache_info(self):
+        """
+
+        Get the statistics of the record cache
+
+        Returns:
+            CacheInfo: named tuple of hits, misses, maxsize and currsize, None if
+            the cache is disabled
+
+        """
+        return self._cache.info() if self._cache else None
+
+    def clear_cache(self):
+        """
+
+        Remove all the records from the cache
+
+        """
+        if self._cache:
+            self._cache.clear()
 
-        if not endpoint.endswith(service_location):
-            endpoint += "/" + service_location
+    def _cached(self, key, read):
+        if self._cache is None:
+            return read()
+        return self._cache.get_or_read(key, read)
 
-        self.client = client.IndexClient(endpoint, auth=auth_provider)
+    def _invalidate_cache(self, guid):
+        if self._cache:
+            self._cache.invalidate(guid)
 
     ### Get Requests
     def is_healthy(self):
@@ -119,44 +291,86 @@ class Gen3Index:
 
         Get a list of all records
 
+        This keeps every record in memory, use iter_all_records to process
+        large indexes.
+
         """
-        all_records = []
-        url = "index/index/"
+        if paginate:
+            return list(self.iter_all_records(limit=limit, start=start))
 
-        if limit:
-            url += f"?limit={limit}"
+        return self._get_records_after(start=start, limit=limit)
 
-        response = self.client._get(url)
-        response.raise_for_status()
+    def iter_all_records(
+        self, limit=None, start=None, yield_pages=False, prefetch=False
+    ):
+        """
+
+        Iterate over all records, requesting one page at a time
+
+        Pages are requested with the did of the last record received as the
+        `start` cursor, so memory use doesn't grow with the size of the index.
+
+        Args:
+            limit (int): number of records per page, indexd's default if None
+            start (str): only return records whose did comes after this one
+            yield_pages (bool): yield lists of records, one per page, instead of
+                single records
+            prefetch (bool): request the next page in the background while the
+                current one is being consumed
+
+        Yields:
+            dict/List[dict]: json representing index records, or pages of them
+
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            if prefetch:
+                next_page = executor.submit(self._get_records_after, start, limit)
+            else:
+                next_page = None
+
+            while True:
+                if next_page:
+                    records = next_page.result()
+                else:
+                    records = self._get_records_after(start, limit)
+
+                if not records:
+                    return
 
-        records = response.json().get("records")
-        all_records.extend(records)
+                is_last_page = limit and len(records) < limit
+                start = records[-1].get("did")
+                if prefetch and not is_last_page:
+                    next_page = executor.submit(self._get_records_after, start, limit)
+                else:
+                    next_page = None
 
-        if paginate and records:
-            previous_did = None
-            start_did = records[-1].get("did")
+                if yield_pages:
+                    yield records
+                else:
+                    yield from records
 
-            while start_did != previous_did:
-                previous_did = start_did
+                if is_last_page:
+                    return
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    def _get_records_after(self, start=None, limit=None):
+        """
 
-                params = {"start": f"{start_did}"}
-                url_parts = list(urllib.parse.urlparse(url))
-                query = dict(urllib.parse.parse_qsl(url_parts[4]))
-                query.update(params)
+        Get the page of records whose dids come right after the given one
 
-                url_parts[4] = urllib.parse.urlencode(query)
+        """
+        params = {}
 
-                url = urllib.parse.urlunparse(url_parts)
-                response = self.client._get(url)
-                response.raise_for_status()
+        if limit:
+            params["limit"] = limit
 
-                records = response.json().get("records")
-                all_records.extend(records)
+        if start is not None:
+            params["start"] = start
 
-                if records:
-                    start_did = response.json().get("records")[-1].get("did")
+        response = self.client._get("index/", params=params)
+        response.raise_for_status()
 
-        return all_records
+        return response.json().get("records")
 
     @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
     def get_records_on_page(self, limit=None, page=None):
@@ -186,6 +400,9 @@ class Gen3Index:
         """
         Asynchronous function to request a page from indexd.
 
+        This opens a new connection pool for every page, use AsyncGen3Index
+        to request many pages.
+
         Args:
             page (int/str): indexd page to request
 
@@ -224,6 +441,11 @@ class Gen3Index:
                 - *optional* Specify if we want distributed dist_resolution or not
 
         """
+        return self._cached(
+            ("get", guid, dist_resolution), lambda: self._get(guid, dist_resolution)
+        )
+
+    def _get(self, guid, dist_resolution):
         rec = self.client.global_get(guid, dist_resolution)
 
         if not rec:
@@ -259,6 +481,9 @@ class Gen3Index:
         Get the metadata associated with a given id
 
         """
+        return self._cached(("get_record", guid), lambda: self._get_record(guid))
+
+    def _get_record(self, guid):
         rec = self.client.get(guid)
 
         if not rec:
@@ -299,6 +524,12 @@ class Gen3Index:
                 - *optional* exclude entries without a version
 
         """
+        return self._cached(
+            ("get_latest_version", guid, has_version),
+            lambda: self._get_latest_version(guid, has_version),
+        )
+
+    def _get_latest_version(self, guid, has_version):
         rec = self.client.get_latest_version(guid, has_version)
 
         if not rec:
@@ -318,6 +549,9 @@ class Gen3Index:
                 - record id
 
         """
+        return self._cached(("get_versions", guid), lambda: self._get_versions(guid))
+
+    def _get_versions(self, guid):
         response = self.client._get(f"/index/index/{guid}/versions")
         response.raise_for_status()
         versions = response.json()
@@ -473,36 +707,117 @@ class Gen3Index:
         )
         response.raise_for_status()
         rec = response.json()
+        self._invalidate_cache(guid)
 
         if rec and "did" in rec:
             return self.get_record(rec["did"])
         return None
 
-    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
-    def get_records(self, dids):
+    def get_records(
+        self,
+        dids,
+        batch_size=BULK_DOCUMENTS_BATCH_SIZE,
+        max_concurrent_requests=BULK_DOCUMENTS_MAX_CONCURRENT_REQUESTS,
+        return_missing=False,
+    ):
         """
 
         Get a list of documents given a list of dids
 
+        The dids are split into batches requested concurrently, see iter_records.
+
         Args:
             dids: list
                  - a list of record ids
+            batch_size (int): number of dids per request
+            max_concurrent_requests (int): maximum number of requests sent at once
+            return_missing (bool): also return the dids indexd doesn't have
 
         Returns:
-            list: json representing index records
+            list: json representing index records, in the order of the dids, or
+                None if indexd has none of the dids
+            (list, list): records and missing dids, if return_missing
+
+        """
+        records = []
+        missing_dids = []
+        for batch_records, batch_missing_dids in self.iter_records(
+            dids, batch_size, max_concurrent_requests
+        ):
+            records.extend(batch_records)
+            missing_dids.extend(batch_missing_dids)
+
+        if return_missing:
+            return records, missing_dids
+        if missing_dids and not records:
+            # what a single bulk request returned when indexd answered 404
+            return None
+        return records
+
+    def iter_records(
+        self,
+        dids,
+        batch_size=BULK_DOCUMENTS_BATCH_SIZE,
+        max_concurrent_requests=BULK_DOCUMENTS_MAX_CONCURRENT_REQUESTS,
+    ):
+        """
+
+        Iterate over the documents of the given dids, one batch at a time
+
+        Batches are requested concurrently but yielded in the order of the dids,
+        as soon as they and the batches before them are received. Only
+        max_concurrent_requests batches are in memory at once, so `dids` can
+        be a generator over more dids than fit in memory.
+
+        Args:
+            dids: iterable
+                 - record ids
+            batch_size (int): number of dids per request
+            max_concurrent_requests (int): maximum number of requests sent at once
+
+        Yields:
+            (list, list): json representing the index records of a batch, in the
+            order of the dids, and the dids of the batch indexd doesn't have
+
+        """
+        dids = iter(dids)
+        batches = iter(lambda: list(itertools.islice(dids, batch_size)), [])
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrent_requests
+        ) as executor:
+            pending = collections.deque(
+                executor.submit(self._get_records_batch, batch)
+                for batch in itertools.islice(batches, max_concurrent_requests)
+            )
+            while pending:
+                result = pending.popleft().result()
+                for batch in itertools.islice(batches, 1):
+                    pending.append(executor.submit(self._get_records_batch, batch))
+                yield result
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    def _get_records_batch(self, dids):
+        """
+
+        Get the documents of a batch of dids in a single bulk request
+
+        Returns:
+            (list, list): records in the order of the dids, and missing dids
 
         """
         try:
             response = self.client._post(
                 "bulk/documents", json=dids, auth=self.client.auth
             )
+            records = response.json()
         except requests.HTTPError as exception:
             if exception.response.status_code == 404:
-                return None
+                records = []
             else:
                 raise exception
 
-        return response.json()
+        return _order_records_by_dids(records, dids)
 
     ### Put Requests
 
@@ -532,6 +847,7 @@ class Gen3Index:
         )
         response.raise_for_status()
         rec = response.json()
+        self._invalidate_cache(guid)
 
         return self.get_record(rec["did"])
 
@@ -557,6 +873,8 @@ class Gen3Index:
              body: json/dictionary format
                  - index record information that needs to be updated.
                  - can not update size or hash, use new version for that
+                 - fields that are None are left unchanged, so an empty list
+                   clears a field
 
         """
         updatable_attrs = {
@@ -570,9 +888,10 @@ class Gen3Index:
         }
         rec = self.client.get(guid)
         for k, v in updatable_attrs.items():
-            if v:
+            if v is not None:
                 exec(f"rec.{k} = v")
         rec.patch()
+        self._invalidate_cache(guid)
         return rec.to_json()
 
     ### Delete Requests
@@ -592,8 +911,573 @@ class Gen3Index:
         """
         rec = self.client.get(guid)
         rec.delete()
+        self._invalidate_cache(guid)
+        return rec
+
+
+class AsyncGen3Index:
+    """
+
+    Asynchronous client for the Gen3 Index services.
+
+    Offers the record and bulk methods of Gen3Index as coroutines, with the same
+    backoff settings, so many records can be read and written concurrently from
+    one process. All requests share one aiohttp session and connection pool,
+    which is closed when leaving the context manager or calling `close`.
+
+    Args:
+        endpoint (str): The URL of the data commons.
+        auth_provider (Gen3Auth): A Gen3Auth class instance, or a
+            (username, password) tuple for indexd basic auth.
+        limit (int): Maximum number of simultaneous connections to indexd.
+        ssl: ssl setting for aiohttp requests, None for default ssl handling or
+            False to skip certificate verification.
+        limiter (AdaptiveConcurrencyLimiter): Limiter every request, including
+            retries, waits for, to adapt the number of concurrent requests to
+            how indexd copes. The connection pool then grows up to the
+            `max_limit` of the limiter instead of `limit`.
+
+    Examples:
+        This requests the first 10 pages of records concurrently.
+
+        >>> async with AsyncGen3Index(endpoint, limit=10) as index:
+        ...     pages = await asyncio.gather(
+        ...         *(index.get_records_on_page(limit=1024, page=page) for page in range(10))
+        ...     )
+
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        auth_provider=None,
+        service_location="index",
+        limit=DEFAULT_ASYNC_CONNECTION_LIMIT,
+        ssl=None,
+        limiter=None,
+    ):
+        self.url = _get_index_url(endpoint, service_location)
+        self._auth_provider = auth_provider
+        self._limit = limit if limiter is None else limiter.max_limit
+        self._ssl = ssl
+        self._limiter = limiter
+        self._session = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+
+        Close the session and its connections
+
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = create_async_session(limit=self._limit)
+        return self._session
+
+    async def _request(self, method, path, params=None, authenticate=False, **kwargs):
+        """
+        Send a request to indexd and return the decoded json response.
+
+        Raises:
+            aiohttp.ClientResponseError: if indexd responds with an error status
+        """
+        url = "{}/{}".format(self.url, path.lstrip("/"))
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+
+        if self._limiter is None:
+            return await self._send(method, url, authenticate, **kwargs)
+        async with self._limiter.request():
+            return await self._send(method, url, authenticate, **kwargs)
+
+    async def _send(self, method, url, authenticate, **kwargs):
+        response, text = await async_request(
+            self._get_session(),
+            method,
+            url,
+            auth_provider=self._auth_provider if authenticate else None,
+            ssl=self._ssl,
+            **kwargs,
+        )
+        response.raise_for_status()
+        return json.loads(text) if text else None
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def get_stats(self):
+        """
+
+        Return basic info about the records in indexd
+
+        """
+        return await self._request("GET", "_stats")
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def get_records_on_page(self, limit=None, page=None):
+        """
+
+        Get a list of all records given the page and page size limit
+
+        Args:
+            limit (int): number of records per page
+            page (int/str): indexd page to request
+
+        Returns:
+            List[dict]: List of indexd records from the page
+
+        """
+        params = {}
+
+        if limit is not None:
+            params["limit"] = limit
+
+        if page is not None:
+            params["page"] = page
+
+        response = await self._request("GET", "index", params=params)
+        return response.get("records")
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def get_records_after(self, start=None, limit=None):
+        """
+
+        Get the page of records whose dids come right after the given one
+
+        Args:
+            start (str): did of the last record already received, None to
+                start from the beginning of the index
+            limit (int): number of records per page
+
+        Returns:
+            List[dict]: List of indexd records sorted by did
+
+        """
+        params = {}
+
+        if limit:
+            params["limit"] = limit
+
+        if start is not None:
+            params["start"] = start
+
+        response = await self._request("GET", "index", params=params)
+        return response.get("records")
+
+    async def iter_records_in_range(self, start=None, end=None, limit=None):
+        """
+
+        Iterate over the pages of records whose did is in the (start, end] range
+
+        Pages are requested with `start` cursors, so the cost of a request
+        doesn't depend on how deep into the index the range is. Ranges from
+        split_did_keyspace can be walked concurrently to scan the whole index.
+
+        Args:
+            start (str): exclusive lower bound, None for the beginning of the index
+            end (str): inclusive upper bound, None for the end of the index
+            limit (int): number of records per page
+
+        Yields:
+            List[dict]: pages of indexd records sorted by did
+
+        """
+        while True:
+            records = await self.get_records_after(start=start, limit=limit)
+            in_range = [
+                record for record in records if end is None or record["did"] <= end
+            ]
+            if in_range:
+                yield in_range
+
+            if len(in_range) < len(records) or not records:
+                return
+            if limit and len(records) < limit:
+                return
+
+            start = records[-1]["did"]
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def get_version(self):
+        """
+
+        Return the version of indexd
+
+        """
+        return await self._request("GET", "_version")
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def get(self, guid, dist_resolution=True):
+        """
+
+        Get the metadata associated with the given id, alias, or
+        distributed identifier
+
+        Args:
+             guid: string
+                 - record id
+             dist_resolution: boolean
+                - *optional* Specify if we want distributed dist_resolution or not
+
+        """
+        params = None if dist_resolution else {"no_dist": ""}
+        return await self._request_or_none("GET", guid, params=params)
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def get_record(self, guid):
+        """
+
+        Get the metadata associated with a given id
+
+        """
+        return await self._request_or_none("GET", f"index/{guid}")
+
+    async def get_records(
+        self,
+        dids,
+        batch_size=BULK_DOCUMENTS_BATCH_SIZE,
+        max_concurrent_requests=BULK_DOCUMENTS_MAX_CONCURRENT_REQUESTS,
+        return_missing=False,
+    ):
+        """
+
+        Get a list of documents given a list of dids
+
+        The dids are split into batches requested concurrently.
+
+        Args:
+            dids: list
+                 - a list of record ids
+            batch_size (int): number of dids per request
+            max_concurrent_requests (int): maximum number of requests sent at once
+            return_missing (bool): also return the dids indexd doesn't have
+
+        Returns:
+            list: json representing index records, in the order of the dids
+            (list, list): records and missing dids, if return_missing
+
+        """
+        lock = asyncio.Semaphore(max_concurrent_requests)
+
+        async def _get_batch(batch):
+            async with lock:
+                return await self._get_records_batch(batch)
+
+        dids = list(dids)
+        results = await asyncio.gather(
+            *(
+                _get_batch(dids[i : i + batch_size])
+                for i in range(0, len(dids), batch_size)
+            )
+        )
+
+        records = [record for batch, _ in results for record in batch]
+        if return_missing:
+            return records, [did for _, missing in results for did in missing]
+        return records
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def _get_records_batch(self, dids):
+        records = await self._request_or_none(
+            "POST", "bulk/documents", json=dids, authenticate=True
+        )
+        return _order_records_by_dids(records or [], dids)
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def create_record(
+        self,
+        hashes,
+        size,
+        did=None,
+        urls=None,
+        file_name=None,
+        metadata=None,
+        baseid=None,
+        acl=None,
+        urls_metadata=None,
+        version=None,
+        authz=None,
+    ):
+        """
+
+        Create a new record and add it to the index
+
+        Args:
+            hashes (dict): {hash type: hash value,}
+                eg ``hashes={'md5': ab167e49d25b488939b1ede42752458b'}``
+            size (int): file size metadata associated with a given uuid
+            did (str): provide a UUID for the new indexd to be made
+            urls (list): list of URLs where you can download the UUID
+            acl (list): access control list
+            authz (str): RBAC string
+            file_name (str): name of the file associated with a given UUID
+            metadata (dict): additional key value metadata for this entry
+            urls_metadata (dict): metadata attached to each url
+            baseid (str): optional baseid to group with previous entries versions
+            version (str): entry version string
+        Returns:
+            Document: json representation of an entry in indexd
+
+        """
+        if urls is None:
+            urls = []
+        json = {
+            "urls": urls,
+            "form": "object",
+            "hashes": hashes,
+            "size": size,
+            "file_name": file_name,
+            "metadata": metadata,
+            "urls_metadata": urls_metadata,
+            "baseid": baseid,
+            "acl": acl,
+            "authz": authz,
+            "version": version,
+        }
+        if did:
+            json["did"] = did
+        rec = await self._request(
+            "POST",
+            "index/",
+            json={k: v for k, v in json.items() if v is not None},
+            authenticate=True,
+        )
+        return await self.get_record(rec["did"])
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def create_new_version(
+        self,
+        guid,
+        hashes,
+        size,
+        did=None,
+        urls=None,
+        file_name=None,
+        metadata=None,
+        acl=None,
+        urls_metadata=None,
+        version=None,
+        authz=None,
+    ):
+        """
+
+        Add new version for the document associated to the provided uuid
+
+        See Gen3Index.create_new_version.
+
+        Args:
+            guid: (string): record id
+            hashes (dict): {hash type: hash value,}
+                eg ``hashes={'md5': ab167e49d25b488939b1ede42752458b'}``
+            size (int): file size metadata associated with a given uuid
+            did (str): provide a UUID for the new indexd to be made
+            urls (list): list of URLs where you can download the UUID
+            file_name (str): name of the file associated with a given UUID
+            metadata (dict): additional key value metadata for this entry
+            acl (list): access control list
+            urls_metadata (dict): metadata attached to each url
+            version (str): entry version string
+            authz (str): RBAC string
+
+        """
+        if urls is None:
+            urls = []
+        json = {
+            "urls": urls,
+            "form": "object",
+            "hashes": hashes,
+            "size": size,
+            "file_name": file_name,
+            "metadata": metadata,
+            "urls_metadata": urls_metadata,
+            "acl": acl,
+            "authz": authz,
+            "version": version,
+        }
+        if did:
+            json["did"] = did
+        rec = await self._request(
+            "POST",
+            f"index/{guid}",
+            json={k: v for k, v in json.items() if v is not None},
+            authenticate=True,
+        )
+
+        if rec and "did" in rec:
+            return await self.get_record(rec["did"])
+        return None
+
+    ### Put Requests
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def update_record(
+        self,
+        guid,
+        file_name=None,
+        urls=None,
+        version=None,
+        metadata=None,
+        acl=None,
+        authz=None,
+        urls_metadata=None,
+    ):
+        """
+
+        Update an existing entry in the index
+
+        Args:
+             guid: string
+                 - record id
+             body: json/dictionary format
+                 - index record information that needs to be updated.
+                 - can not update size or hash, use new version for that
+                 - fields that are None are left unchanged, so an empty list
+                   clears a field
+
+        """
+        updatable_attrs = {
+            "file_name": file_name,
+            "urls": urls,
+            "version": version,
+            "metadata": metadata,
+            "acl": acl,
+            "authz": authz,
+            "urls_metadata": urls_metadata,
+        }
+        rec = await self.get_record(guid)
+        json = {}
+        for k, v in updatable_attrs.items():
+            if v is None:
+                v = rec.get(k)
+            if v is not None:
+                json[k] = v
+
+        await self._request(
+            "PUT",
+            f"index/{guid}",
+            params={"rev": rec["rev"]},
+            json=json,
+            authenticate=True,
+        )
+        return await self.get_record(guid)
+
+    ### Delete Requests
+
+    @backoff.on_exception(backoff.expo, Exception, **BACKOFF_SETTINGS)
+    async def delete_record(self, guid):
+        """
+
+        Delete an entry from the index
+
+        Args:
+            guid: string
+                 - record id
+
+        Returns:
+            dict: json of the deleted record, None if it didn't exist
+
+        """
+        rec = await self.get_record(guid)
+        if not rec:
+            return rec
+
+        await self._request(
+            "DELETE", f"index/{guid}", params={"rev": rec["rev"]}, authenticate=True
+        )
         return rec
 
+    async def _request_or_none(self, method, path, **kwargs):
+        """
+        Same as _request but returns None when indexd doesn't have the record,
+        so backoff doesn't retry missing records.
+        """
+        try:
+            return await self._request(method, path, **kwargs)
+        except aiohttp.ClientResponseError as exc:
+            if exc.status == 404:
+                return None
+            raise
+
+
+def split_did_keyspace(num_ranges, prefix=""):
+    """
+    Split the did keyspace into contiguous ranges that can be scanned
+    concurrently with AsyncGen3Index.iter_records_in_range.
+
+    Ranges split the hex digits following `prefix` evenly, assuming dids are
+    `prefix` + uuid. The first and last range are unbounded so that every did,
+    whatever its format, belongs to exactly one range.
+
+    Args:
+        num_ranges (int): number of ranges to split the keyspace into
+        prefix (str): common prefix of the dids, like "dg.4503/"
+
+    Returns:
+        List[Tuple[str, str]]: (exclusive start, inclusive end) did ranges, None
+            meaning unbounded
+
+    Examples:
+        >>> split_did_keyspace(4, prefix="dg.4503/")
+        [(None, 'dg.4503/4'), ('dg.4503/4', 'dg.4503/8'), ('dg.4503/8', 'dg.4503/c'), ('dg.4503/c', None)]
+
+    """
+    num_ranges = max(int(num_ranges), 1)
+    num_digits = 1
+    while 16**num_digits < num_ranges:
+        num_digits += 1
+
+    boundaries = []
+    for i in range(1, num_ranges):
+        boundary = prefix + format(
+            i * 16**num_digits // num_ranges, f"0{num_digits}x"
+        )
+        if not boundaries or boundary != boundaries[-1]:
+            boundaries.append(boundary)
+
+    starts = [None] + boundaries
+    ends = boundaries + [None]
+    return list(zip(starts, ends))
+
+
+def _order_records_by_dids(records, dids):
+    """
+    Order the records of a bulk request like the requested dids.
+
+    Returns:
+        (list, list): records in the order of the dids, and missing dids
+    """
+    records_by_did = {record["did"]: record for record in records}
+    ordered_records = []
+    missing_dids = []
+    for did in dids:
+        if did in records_by_did:
+            ordered_records.append(records_by_did[did])
+        else:
+            missing_dids.append(did)
+    return ordered_records, missing_dids
+
+
+def _get_index_url(endpoint, service_location):
+    endpoint = endpoint.strip("/")
+    # if running locally, indexd is deployed by itself without a location relative
+    # to the commons
+    if "http://localhost" in endpoint:
+        service_location = ""
+
+    if not endpoint.endswith(service_location):
+        endpoint += "/" + service_location
+
+    return endpoint
+
 
 def _print_func_name(function):
     return "{}.{}".format(function.__module__, function.__name__)
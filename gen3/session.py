@@ -0,0 +1,400 @@
+"""
+Pooled HTTP sessions shared by the Gen3 SDK classes.
+
+Gen3Submission, Gen3File and Gen3Index send their requests through a
+requests.Session so that connections to a commons are kept alive and reused
+instead of paying a new TCP+TLS handshake for every call. By default, all
+instances in a process share one session created with `create_session`. Pass
+your own session to an SDK class to tune it or isolate it.
+
+Examples:
+    This shares one session, keeping up to 50 connections alive per host,
+    between a submission and an index client.
+
+    >>> session = create_session(pool_maxsize=50)
+    ... sub = Gen3Submission(endpoint, auth, session=session)
+    ... index = Gen3Index(endpoint, auth, session=session)
+
+The asynchronous clients use one long-lived aiohttp.ClientSession per client
+instead, created with `create_async_session` and sent requests through with
+`async_request`. Their number of concurrent requests can be adapted to the load
+of the service with an `AdaptiveConcurrencyLimiter`.
+
+Attributes:
+    DEFAULT_POOL_CONNECTIONS (int): number of hosts to keep connection pools for
+    DEFAULT_POOL_MAXSIZE (int): maximum number of connections kept alive per host
+    DEFAULT_ASYNC_CONNECTION_LIMIT (int): maximum number of simultaneous
+        connections of an asynchronous client
+"""
+import asyncio
+import base64
+import collections
+import contextlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 32
+DEFAULT_ASYNC_CONNECTION_LIMIT = 100
+
+_default_session = None
+_default_session_pid = None
+_default_session_lock = threading.Lock()
+
+
+def create_session(
+    pool_connections=DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize=DEFAULT_POOL_MAXSIZE,
+    pool_block=False,
+    max_retries=0,
+):
+    """
+    Create a requests.Session with keep-alive connection pools.
+
+    Args:
+        pool_connections (int): number of hosts to keep connection pools for
+        pool_maxsize (int): maximum number of connections kept alive per host
+        pool_block (bool): whether to wait for a free connection when
+            pool_maxsize connections to a host are in use, instead of opening
+            extra connections that are discarded afterwards. Use this to
+            enforce a per-host connection limit.
+        max_retries (int): number of retries for failed connections
+
+    Returns:
+        requests.Session: session for use with the SDK classes
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=max_retries,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def get_default_session():
+    """
+    Return the session shared by the SDK classes of this process, creating it
+    if needed.
+
+    Pooled connections can't be shared with forked processes, so a child
+    process gets its own session.
+
+    Returns:
+        requests.Session: the default session
+    """
+    global _default_session, _default_session_pid
+
+    with _default_session_lock:
+        if _default_session is None or _default_session_pid != os.getpid():
+            _default_session = create_session()
+            _default_session_pid = os.getpid()
+        return _default_session
+
+
+def set_default_session(session):
+    """
+    Replace the session shared by the SDK classes created afterwards.
+
+    Args:
+        session (requests.Session): session to share, for example one returned
+            by `create_session` with custom pool settings
+    """
+    global _default_session, _default_session_pid
+
+    with _default_session_lock:
+        _default_session = session
+        _default_session_pid = os.getpid()
+
+
+def create_async_session(limit=DEFAULT_ASYNC_CONNECTION_LIMIT, limit_per_host=0):
+    """
+    Create an aiohttp.ClientSession with a bounded connection pool.
+
+    Must be called from a coroutine since the session binds to the running
+    event loop.
+
+    Args:
+        limit (int): maximum number of simultaneous connections
+        limit_per_host (int): maximum number of simultaneous connections to the
+            same host, 0 for no limit other than `limit`
+
+    Returns:
+        aiohttp.ClientSession: session to reuse for all the requests of a client
+    """
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def async_request(session, method, url, auth_provider=None, **kwargs):
+    """
+    Send a request with an aiohttp session, authenticated the same way as the
+    synchronous clients.
+
+    If the request fails with 401/403, the access token is refreshed and the
+    request is sent one more time.
+
+    Args:
+        session (aiohttp.ClientSession): session to send the request with
+        method (str): HTTP method
+        url (str): full url of the request
+        auth_provider (Gen3Auth|tuple): Gen3Auth instance, or (username, password)
+            for basic auth, or None for anonymous requests
+        **kwargs: passed to aiohttp.ClientSession.request
+
+    Returns:
+        Tuple[aiohttp.ClientResponse, str]: the released response and its body
+    """
+    for attempt in range(2):
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers.update(await _async_auth_headers(auth_provider))
+        kwargs["headers"] = headers
+
+        async with session.request(method, url, **kwargs) as response:
+            text = await response.text()
+
+        if (
+            response.status in (401, 403)
+            and attempt == 0
+            and hasattr(auth_provider, "_expire_access_token")
+        ):
+            # expiring the token can wait for a lock held by another thread or
+            # process while it refreshes the token, so don't block the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, auth_provider._expire_access_token, headers.get("Authorization")
+            )
+            continue
+
+        return response, text
+
+
+async def _async_auth_headers(auth_provider):
+    """
+    Return the headers authenticating a request for the given auth provider.
+    """
+    if auth_provider is None:
+        return {}
+
+    if isinstance(auth_provider, (tuple, list)):
+        username, password = auth_provider
+        credentials = "{}:{}".format(username, password).encode("utf-8")
+        return {"Authorization": "Basic " + base64.b64encode(credentials).decode()}
+
+    return {"Authorization": await auth_provider.async_get_auth_value()}
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limit the number of concurrent requests to a service, adapting the limit to
+    how the service copes with additive increase/multiplicative decrease (AIMD).
+
+    Every successful request that was started while `limit` requests were in
+    flight raises the limit by 1/limit, so about 1 more request is allowed per
+    round of `limit` requests, and the limit only grows when it is reached. Errors
+    that don't mean the service is overloaded, like a 404, leave the limit
+    unchanged. The limit is halved, at most once per
+    `cooldown` seconds, when a request fails with 429, 5xx or a connection error,
+    or when the p95 latency of recent requests grows more than `latency_tolerance`
+    times over the lowest p95 seen.
+
+    The limit and the number of requests in flight are kept in shared memory, so
+    one limiter created before starting worker processes (for example passed to
+    the `initializer` of a ProcessPoolExecutor) limits the requests of all of
+    them. Latencies are tracked per process.
+
+    Wrap each request in `request`, or pass the limiter as the `limiter` of
+    AsyncGen3Index to have all its requests limited:
+
+    >>> async with limiter.request():
+    ...     response = await session.get(url)
+
+    Args:
+        initial_limit (int): number of concurrent requests to start with
+        min_limit (int): lowest number of concurrent requests
+        max_limit (int): highest number of concurrent requests
+        latency_tolerance (float): factor over the lowest p95 latency seen beyond
+            which the limit is decreased
+        cooldown (float): minimum number of seconds between decreases
+        window_size (int): number of recent requests the p95 latency is computed on
+    """
+
+    # seconds to wait before checking again for a free slot
+    _POLL_INTERVAL = 0.01
+
+    def __init__(
+        self,
+        initial_limit,
+        min_limit=1,
+        max_limit=256,
+        latency_tolerance=2.0,
+        cooldown=1.0,
+        window_size=100,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.window_size = window_size
+
+        self._lock = multiprocessing.Lock()
+        self._limit = multiprocessing.RawValue(
+            "d", float(min(max(initial_limit, min_limit), max_limit))
+        )
+        self._in_flight = multiprocessing.RawValue("i", 0)
+        self._last_decrease = multiprocessing.RawValue("d", 0.0)
+        self._decreases = multiprocessing.RawValue("i", 0)
+        self._successes = multiprocessing.RawValue("i", 0)
+        self._failures = multiprocessing.RawValue("i", 0)
+        self._init_local_state()
+
+    def _init_local_state(self):
+        self._latencies = collections.deque(maxlen=self.window_size)
+        self._best_p95 = None
+
+    def __getstate__(self):
+        # latencies are tracked per process
+        state = dict(self.__dict__)
+        for key in ["_latencies", "_best_p95"]:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_local_state()
+
+    @property
+    def limit(self):
+        """
+        int: current maximum number of concurrent requests
+        """
+        return int(self._limit.value)
+
+    def stats(self):
+        """
+        Returns:
+            dict: current "limit", number of requests "in_flight", and the numbers
+            of "successes", "failures" and limit "decreases" so far
+        """
+        with self._lock:
+            return {
+                "limit": int(self._limit.value),
+                "in_flight": self._in_flight.value,
+                "successes": self._successes.value,
+                "failures": self._failures.value,
+                "decreases": self._decreases.value,
+            }
+
+    async def acquire(self):
+        """
+        Wait until fewer requests than the limit are in flight, across all the
+        processes sharing the limiter, and count this one.
+
+        Returns:
+            bool: whether the request brought the number of requests in flight to
+            the limit, to pass to `release`
+        """
+        while True:
+            with self._lock:
+                if self._in_flight.value < int(self._limit.value):
+                    self._in_flight.value += 1
+                    return self._in_flight.value >= int(self._limit.value)
+            await asyncio.sleep(self._POLL_INTERVAL)
+
+    def release(self, latency=None, exc=None, saturated=False):
+        """
+        Stop counting a request and adapt the limit to its outcome.
+
+        Args:
+            latency (float): seconds the request took, None to only stop counting
+                it, for example when it was cancelled
+            exc (Exception): error the request failed with, None if it succeeded
+            saturated (bool): what `acquire` returned for the request, the limit
+                is only raised for requests that reached it
+        """
+        with self._lock:
+            self._in_flight.value -= 1
+        if latency is None:
+            return
+
+        if exc is not None:
+            if _is_overload_error(exc):
+                with self._lock:
+                    self._failures.value += 1
+                self._decrease("request failed: {!r}".format(exc))
+            return
+
+        with self._lock:
+            self._successes.value += 1
+        if self._latency_is_growing(latency):
+            self._decrease("p95 latency grew over {:.3f}s".format(self._best_p95))
+            return
+
+        if not saturated:
+            return
+        with self._lock:
+            self._limit.value = min(
+                self.max_limit, self._limit.value + 1 / self._limit.value
+            )
+
+    @contextlib.asynccontextmanager
+    async def request(self):
+        """
+        Async context manager waiting for a slot before a request, and adapting
+        the limit to the outcome of the request when leaving it.
+        """
+        saturated = await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as exc:
+            self.release(time.monotonic() - start, exc)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release(time.monotonic() - start, saturated=saturated)
+
+    def _latency_is_growing(self, latency):
+        self._latencies.append(latency)
+        if len(self._latencies) < self.window_size:
+            return False
+
+        latencies = sorted(self._latencies)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        if self._best_p95 is None or p95 < self._best_p95:
+            self._best_p95 = p95
+        return p95 > self.latency_tolerance * self._best_p95
+
+    def _decrease(self, reason):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_decrease.value < self.cooldown:
+                return
+            self._last_decrease.value = now
+            self._decreases.value += 1
+            self._limit.value = max(self.min_limit, self._limit.value / 2)
+            limit = int(self._limit.value)
+        # start measuring again at the new concurrency
+        self._latencies.clear()
+        logging.info("decreasing concurrency to {} requests, {}".format(limit, reason))
+
+
+def _is_overload_error(exc):
+    """
+    Return whether a request error means that the service is overloaded.
+    """
+    status = getattr(exc, "status", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
@@ -3,6 +3,13 @@ import requests
 import pandas as pd
 import os
 
+from gen3.session import (
+    DEFAULT_ASYNC_CONNECTION_LIMIT,
+    async_request,
+    create_async_session,
+    get_default_session,
+)
+
 class Gen3Error(Exception):
     pass
 
@@ -22,6 +29,8 @@ class Gen3Submission:
     Args:
         endpoint (str): The URL of the data commons.
         auth_provider (Gen3Auth): A Gen3Auth class instance.
+        session (requests.Session): Optional session to send requests with,
+            defaults to the pooled session shared by the SDK classes.
 
     Examples:
         This generates the Gen3Submission class pointed at the sandbox commons while
@@ -33,9 +42,10 @@ class Gen3Submission:
 
     """
 
-    def __init__(self, endpoint, auth_provider):
+    def __init__(self, endpoint, auth_provider, session=None):
         self._auth_provider = auth_provider
         self._endpoint = endpoint
+        self._session = session or get_default_session()
 
     def __export_file(self, filename, output):
         """Writes an API response to a file.
@@ -52,7 +62,7 @@ class Gen3Submission:
 
         """
         api_url = f"{self._endpoint}/api/v0/submission/"
-        output = requests.get(api_url, auth=self._auth_provider)
+        output = self._session.get(api_url, auth=self._auth_provider)
         output.raise_for_status()
         return output.json()
 
@@ -67,7 +77,7 @@ class Gen3Submission:
             >>> Gen3Submission.create_program(json)
         """
         api_url = "{}/api/v0/submission/".format(self._endpoint)
-        output = requests.post(api_url, auth=self._auth_provider, json=json)
+        output = self._session.post(api_url, auth=self._auth_provider, json=json)
         output.raise_for_status()
         return output.json()
 
@@ -86,7 +96,7 @@ class Gen3Submission:
 
         """
         api_url = "{}/api/v0/submission/{}".format(self._endpoint, program)
-        output = requests.delete(api_url, auth=self._auth_provider)
+        output = self._session.delete(api_url, auth=self._auth_provider)
         output.raise_for_status()
         return output
 
@@ -105,7 +115,7 @@ class Gen3Submission:
 
         """
         api_url = f"{self._endpoint}/api/v0/submission/{program}"
-        output = requests.get(api_url, auth=self._auth_provider)
+        output = self._session.get(api_url, auth=self._auth_provider)
         output.raise_for_status()
         return output.json()
 
@@ -121,7 +131,7 @@ class Gen3Submission:
             >>> Gen3Submission.create_project("DCF", json)
         """
         api_url = "{}/api/v0/submission/{}".format(self._endpoint, program)
-        output = requests.put(api_url, auth=self._auth_provider, json=json)
+        output = self._session.put(api_url, auth=self._auth_provider, json=json)
         output.raise_for_status()
         return output.json()
 
@@ -141,7 +151,7 @@ class Gen3Submission:
 
         """
         api_url = "{}/api/v0/submission/{}/{}".format(self._endpoint, program, project)
-        output = requests.delete(api_url, auth=self._auth_provider)
+        output = self._session.delete(api_url, auth=self._auth_provider)
         output.raise_for_status()
         return output
 
@@ -158,7 +168,7 @@ class Gen3Submission:
 
         """
         api_url = f"{self._endpoint}/api/v0/submission/{program}/{project}/_dictionary"
-        output = requests.get(api_url, auth=self._auth_provider)
+        output = self._session.get(api_url, auth=self._auth_provider)
         output.raise_for_status()
         return output.json()
 
@@ -175,7 +185,7 @@ class Gen3Submission:
 
         """
         api_url = f"{self._endpoint}/api/v0/submission/{program}/{project}/open"
-        output = requests.put(api_url, auth=self._auth_provider)
+        output = self._session.put(api_url, auth=self._auth_provider)
         output.raise_for_status()
         return output.json()
 
@@ -196,7 +206,7 @@ class Gen3Submission:
 
         """
         api_url = "{}/api/v0/submission/{}/{}".format(self._endpoint, program, project)
-        output = requests.put(api_url, auth=self._auth_provider, json=json)
+        output = self._session.put(api_url, auth=self._auth_provider, json=json)
         output.raise_for_status()
         return output.json()
 
@@ -215,7 +225,7 @@ class Gen3Submission:
         api_url = "{}/api/v0/submission/{}/{}/entities/{}".format(
             self._endpoint, program, project, uuid
         )
-        output = requests.delete(api_url, auth=self._auth_provider)
+        output = self._session.delete(api_url, auth=self._auth_provider)
         output.raise_for_status()
         return output
 
@@ -242,7 +252,7 @@ class Gen3Submission:
         api_url = "{}/api/v0/submission/{}/{}/export?ids={}&format={}".format(
             self._endpoint, program, project, uuid, fileformat
         )
-        output = requests.get(api_url, auth=self._auth_provider).text
+        output = self._session.get(api_url, auth=self._auth_provider).text
         if filename is None:
             if fileformat == "json":
                 output = json.loads(output)
@@ -274,7 +284,7 @@ class Gen3Submission:
         api_url = "{}/api/v0/submission/{}/{}/export/?node_label={}&format={}".format(
             self._endpoint, program, project, node_type, fileformat
         )
-        output = requests.get(api_url, auth=self._auth_provider).text
+        output = self._session.get(api_url, auth=self._auth_provider).text
         if filename is None:
             if fileformat == "json":
                 output = json.loads(output)
@@ -309,7 +319,9 @@ class Gen3Submission:
 
         tries = 0
         while tries < max_tries:
-            output = requests.post(api_url, auth=self._auth_provider, json=query).text
+            output = self._session.post(
+                api_url, auth=self._auth_provider, json=query
+            ).text
             data = json.loads(output)
 
             if "errors" in data:
@@ -335,7 +347,7 @@ class Gen3Submission:
 
         """
         api_url = "{}/api/v0/submission/getschema".format(self._endpoint)
-        output = requests.get(api_url).text
+        output = self._session.get(api_url).text
         data = json.loads(output)
         return data
 
@@ -358,7 +370,7 @@ class Gen3Submission:
         api_url = "{}/api/v0/submission/_dictionary/{}".format(
             self._endpoint, node_type
         )
-        output = requests.get(api_url).text
+        output = self._session.get(api_url).text
         data = json.loads(output)
         return data
 
@@ -390,7 +402,7 @@ class Gen3Submission:
 
         """
         api_url = f"{self._endpoint}/api/v0/submission/{program}/{project}/manifest"
-        output = requests.get(api_url, auth=self._auth_provider)
+        output = self._session.get(api_url, auth=self._auth_provider)
         return output
 
     def submit_file(self, project_id, filename, chunk_size=30, row_offset=0):
@@ -471,7 +483,7 @@ class Gen3Submission:
             )
 
             try:
-                response = requests.put(
+                response = self._session.put(
                     api_url,
                     auth=self._auth_provider,
                     data=chunk.to_csv(sep="\t", index=False),
@@ -637,3 +649,234 @@ class Gen3Submission:
         invalid_df.to_csv(invalid_file, sep='\t', index=False, encoding='utf-8')
 
         return invalid_df
+
+
+class AsyncGen3Submission:
+    """Asynchronous client for the Gen3 Submission system.
+
+    Supports querying through Peregrine, exporting, submitting and deleting
+    records with Sheepdog from coroutines, so many requests can run
+    concurrently from one process. All requests share one aiohttp session
+    which is closed when leaving the context manager or calling `close`.
+
+    Args:
+        endpoint (str): The URL of the data commons.
+        auth_provider (Gen3Auth): A Gen3Auth class instance.
+        limit (int): Maximum number of simultaneous connections to the commons.
+
+    Examples:
+        This runs several GraphQL queries concurrently against the sandbox commons.
+
+        >>> endpoint = "https://nci-crdc-demo.datacommons.io"
+        ... auth = Gen3Auth(endpoint, refresh_file="credentials.json")
+        ... async with AsyncGen3Submission(endpoint, auth) as sub:
+        ...     results = await asyncio.gather(*(sub.query(q) for q in queries))
+
+    """
+
+    def __init__(self, endpoint, auth_provider, limit=DEFAULT_ASYNC_CONNECTION_LIMIT):
+        self._auth_provider = auth_provider
+        self._endpoint = endpoint
+        self._limit = limit
+        self._session = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Closes the session and its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = create_async_session(limit=self._limit)
+        return self._session
+
+    async def _request(self, method, api_url, authenticate=True, **kwargs):
+        auth_provider = self._auth_provider if authenticate else None
+        return await async_request(
+            self._get_session(), method, api_url, auth_provider=auth_provider, **kwargs
+        )
+
+    async def _request_json(self, method, api_url, **kwargs):
+        output, text = await self._request(method, api_url, **kwargs)
+        output.raise_for_status()
+        return json.loads(text)
+
+    ### Record functions
+
+    async def submit_record(self, program, project, json):
+        """Submit record(s) to a project as json.
+
+        Args:
+            program (str): The program to submit to.
+            project (str): The project to submit to.
+            json (object): The json defining the record(s) to submit. For multiple records, the json should be an array of records.
+
+        Examples:
+            This submits records to the CCLE project in the sandbox commons.
+
+            >>> await AsyncGen3Submission.submit_record("DCF", "CCLE", json)
+
+        """
+        api_url = "{}/api/v0/submission/{}/{}".format(self._endpoint, program, project)
+        return await self._request_json("PUT", api_url, json=json)
+
+    async def delete_record(self, program, project, uuid):
+        """Delete a record from a project.
+
+        Args:
+            program (str): The program to delete from.
+            project (str): The project to delete from.
+            uuid (str): The uuid of the record to delete
+
+        Examples:
+            This deletes a record from the CCLE project in the sandbox commons.
+
+            >>> await AsyncGen3Submission.delete_record("DCF", "CCLE", uuid)
+        """
+        api_url = "{}/api/v0/submission/{}/{}/entities/{}".format(
+            self._endpoint, program, project, uuid
+        )
+        return await self._request_json("DELETE", api_url)
+
+    async def export_record(self, program, project, uuid, fileformat, filename=None):
+        """Export a single record into json.
+
+        Args:
+            program (str): The program the record is under.
+            project (str): The project the record is under.
+            uuid (str): The UUID of the record to export.
+            fileformat (str): Export data as either 'json' or 'tsv'
+            filename (str): Name of the file to export to; if no filename is provided, returns the data
+
+        Examples:
+            This exports a single record from the sandbox commons.
+
+            >>> await AsyncGen3Submission.export_record("DCF", "CCLE", "d70b41b9-6f90-4714-8420-e043ab8b77b9", "json", filename="DCF-CCLE_one_record.json")
+
+        """
+        assert fileformat in [
+            "json",
+            "tsv",
+        ], "File format must be either 'json' or 'tsv'"
+        api_url = "{}/api/v0/submission/{}/{}/export?ids={}&format={}".format(
+            self._endpoint, program, project, uuid, fileformat
+        )
+        _, output = await self._request("GET", api_url)
+        return self._export_output(output, fileformat, filename)
+
+    async def export_node(self, program, project, node_type, fileformat, filename=None):
+        """Export all records in a single node type of a project.
+
+        Args:
+            program (str): The program to which records belong.
+            project (str): The project to which records belong.
+            node_type (str): The name of the node to export.
+            fileformat (str): Export data as either 'json' or 'tsv'
+            filename (str): Name of the file to export to; if no filename is provided, returns the data
+
+        Examples:
+            This exports all records in the "sample" node from the CCLE project in the sandbox commons.
+
+            >>> await AsyncGen3Submission.export_node("DCF", "CCLE", "sample", "tsv", filename="DCF-CCLE_sample_node.tsv")
+
+        """
+        assert fileformat in [
+            "json",
+            "tsv",
+        ], "File format must be either 'json' or 'tsv'"
+        api_url = "{}/api/v0/submission/{}/{}/export/?node_label={}&format={}".format(
+            self._endpoint, program, project, node_type, fileformat
+        )
+        _, output = await self._request("GET", api_url)
+        return self._export_output(output, fileformat, filename)
+
+    def _export_output(self, output, fileformat, filename):
+        if filename is None:
+            if fileformat == "json":
+                output = json.loads(output)
+            return output
+
+        with open(filename, "w") as outfile:
+            outfile.write(output)
+        print("\nOutput written to file: " + filename)
+        return output
+
+    ### Query functions
+
+    async def query(self, query_txt, variables=None, max_tries=1):
+        """Execute a GraphQL query against a data commons.
+
+        Args:
+            query_txt (str): Query text.
+            variables (:obj:`object`, optional): Dictionary of variables to pass with the query.
+            max_tries (:obj:`int`, optional): Number of times to try the query until a response with data is received.
+
+        Examples:
+            This executes a query to get the list of all the project codes for all the projects
+            in the data commons.
+
+            >>> query = "{ project(first:0) { code } }"
+            ... await AsyncGen3Submission.query(query)
+
+        """
+        api_url = "{}/api/v0/submission/graphql".format(self._endpoint)
+        if variables is None:
+            query = {"query": query_txt}
+        else:
+            query = {"query": query_txt, "variables": variables}
+
+        tries = 0
+        while tries < max_tries:
+            _, output = await self._request("POST", api_url, json=query)
+            data = json.loads(output)
+
+            if "errors" in data:
+                raise Gen3SubmissionQueryError(data["errors"])
+
+            if "data" in data:
+                break
+
+            print(query_txt)
+            print(data)
+            tries += 1
+
+        return data
+
+    ### Dictionary functions
+
+    async def get_dictionary_node(self, node_type):
+        """Returns the dictionary schema for a specific node.
+
+        Args:
+            node_type (str): The node_type (or name of the node) to retrieve.
+
+        Examples:
+            This returns the dictionary schema the "subject" node.
+
+            >>> await AsyncGen3Submission.get_dictionary_node("subject")
+
+        """
+        api_url = "{}/api/v0/submission/_dictionary/{}".format(
+            self._endpoint, node_type
+        )
+        _, output = await self._request("GET", api_url, authenticate=False)
+        return json.loads(output)
+
+    async def get_dictionary_all(self):
+        """Returns the entire dictionary object for a commons.
+
+        Examples:
+            This returns the dictionary schema for a commons.
+
+            >>> await AsyncGen3Submission.get_dictionary_all()
+
+        """
+        return await self.get_dictionary_node("_all")
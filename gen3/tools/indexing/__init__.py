@@ -1,2 +1,7 @@
 from gen3.tools.indexing.download_manifest import async_download_object_manifest
 from gen3.tools.indexing.verify_manifest import verify_object_manifest
+from gen3.tools.indexing.index_snapshot import IndexSnapshot
+from gen3.tools.indexing.reverse_index import ReverseIndex
+from gen3.tools.indexing.index_manifest import index_object_manifest
+from gen3.tools.indexing.manifest_diff import verify_object_manifest_offline
+from gen3.tools.indexing.local_files import verify_local_files
@@ -9,11 +9,36 @@ guid,authz,acl,file_size,md5,urls
 
 Fields that are lists (like acl, authz, and urls) separate the values with spaces.
 
+Other formats (compressed CSV, JSON Lines and Parquet) are written depending on the
+extension of the output filename, see `manifest_writers`.
+
+Pass the manifest of a previous download as `previous_manifest` to also write the
+records added, changed and deleted since then to delta manifests, see
+`manifest_diff.write_delta_manifests`.
+
+By default, records are requested by page number. Set `num_did_ranges` to instead
+split the did keyspace into ranges walked concurrently with `start` cursors, which
+keeps request cost flat for large indexes and doesn't skip or duplicate records
+inserted during the download.
+
+Set `adaptive_concurrency` to start with `max_concurrent_requests` concurrent
+requests and let an `AdaptiveConcurrencyLimiter`, shared by all the processes,
+raise the number while indexd keeps up and lower it when indexd slows down or
+fails. The number it settles on is logged at the end of the download.
+
 Attributes:
     CURRENT_DIR (str): directory this file is in
     INDEXD_RECORD_PAGE_SIZE (int): number of records to request per page
     MAX_CONCURRENT_REQUESTS (int): maximum number of desired concurrent requests across
         processes/threads
+    PAGE_RANGES_PER_PROCESS (int): number of page ranges to split the pages into
+        for each process, so that processes finishing early pick up more work
+    MAX_PAGE_RANGE_ATTEMPTS (int): number of times a page range is attempted before
+        the download fails
+    WRITE_QUEUE_SIZE (int): maximum number of pages of records waiting to be
+        written, so that requests pause when writing falls behind
+    WRITE_BUFFER_SIZE (int): number of characters of formatted rows buffered
+        before they are written to the file
     TMP_FOLDER (str): Folder directory for placing temporary files
         NOTE: We have to use a temporary folder b/c Python's file writing is not
               thread-safe so we can't have all processes writing to the same file.
@@ -22,28 +47,53 @@ Attributes:
 """
 import asyncio
 import click
+import concurrent.futures
 import time
 import csv
-import glob
+import io
+import json
 import logging
 import os
 import sys
-import shutil
 import math
 
-from gen3.index import Gen3Index
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak memory use is then not reported
+    resource = None
+
+from gen3.index import AsyncGen3Index, Gen3Index, split_did_keyspace
+from gen3.session import AdaptiveConcurrencyLimiter
+from gen3.tools.indexing.manifest_diff import write_delta_manifests
+from gen3.tools.indexing.manifest_writers import (
+    get_manifest_writer,
+    iter_csv_file_records,
+)
 
 INDEXD_RECORD_PAGE_SIZE = 1024
 MAX_CONCURRENT_REQUESTS = 24
+PAGE_RANGES_PER_PROCESS = 4
+MAX_PAGE_RANGE_ATTEMPTS = 3
+WRITE_QUEUE_SIZE = 16
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
 CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
 TMP_FOLDER = os.path.abspath(CURRENT_DIR + "/tmp") + "/"
 
+# limiter shared by the worker processes of the pool, see _init_worker
+_worker_limiter = None
+
 
 async def async_download_object_manifest(
     commons_url,
     output_filename="object-manifest.csv",
     num_processes=4,
     max_concurrent_requests=MAX_CONCURRENT_REQUESTS,
+    num_did_ranges=None,
+    resume=False,
+    output_format=None,
+    previous_manifest=None,
+    adaptive_concurrency=False,
 ):
     """
     Download all file object records into a manifest csv
@@ -56,32 +106,106 @@ async def async_download_object_manifest(
         max_concurrent_requests (int): the maximum number of concurrent requests allowed
             NOTE: This is the TOTAL number, not just for this process. Used to help
             determine how many requests a process should be making at one time
+        num_did_ranges (int, optional): if provided, split the did keyspace into this
+            many ranges scanned concurrently with `start` cursors instead of
+            requesting pages by number
+        resume (bool, optional): continue the interrupted download whose temporary
+            files are in TMP_FOLDER, only requesting the records that weren't
+            written yet. Starts over if there is nothing to resume.
+        output_format (str, optional): key of `manifest_writers.manifest_writers`,
+            guessed from the extension of output_filename if not provided
+        previous_manifest (str, optional): manifest of a previous download, to also
+            write the records added, changed and deleted since then to the delta
+            manifests named after output_filename, like
+            "object-manifest.added.csv"
+        adaptive_concurrency (bool, optional): adapt the number of concurrent
+            requests to how indexd copes, starting from max_concurrent_requests
+
+    Returns:
+        int: number of concurrent requests the download settled on with
+        adaptive_concurrency, None otherwise
     """
     start_time = time.perf_counter()
     logging.info(f"start time: {start_time}")
 
-    # ensure tmp directory exists and is empty
-    os.makedirs(TMP_FOLDER, exist_ok=True)
-    for file in os.listdir(TMP_FOLDER):
-        file_path = os.path.join(TMP_FOLDER, file)
-        if os.path.isfile(file_path):
-            os.unlink(file_path)
+    mode = "did_ranges" if num_did_ranges else "pages"
+    plan = _load_plan(commons_url, mode) if resume else None
+
+    if not plan:
+        # ensure tmp directory exists and is empty
+        os.makedirs(TMP_FOLDER, exist_ok=True)
+        for file in os.listdir(TMP_FOLDER):
+            file_path = os.path.join(TMP_FOLDER, file)
+            if os.path.isfile(file_path):
+                os.unlink(file_path)
+
+    limiter = None
+    if adaptive_concurrency:
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=max_concurrent_requests)
+
+    if num_did_ranges:
+        tmp_files = await _write_all_index_records_in_did_ranges_to_file(
+            commons_url,
+            output_filename,
+            num_did_ranges,
+            max_concurrent_requests,
+            plan=plan,
+            output_format=output_format,
+            limiter=limiter,
+        )
+    else:
+        tmp_files = await _write_all_index_records_to_file(
+            commons_url,
+            output_filename,
+            num_processes,
+            max_concurrent_requests,
+            plan=plan,
+            output_format=output_format,
+            limiter=limiter,
+        )
 
-    result = await _write_all_index_records_to_file(
-        commons_url, output_filename, num_processes, max_concurrent_requests
-    )
+    if previous_manifest:
+        logging.info(f"comparing with previous manifest {previous_manifest}...")
+        write_delta_manifests(
+            previous_manifest,
+            (
+                record
+                for tmp_file in tmp_files
+                if os.path.isfile(tmp_file)
+                for record in iter_csv_file_records(tmp_file)
+            ),
+            output_filename,
+            output_format,
+        )
 
     end_time = time.perf_counter()
     logging.info(f"end time: {end_time}")
     logging.info(f"run time: {end_time-start_time}")
+    logging.info(f"peak RSS: {_get_peak_rss_mib()} MiB")
+
+    if limiter:
+        logging.info(f"adaptive concurrency: {limiter.stats()}")
+        return limiter.limit
 
 
 async def _write_all_index_records_to_file(
-    commons_url, output_filename, num_processes, max_concurrent_requests
+    commons_url,
+    output_filename,
+    num_processes,
+    max_concurrent_requests,
+    plan=None,
+    output_format=None,
+    limiter=None,
 ):
     """
-    Spins up number of processes provided to parse indexd records and eventually
-    write to a single output file manifest.
+    Spins up a pool of processes to request all the pages of indexd records and
+    eventually write them to a single output file manifest.
+
+    The pages are split into ranges, several per process, that the processes
+    request and write to their own temporary file. A range that fails is
+    attempted again, up to MAX_PAGE_RANGE_ATTEMPTS times. The temporary file of a
+    range only gets its final name once the range is complete, so resuming skips
+    the complete ranges.
 
     Args:
         commons_url (str): root domain for commons where indexd lives
@@ -91,76 +215,407 @@ async def _write_all_index_records_to_file(
         max_concurrent_requests (int): the maximum number of concurrent requests allowed
             NOTE: This is the TOTAL number, not just for this process. Used to help
             determine how many requests a process should be making at one time
+        plan (dict, optional): plan of the interrupted download to resume
+        output_format (str, optional): key of `manifest_writers.manifest_writers`
+        limiter (AdaptiveConcurrencyLimiter, optional): limiter shared by the
+            processes, replacing the fixed number of requests per process
+
+    Returns:
+        List[str]: temporary files the records were written to
+
+    Raises:
+        RuntimeError: If some page ranges still fail after all their attempts
+    """
+    if plan:
+        page_ranges = [tuple(page_range) for page_range in plan["page_ranges"]]
+    else:
+        index = Gen3Index(commons_url)
+        logging.debug(f"requesting indexd stats...")
+        num_files = int(index.get_stats().get("fileCount"))
+        logging.debug(f"number files: {num_files}")
+        # paging is 0-based, so subtract 1 from ceiling
+        # note: float() is necessary to force Python 3 to not floor the result
+        max_page = int(math.ceil(float(num_files) / INDEXD_RECORD_PAGE_SIZE)) - 1
+        logging.debug(f"max page: {max_page}")
+        logging.debug(f"num processes: {num_processes}")
+
+        page_ranges = _split_pages_into_ranges(
+            max_page + 1, num_processes * PAGE_RANGES_PER_PROCESS
+        )
+        _save_plan(commons_url, "pages", page_ranges=page_ranges)
+    logging.debug(f"page ranges: {page_ranges}")
+
+    remaining_page_ranges = [
+        page_range
+        for page_range in page_ranges
+        if not os.path.isfile(_get_page_range_filename(page_range))
+    ]
+    if len(remaining_page_ranges) < len(page_ranges):
+        logging.info(
+            f"resuming: {len(page_ranges) - len(remaining_page_ranges)} of "
+            f"{len(page_ranges)} page ranges are already done"
+        )
+
+    loop = asyncio.get_event_loop()
+    write_start_time = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_processes, initializer=_init_worker, initargs=(limiter,)
+    ) as executor:
+        results = await asyncio.gather(
+            *(
+                _write_page_range_to_file_with_retries(
+                    loop,
+                    executor,
+                    commons_url,
+                    page_range,
+                    num_processes,
+                    max_concurrent_requests,
+                )
+                for page_range in remaining_page_ranges
+            ),
+            return_exceptions=True,
+        )
+
+    failed_page_ranges = [
+        page_range
+        for page_range, result in zip(remaining_page_ranges, results)
+        if isinstance(result, BaseException)
+    ]
+    if failed_page_ranges:
+        raise RuntimeError(
+            f"could not get the records of page ranges {failed_page_ranges}, "
+            "download again with resume=True to retry them"
+        )
+    _log_write_stats(sum(results), time.perf_counter() - write_start_time)
+
+    tmp_files = [_get_page_range_filename(page_range) for page_range in page_ranges]
+    _combine_tmp_files_into_output(output_filename, tmp_files, output_format)
+    return tmp_files
+
+
+def _split_pages_into_ranges(num_pages, num_ranges):
+    """
+    Split pages 0 to num_pages - 1 into at most num_ranges contiguous ranges.
 
-    No Longer Raises:
-        IndexError: If script detects missing files in indexd after initial parsing
+    Args:
+        num_pages (int): number of pages
+        num_ranges (int): maximum number of ranges
+
+    Returns:
+        List[Tuple[int, int]]: (first page, last page) of each range
     """
-    index = Gen3Index(commons_url)
-    logging.debug(f"requesting indexd stats...")
-    num_files = int(index.get_stats().get("fileCount"))
-    logging.debug(f"number files: {num_files}")
-    # paging is 0-based, so subtract 1 from ceiling
-    # note: float() is necessary to force Python 3 to not floor the result
-    max_page = int(math.ceil(float(num_files) / INDEXD_RECORD_PAGE_SIZE)) - 1
-    logging.debug(f"max page: {max_page}")
-    logging.debug(f"num processes: {num_processes}")
+    if num_pages <= 0:
+        return []
+    range_size = int(math.ceil(float(num_pages) / max(num_ranges, 1)))
+    return [
+        (first_page, min(first_page + range_size, num_pages) - 1)
+        for first_page in range(0, num_pages, range_size)
+    ]
 
-    pages = [x for x in range(max_page + 1)]
 
-    # batch pages into subprocesses
-    chunk_size = int(math.ceil(float(len(pages)) / num_processes))
-    logging.debug(f"page chunk size: {chunk_size}")
+def _init_worker(limiter):
+    """
+    Share the limiter with a worker process of the pool. Synchronized objects
+    can only be passed to worker processes when starting them.
+    """
+    global _worker_limiter
+    _worker_limiter = limiter
 
-    if not chunk_size:
-        page_chunks = []
-    else:
-        page_chunks = [
-            pages[i : i + chunk_size] for i in range(0, len(pages), chunk_size)
-        ]
-
-    processes = []
-    for x in range(len(page_chunks)):
-        pages = ",".join(map(str, page_chunks[x]))
-
-        # call the cli function below and pass in chunks of pages for each process
-        command = (
-            f"python {CURRENT_DIR}/download_manifest.py --commons_url "
-            f"{commons_url} --pages {pages} --num_processes {num_processes} "
-            f"--max_concurrent_requests {max_concurrent_requests}"
+
+def _get_page_range_filename(page_range):
+    """
+    Return the temporary file the records of a complete page range are in.
+    """
+    first_page, last_page = page_range
+    return TMP_FOLDER + f"pages-{first_page:09d}-{last_page:09d}.csv"
+
+
+async def _write_page_range_to_file_with_retries(
+    loop, executor, commons_url, page_range, num_processes, max_concurrent_requests
+):
+    """
+    Run _write_page_range_to_file in the process pool, attempting it again when
+    it fails.
+
+    Returns:
+        int: number of rows written
+
+    Raises:
+        Exception: the error of the last attempt
+    """
+    for attempt in range(1, MAX_PAGE_RANGE_ATTEMPTS + 1):
+        try:
+            return await loop.run_in_executor(
+                executor,
+                _write_page_range_to_file,
+                commons_url,
+                page_range,
+                num_processes,
+                max_concurrent_requests,
+            )
+        except Exception as exc:
+            logging.warning(
+                f"pages {page_range[0]}-{page_range[1]} failed on attempt "
+                f"{attempt}/{MAX_PAGE_RANGE_ATTEMPTS}: {exc!r}"
+            )
+            if attempt == MAX_PAGE_RANGE_ATTEMPTS:
+                raise
+
+
+def _write_page_range_to_file(
+    commons_url, page_range, num_processes, max_concurrent_requests
+):
+    """
+    Request the records of a range of pages and write them to a temporary file
+    named after the range. Runs in a worker process of the pool.
+
+    The records are written to a ".partial" file renamed once all the pages are
+    written, so an interrupted range is requested again when resuming.
+
+    Args:
+        commons_url (str): root domain for commons where indexd lives
+        page_range (Tuple[int, int]): first and last page to request
+        num_processes (int): number of concurrent processes being requested
+        max_concurrent_requests (int): the maximum number of concurrent requests
+            allowed across all processes
+
+    Returns:
+        int: number of rows written
+    """
+    first_page, last_page = page_range
+    output_filename = _get_page_range_filename(page_range)
+    row_count = asyncio.run(
+        _get_records_and_write_to_file(
+            commons_url,
+            range(first_page, last_page + 1),
+            num_processes,
+            max_concurrent_requests,
+            output_filename=output_filename + ".partial",
+            limiter=_worker_limiter,
         )
-        logging.info(command)
+    )
+    os.replace(output_filename + ".partial", output_filename)
+    logging.info(f"pages {first_page}-{last_page} - Done")
+    return row_count
+
+
+async def _write_all_index_records_in_did_ranges_to_file(
+    commons_url,
+    output_filename,
+    num_did_ranges,
+    max_concurrent_requests,
+    plan=None,
+    output_format=None,
+    limiter=None,
+):
+    """
+    Split the did keyspace into ranges, walk them concurrently with `start` cursors
+    and write all the records to a single output file manifest.
 
-        process = await asyncio.create_subprocess_shell(command)
+    Requests are I/O bound so a single process is used, the number of concurrent
+    requests is limited by the size of the connection pool.
 
-        logging.info(f"Process_{process.pid} - Started w/: {command}")
-        processes.append(process)
+    Each range is written to its own temporary file with a checkpoint of the last
+    did written, so resuming continues every range from its checkpoint.
 
-    for process in processes:
-        # wait for the subprocesses to finish
-        stdout, stderr = await process.communicate()
+    Args:
+        commons_url (str): root domain for commons where indexd lives
+        output_filename (str, optional): filename for output
+        num_did_ranges (int): number of did ranges to scan concurrently
+        max_concurrent_requests (int): the maximum number of concurrent requests allowed
+        plan (dict, optional): plan of the interrupted download to resume
+        output_format (str, optional): key of `manifest_writers.manifest_writers`
+        limiter (AdaptiveConcurrencyLimiter, optional): limiter replacing the fixed
+            number of concurrent requests
 
-        if process.returncode == 0:
-            logging.info(f"Process_{process.pid} - Done")
+    Returns:
+        List[str]: temporary files the records were written to
+    """
+    if plan:
+        did_ranges = [tuple(did_range) for did_range in plan["did_ranges"]]
+    else:
+        index = Gen3Index(commons_url)
+        first_records = index.get_all_records(limit=1)
+        if not first_records:
+            did_ranges = []
         else:
-            logging.info(f"Process_{process.pid} - FAILED")
+            did_ranges = split_did_keyspace(
+                num_did_ranges, prefix=_get_did_prefix(first_records[0]["did"])
+            )
+        _save_plan(commons_url, "did_ranges", did_ranges=did_ranges)
+    logging.debug(f"did ranges: {did_ranges}")
+
+    # default ssl handling unless it's explicitly http://
+    ssl = None
+    if "https" not in commons_url:
+        ssl = False
+
+    async with AsyncGen3Index(
+        commons_url, limit=max_concurrent_requests, ssl=ssl, limiter=limiter
+    ) as async_index:
+        await asyncio.gather(
+            *(
+                _write_did_range_to_file(range_number, did_range, async_index)
+                for range_number, did_range in enumerate(did_ranges)
+            )
+        )
+
+    tmp_files = [_get_did_range_filename(number) for number in range(len(did_ranges))]
+    _combine_tmp_files_into_output(output_filename, tmp_files, output_format)
+    return tmp_files
 
+
+def _get_did_prefix(did):
+    """
+    Return the prefix of a did, like "dg.4503/" for "dg.4503/<uuid>".
+
+    Args:
+        did (str): a did from the index
+
+    Returns:
+        str: prefix including the trailing slash, empty if there is none
+    """
+    return did[: did.rfind("/") + 1]
+
+
+def _get_did_range_filename(range_number):
+    """
+    Return the temporary file the records of a did range are written to.
+    """
+    return TMP_FOLDER + f"did-range-{range_number:06d}.csv"
+
+
+async def _write_did_range_to_file(range_number, did_range, index):
+    """
+    Walks the records in the did range page by page and writes them to the
+    temporary file of the range, saving a checkpoint after every page.
+
+    If the range has a checkpoint, rows written after it are discarded and the
+    walk continues from the last did of the checkpoint.
+
+    Args:
+        range_number (int): number of the range, used to name its files
+        did_range (Tuple[str, str]): (exclusive start, inclusive end) did range
+        index (AsyncGen3Index): indexd client shared by this process
+    """
+    file_name = _get_did_range_filename(range_number)
+    start, end = did_range
+    checkpoint = _load_checkpoint(file_name) or {
+        "start": start,
+        "size": 0,
+        "done": False,
+    }
+    if checkpoint["done"]:
+        logging.info(f"did range {range_number} is already done")
+        return
+
+    with open(file_name, "a", encoding="utf8", newline="") as file:
+        file.truncate(checkpoint["size"])
+        async for records in index.iter_records_in_range(
+            start=checkpoint["start"], end=end, limit=INDEXD_RECORD_PAGE_SIZE
+        ):
+            file.write(_format_manifest_rows(records))
+            file.flush()
+            checkpoint["start"] = records[-1]["did"]
+            checkpoint["size"] = os.fstat(file.fileno()).st_size
+            _save_checkpoint(file_name, checkpoint)
+
+    checkpoint["done"] = True
+    _save_checkpoint(file_name, checkpoint)
+
+
+def _load_plan(commons_url, mode):
+    """
+    Load the plan of the interrupted download in TMP_FOLDER.
+
+    Args:
+        commons_url (str): root domain for commons where indexd lives
+        mode (str): "pages" or "did_ranges"
+
+    Returns:
+        dict: the plan, None if there isn't any plan for a download like this one
+    """
+    try:
+        with open(TMP_FOLDER + "plan.json", encoding="utf8") as file:
+            plan = json.load(file)
+    except (OSError, ValueError):
+        logging.info("no interrupted download to resume, starting over")
+        return None
+
+    expected = {
+        "commons_url": commons_url,
+        "mode": mode,
+        "page_size": INDEXD_RECORD_PAGE_SIZE,
+    }
+    if any(plan.get(key) != value for key, value in expected.items()):
+        logging.warning(
+            f"interrupted download doesn't match this one, starting over: {plan}"
+        )
+        return None
+
+    logging.info(f"resuming interrupted download of {commons_url}")
+    return plan
+
+
+def _save_plan(commons_url, mode, **ranges):
+    """
+    Save how the download is split, so that it can be resumed the same way.
+    """
+    plan = {
+        "commons_url": commons_url,
+        "mode": mode,
+        "page_size": INDEXD_RECORD_PAGE_SIZE,
+        **ranges,
+    }
+    _write_json_atomically(TMP_FOLDER + "plan.json", plan)
+
+
+def _load_checkpoint(file_name):
+    try:
+        with open(file_name + ".checkpoint", encoding="utf8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(file_name, checkpoint):
+    _write_json_atomically(file_name + ".checkpoint", checkpoint)
+
+
+def _write_json_atomically(file_name, data):
+    """
+    Write data to a temporary file then rename it, so that an interruption never
+    leaves a truncated file behind.
+    """
+    with open(file_name + ".tmp", "w", encoding="utf8") as file:
+        json.dump(data, file)
+    os.replace(file_name + ".tmp", file_name)
+
+
+def _combine_tmp_files_into_output(output_filename, file_names, output_format=None):
+    """
+    Combine the temporary CSV files written by the workers into the output
+    manifest, in the format of the output.
+
+    Args:
+        output_filename (str): filename for output
+        file_names (List[str]): temporary files to combine, in order
+        output_format (str, optional): key of `manifest_writers.manifest_writers`,
+            guessed from the extension of output_filename if not provided
+    """
     logging.info(f"done processing, combining outputs to single file {output_filename}")
 
     # remove existing output if it exists
     if os.path.isfile(output_filename):
         os.unlink(output_filename)
 
-    with open(output_filename, "wb") as outfile:
-        outfile.write(
-            "guid, urls, authz, acl, md5, file_size, file_name\n".encode("utf8")
-        )
-        for filename in glob.glob(TMP_FOLDER + "*"):
-            if output_filename == filename:
-                # don't want to copy the output into the output
+    with get_manifest_writer(output_filename, output_format) as writer:
+        for filename in file_names:
+            if not os.path.isfile(filename):
+                # ranges without any record don't write a file
                 continue
             logging.info(f"combining {filename} into {output_filename}")
-            with open(filename, "rb") as readfile:
-                shutil.copyfileobj(readfile, outfile)
+            writer.write_csv_file(filename)
 
     logging.info(f"done writing output to file {output_filename}")
 
@@ -219,95 +674,231 @@ def write_page_records_to_files(
 
 
 async def _get_records_and_write_to_file(
-    commons_url, pages, num_processes, max_concurrent_requests
+    commons_url,
+    pages,
+    num_processes,
+    max_concurrent_requests,
+    output_filename=None,
+    limiter=None,
 ):
     """
     Getting indexd records and writing to a file. This function
     creates semaphores to limit the number of concurrent http connections that
     get opened to send requests to indexd.
 
+    All requests of this process share one connection pool, limited to the
+    number of concurrent requests this process is allowed to make.
+
     It then uses asyncio to start a number of coroutines. Steps:
         1) requests to indexd to get records (writes resulting records to a queue)
         2) puts a final "DONE" in the queue to stop coroutine that will read from queue
         3) reading those records from the queue and writing to a file
 
+    The queue holds at most WRITE_QUEUE_SIZE pages, so requests wait for the
+    writer instead of piling up records in memory when writing falls behind.
+
     Args:
         commons_url (str): root domain for commons where indexd lives
         pages (List[int/str]): List of indexd pages to request
         num_processes (int): number of concurrent processes being requested
             (including this one)
+        output_filename (str, optional): file to write the records to, defaults to
+            a temporary file named after this process
+        limiter (AdaptiveConcurrencyLimiter, optional): limiter shared by the
+            processes, replacing the fixed number of requests per process
+
+    Returns:
+        int: number of rows written
     """
-    max_requests = int(max_concurrent_requests / num_processes)
+    if limiter is None:
+        max_requests = max(int(max_concurrent_requests / num_processes), 1)
+    else:
+        # the limiter decides, this only bounds the connection pool
+        max_requests = limiter.max_limit
     logging.debug(f"max concurrent requests per process: {max_requests}")
     lock = asyncio.Semaphore(max_requests)
-    queue = asyncio.Queue()
-    write_to_file_task = asyncio.ensure_future(_parse_from_queue(queue))
-    await asyncio.gather(
-        *(
-            _put_records_from_page_in_queue(page, commons_url, lock, queue)
-            for page in pages
+    queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+
+    # default ssl handling unless it's explicitly http://
+    ssl = None
+    if "https" not in commons_url:
+        ssl = False
+
+    write_to_file_task = asyncio.ensure_future(
+        _parse_from_queue(queue, output_filename)
+    )
+    async with AsyncGen3Index(
+        commons_url, limit=max_requests, ssl=ssl, limiter=limiter
+    ) as index:
+        requests_task = asyncio.ensure_future(
+            asyncio.gather(
+                *(
+                    _put_records_from_page_in_queue(page, index, lock, queue)
+                    for page in pages
+                )
+            )
         )
+        await _wait_unless_writer_fails(requests_task, write_to_file_task)
+    await _wait_unless_writer_fails(
+        asyncio.ensure_future(queue.put("DONE")), write_to_file_task
     )
-    await queue.put("DONE")
-    await write_to_file_task
+    return await write_to_file_task
+
+
+async def _wait_unless_writer_fails(task, write_to_file_task):
+    """
+    Wait for a task putting records in the queue, while the writer reads them.
 
+    The queue is bounded, so if the writer fails, nothing makes room in the queue
+    anymore: the task is then cancelled and the error of the writer raised. If the
+    task fails, the writer is cancelled and the error of the task raised.
 
-async def _put_records_from_page_in_queue(page, commons_url, lock, queue):
+    Args:
+        task (asyncio.Future): task putting records in the queue
+        write_to_file_task (asyncio.Future): task running _parse_from_queue
+    """
+    done, _ = await asyncio.wait(
+        [task, write_to_file_task], return_when=asyncio.FIRST_COMPLETED
+    )
+    if task not in done:
+        # the writer only returns after "DONE", so it failed
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        write_to_file_task.result()
+    elif task.cancelled() or task.exception():
+        write_to_file_task.cancel()
+        await asyncio.gather(write_to_file_task, return_exceptions=True)
+        task.result()
+
+
+async def _put_records_from_page_in_queue(page, index, lock, queue):
     """
     Gets a semaphore then requests records for the given page and
     puts them in a queue.
 
     Args:
-        commons_url (str): root domain for commons where indexd lives
         page (int/str): indexd page to request
+        index (AsyncGen3Index): indexd client shared by this process
         lock (asyncio.Semaphore): semaphones used to limit ammount of concurrent http
             connections
         queue (asyncio.Queue): queue to put indexd records in
     """
-    index = Gen3Index(commons_url)
     async with lock:
-        # default ssl handling unless it's explicitly http://
-        ssl = None
-        if "https" not in commons_url:
-            ssl = False
-
-        records = await index.async_get_records_on_page(
-            page=page, limit=INDEXD_RECORD_PAGE_SIZE, _ssl=ssl
+        records = await index.get_records_on_page(
+            page=page, limit=INDEXD_RECORD_PAGE_SIZE
         )
         await queue.put(records)
 
 
-async def _parse_from_queue(queue):
+async def _parse_from_queue(queue, file_name=None):
     """
     Read from the queue and write to a file
 
+    This coroutine is the only one writing to the file. Each page of records is
+    formatted in one go, and the formatted rows are buffered and written in
+    chunks of WRITE_BUFFER_SIZE characters in a thread, so that the event loop
+    keeps sending requests meanwhile.
+
     Args:
         queue (asyncio.Queue): queue to read indexd records from
+        file_name (str, optional): file to write to, defaults to a temporary file
+            named after this process
+
+    Returns:
+        int: number of rows written
     """
     loop = asyncio.get_event_loop()
-    file_name = TMP_FOLDER + f"{os.getpid()}.csv"
-    with open(file_name, "w+", encoding="utf8") as file:
+    file_name = file_name or TMP_FOLDER + f"{os.getpid()}.csv"
+    start_time = time.perf_counter()
+    row_count = 0
+    with open(file_name, "w", encoding="utf8", newline="") as file:
         logging.info(f"Write to {file_name}")
-        csv_writer = csv.writer(file)
+        chunks = []
+        buffered = 0
 
         records = await queue.get()
         while records != "DONE":
             if records:
-                for record in list(records):
-                    manifest_row = [
-                        record.get("did"),
-                        " ".join(record.get("urls")),
-                        " ".join(record.get("authz")),
-                        " ".join(record.get("acl")),
-                        record.get("hashes", {}).get("md5"),
-                        record.get("size"),
-                        record.get("file_name"),
-                    ]
-                    loop.run_in_executor(None, csv_writer.writerow, manifest_row)
+                chunk = _format_manifest_rows(records)
+                chunks.append(chunk)
+                buffered += len(chunk)
+                row_count += len(records)
+            if buffered >= WRITE_BUFFER_SIZE:
+                await loop.run_in_executor(None, file.write, "".join(chunks))
+                chunks = []
+                buffered = 0
 
             records = await queue.get()
 
-        file.flush()
+        await loop.run_in_executor(None, file.write, "".join(chunks))
+
+    _log_write_stats(row_count, time.perf_counter() - start_time, file_name)
+    return row_count
+
+
+def _format_manifest_rows(records):
+    """
+    Return the CSV rows of a page of indexd records as a single string.
+
+    Args:
+        records (List[dict]): json representing index records
+
+    Returns:
+        str: manifest rows, see `_get_manifest_row`
+    """
+    rows = io.StringIO()
+    csv.writer(rows).writerows(_get_manifest_row(record) for record in records)
+    return rows.getvalue()
+
+
+def _log_write_stats(row_count, seconds, file_name=None):
+    """
+    Log the number of rows written, how fast and the peak memory use so far.
+    """
+    rate = row_count / seconds if seconds > 0 else 0
+    destination = f" to {file_name}" if file_name else ""
+    logging.info(
+        f"wrote {row_count} rows{destination} in {seconds:.1f}s ({rate:.0f} rows/s), "
+        f"peak RSS: {_get_peak_rss_mib()} MiB"
+    )
+
+
+def _get_peak_rss_mib():
+    """
+    Return the peak resident memory of this process or of its largest child
+    process, in MiB, or None if it can't be measured on this platform.
+    """
+    if resource is None:
+        return None
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # reported in bytes on macOS and kilobytes elsewhere
+    if sys.platform == "darwin":
+        peak_rss /= 1024
+    return round(peak_rss / 1024)
+
+
+def _get_manifest_row(record):
+    """
+    Return the manifest row of an indexd record.
+
+    Args:
+        record (dict): json representing an index record
+
+    Returns:
+        list: guid, urls, authz, acl, md5, file_size and file_name
+    """
+    return [
+        record.get("did"),
+        " ".join(record.get("urls")),
+        " ".join(record.get("authz")),
+        " ".join(record.get("acl")),
+        record.get("hashes", {}).get("md5"),
+        record.get("size"),
+        record.get("file_name"),
+    ]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,268 @@
+"""
+Module for indexing actions for creating and updating indexd records from a
+manifest of file objects. Supports concurrent requests using a pool of threads.
+
+The default manifest format expected is the one `download_manifest` writes and
+`verify_manifest` reads: a Comma-Separated Value file (csv) with a header row and a
+row for every record, with the fields guid, urls, authz, acl, md5, file_size and
+file_name. Override `manifest_row_parsers` to read other column names or formats,
+see `verify_manifest`.
+
+Existing records are looked up in bulk. Rows without a record are created,
+rows whose record differs are updated, and rows matching their record are left
+alone, so indexing the same manifest again only sends the lookups. Rows without a
+guid get one from indexd.
+
+Every processed row is appended to a progress log in the following format:
+
+{guid}|{status}|{detail}
+ex: dg.TEST/f2a39f98-6ae1-48a5-8d48-825a0c52a22b|updated|['acl', 'urls']
+
+where status is one of created, updated, unchanged or error. Rows without a guid
+are logged as `row:{row_number}`. If the progress log already exists, the rows it
+records as done are skipped, so an interrupted run resumes where it stopped.
+
+Attributes:
+    MAX_CONCURRENT_REQUESTS (int): maximum number of concurrent create and update
+        requests
+"""
+import collections
+import concurrent.futures
+import csv
+import itertools
+import logging
+import threading
+import time
+
+from gen3.index import BULK_DOCUMENTS_BATCH_SIZE, Gen3Index
+from gen3.session import create_session
+from gen3.tools.indexing.verify_manifest import manifest_row_parsers
+
+MAX_CONCURRENT_REQUESTS = 24
+
+_DONE_STATUSES = ("created", "updated", "unchanged")
+
+
+def index_object_manifest(
+    commons_url,
+    manifest_file,
+    auth=None,
+    max_concurrent_requests=MAX_CONCURRENT_REQUESTS,
+    manifest_row_parsers=manifest_row_parsers,
+    manifest_file_delimiter=",",
+    progress_log_filename=None,
+    batch_size=BULK_DOCUMENTS_BATCH_SIZE,
+):
+    """
+    Create or update indexd records for all the rows of the manifest file.
+
+    Args:
+        commons_url (str): host url for the commons where indexd lives
+        manifest_file (str): the file to index
+        auth (Gen3Auth): Gen3Auth instance with permission to write to indexd, or a
+            (username, password) tuple for indexd's basic auth
+        max_concurrent_requests (int): maximum number of concurrent create and
+            update requests
+        manifest_row_parsers (Dict{indexd_field:func_to_parse_row}): Row parsers
+        manifest_file_delimiter (str): delimeter in manifest_file
+        progress_log_filename (str): filename for the progress log, defaults to
+            the manifest file name followed by ".index-progress.log"
+        batch_size (int): number of rows to look up in indexd at once
+
+    Returns:
+        Dict[str, int]: number of rows per status, and "skipped" for the rows
+        already done according to the progress log
+    """
+    start_time = time.time()
+    logging.info(f"start time: {start_time}")
+
+    progress_log_filename = (
+        progress_log_filename or f"{manifest_file}.index-progress.log"
+    )
+    done_keys = _get_done_keys(progress_log_filename)
+    if done_keys:
+        logging.info(
+            f"skipping {len(done_keys)} rows already done according to "
+            f"{progress_log_filename}"
+        )
+
+    index = Gen3Index(
+        commons_url, auth, session=create_session(pool_maxsize=max_concurrent_requests)
+    )
+    counts = collections.Counter()
+    lock = threading.Lock()
+    # bounds the number of rows waiting for a thread so that the manifest is
+    # streamed instead of loaded into memory all at once
+    pending_rows = threading.BoundedSemaphore(max_concurrent_requests * 2)
+
+    with open(progress_log_filename, "a", encoding="utf8") as progress_log:
+
+        def _log_progress(key, status, detail=""):
+            detail = _escape_detail(detail)
+            with lock:
+                counts[status] += 1
+                progress_log.write(f"{key}|{status}|{detail}\n")
+                progress_log.flush()
+            if status == "error":
+                logging.error(f"{key}|{status}|{detail}")
+
+        def _index_row_and_log(key, row, record, previous_row=None):
+            try:
+                if previous_row is not None:
+                    # an earlier row has the same guid, apply the rows in order
+                    # instead of racing to create the record
+                    concurrent.futures.wait([previous_row])
+                    record = index.get_record(row["guid"])
+                status, detail = _index_row(index, row, record)
+                _log_progress(key, status, detail)
+            except Exception as exc:
+                _log_progress(key, "error", exc)
+            finally:
+                pending_rows.release()
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrent_requests
+        ) as executor:
+            rows = _get_rows_to_index(
+                manifest_file,
+                manifest_row_parsers,
+                manifest_file_delimiter,
+                done_keys,
+                counts,
+            )
+            # latest submitted row of every guid, until it's done before a lookup
+            rows_by_guid = {}
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+
+                rows_by_guid = {
+                    guid: future
+                    for guid, future in rows_by_guid.items()
+                    if not future.done()
+                }
+                guids = [row["guid"] for _, row in batch if row["guid"]]
+                records = {rec["did"]: rec for rec in index.get_records(guids) or []}
+
+                for key, row in batch:
+                    pending_rows.acquire()
+                    future = executor.submit(
+                        _index_row_and_log,
+                        key,
+                        row,
+                        records.get(row["guid"]),
+                        rows_by_guid.get(row["guid"]),
+                    )
+                    if row["guid"]:
+                        rows_by_guid[row["guid"]] = future
+
+    end_time = time.time()
+    logging.info(f"end time: {end_time}")
+    logging.info(f"run time: {end_time-start_time}")
+    logging.info(f"done indexing {manifest_file}: {dict(counts)}")
+
+    return dict(counts)
+
+
+def _get_done_keys(progress_log_filename):
+    """
+    Return the keys of the rows that the progress log records as done.
+    """
+    done_keys = set()
+    try:
+        with open(progress_log_filename, encoding="utf8") as progress_log:
+            for line_number, line in enumerate(progress_log, start=1):
+                try:
+                    key, status, _ = line.split("|", 2)
+                except ValueError:
+                    logging.warning(
+                        f"skipping unexpected line {line_number} of "
+                        f"{progress_log_filename}: {line!r}"
+                    )
+                    continue
+                if status in _DONE_STATUSES:
+                    done_keys.add(key)
+    except FileNotFoundError:
+        pass
+    return done_keys
+
+
+def _escape_detail(detail):
+    """
+    Return detail as a single line, so that every line of the progress log is a
+    row, even for errors whose message spans several lines.
+    """
+    return str(detail).replace("\\", "\\\\").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _get_rows_to_index(
+    manifest_file, manifest_row_parsers, manifest_file_delimiter, done_keys, counts
+):
+    """
+    Yield (key, parsed fields) for every row of the manifest not done yet.
+    """
+    with open(manifest_file, encoding="utf-8-sig") as csvfile:
+        manifest_reader = csv.DictReader(csvfile, delimiter=manifest_file_delimiter)
+        for row_number, row in enumerate(manifest_reader, start=1):
+            row = {key.strip(" "): value for key, value in row.items()}
+            guid = manifest_row_parsers["guid"](row)
+            key = guid or f"row:{row_number}"
+            if key in done_keys:
+                counts["skipped"] += 1
+                continue
+
+            yield key, {
+                "guid": guid,
+                "urls": manifest_row_parsers["urls"](row),
+                "authz": manifest_row_parsers["authz"](row),
+                "acl": manifest_row_parsers["acl"](row),
+                "md5": manifest_row_parsers["md5"](row),
+                "file_size": manifest_row_parsers["file_size"](row),
+                "file_name": manifest_row_parsers["file_name"](row),
+            }
+
+
+def _index_row(index, row, record):
+    """
+    Create the record of the row if it doesn't exist, or update the fields that
+    differ from the row.
+
+    Args:
+        index (Gen3Index): client to write records with
+        row (dict): fields parsed from a manifest row
+        record (dict): json of the existing index record, None if it doesn't exist
+
+    Returns:
+        Tuple[str, str]: status and details to log
+    """
+    if record is None:
+        record = index.create_record(
+            hashes={"md5": row["md5"]},
+            size=row["file_size"],
+            did=row["guid"],
+            urls=row["urls"],
+            file_name=row["file_name"],
+            acl=row["acl"],
+            authz=row["authz"],
+        )
+        return "created", record["did"]
+
+    if row["md5"] != record["hashes"].get("md5") or row["file_size"] != record["size"]:
+        raise ValueError(
+            f"md5 and size can't be updated, expected {row['md5']} {row['file_size']}"
+            f"|actual {record['hashes'].get('md5')} {record['size']}"
+        )
+
+    changes = {}
+    for field in ["urls", "acl", "authz"]:
+        if sorted(row[field]) != sorted(record[field] or []):
+            changes[field] = row[field]
+    if row["file_name"] and row["file_name"] != record["file_name"]:
+        changes["file_name"] = row["file_name"]
+
+    if not changes:
+        return "unchanged", ""
+
+    index.update_record(record["did"], **changes)
+    return "updated", sorted(changes)
@@ -0,0 +1,319 @@
+"""
+Module for keeping a local snapshot of indexd in a single SQLite file, so bulk jobs
+can look records up offline instead of sending one request per record.
+
+The snapshot is populated from the indexd listing with `IndexSnapshot.sync`. Syncing
+again only rewrites records whose revision changed and removes records that were
+deleted from indexd. Progress is saved after every page, so an interrupted sync
+resumes from its last cursor.
+
+Records can then be looked up by guid, md5 (and size), url or file_name:
+
+```
+from gen3.index import Gen3Index
+from gen3.tools.indexing.index_snapshot import IndexSnapshot
+
+snapshot = IndexSnapshot("indexd-snapshot.db")
+snapshot.sync(Gen3Index(COMMONS))
+
+snapshot.get_record("dg.4503/00000000-0000-0000-0000-000000000000")
+snapshot.get_by_url("s3://bucket/path/to/file.txt")
+```
+
+Attributes:
+    SNAPSHOT_PAGE_SIZE (int): number of records to request per page when syncing
+"""
+import json
+import logging
+import sqlite3
+import time
+
+SNAPSHOT_PAGE_SIZE = 1024
+
+# maximum number of parameters bound in a single SQLite query
+_MAX_QUERY_PARAMETERS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    did TEXT PRIMARY KEY,
+    rev TEXT,
+    md5 TEXT,
+    size INTEGER,
+    file_name TEXT,
+    updated_date TEXT,
+    sync_id INTEGER,
+    record TEXT
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT,
+    did TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS records_md5_size ON records (md5, size);
+CREATE INDEX IF NOT EXISTS records_file_name ON records (file_name);
+CREATE INDEX IF NOT EXISTS records_updated_date ON records (updated_date);
+CREATE INDEX IF NOT EXISTS records_sync_id ON records (sync_id);
+CREATE INDEX IF NOT EXISTS urls_url ON urls (url);
+CREATE INDEX IF NOT EXISTS urls_did ON urls (did);
+"""
+
+
+class IndexSnapshot:
+    """
+    Local snapshot of indexd records stored in a SQLite file.
+
+    Lookup methods return the same json records as Gen3Index, so a snapshot can
+    stand in for Gen3Index in read-only jobs. An instance must only be used by one
+    thread, open one per process or thread instead.
+
+    Args:
+        filename (str): path to the SQLite file, created if it doesn't exist
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._connection = sqlite3.connect(filename)
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    ### Sync
+
+    def sync(self, index, page_size=SNAPSHOT_PAGE_SIZE):
+        """
+        Bring the snapshot up to date with indexd.
+
+        Walks the indexd listing with `start` cursors. Records whose revision didn't
+        change are only marked as seen, others are written. Once the whole listing
+        is walked, records that weren't seen are removed since they were deleted
+        from indexd.
+
+        Args:
+            index (Gen3Index): client for the indexd to snapshot
+            page_size (int): number of records to request per page
+
+        Returns:
+            dict: number of records "added", "updated", "unchanged" and "deleted"
+        """
+        cursor = self._get_state("cursor")
+        sync_id = self._get_state("sync_id")
+        if cursor is not None and sync_id is not None:
+            sync_id = int(sync_id)
+            logging.info(f"resuming interrupted snapshot sync after {cursor}")
+            counts = json.loads(self._get_state("counts"))
+        else:
+            sync_id = int(self._get_state("sync_id") or 0) + 1
+            cursor = None
+            counts = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+
+        for records in index.iter_all_records(
+            limit=page_size, start=cursor, yield_pages=True, prefetch=True
+        ):
+            with self._connection:
+                self._write_page(records, sync_id, counts)
+                self._set_state("cursor", records[-1]["did"])
+                self._set_state("sync_id", str(sync_id))
+                self._set_state("counts", json.dumps(counts))
+            logging.debug(f"synced snapshot up to {records[-1]['did']}: {counts}")
+
+        with self._connection:
+            stale_dids = "SELECT did FROM records WHERE sync_id != ?"
+            self._connection.execute(
+                f"DELETE FROM urls WHERE did IN ({stale_dids})", (sync_id,)
+            )
+            counts["deleted"] = self._connection.execute(
+                "DELETE FROM records WHERE sync_id != ?", (sync_id,)
+            ).rowcount
+            self._connection.execute(
+                "DELETE FROM sync_state WHERE key IN ('cursor', 'counts')"
+            )
+            self._set_state("sync_id", str(sync_id))
+            self._set_state("last_sync_time", str(time.time()))
+
+        logging.info(f"done syncing snapshot {self.filename}: {counts}")
+        return counts
+
+    def _write_page(self, records, sync_id, counts):
+        revs = dict(
+            self._query_in(
+                "SELECT did, rev FROM records WHERE did IN ({})",
+                [record["did"] for record in records],
+            )
+        )
+        unchanged_dids = []
+        for record in records:
+            did = record["did"]
+            if did in revs and revs[did] == record.get("rev"):
+                unchanged_dids.append((sync_id, did))
+                counts["unchanged"] += 1
+                continue
+
+            counts["updated" if did in revs else "added"] += 1
+            self._connection.execute(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    did,
+                    record.get("rev"),
+                    (record.get("hashes") or {}).get("md5"),
+                    record.get("size"),
+                    record.get("file_name"),
+                    record.get("updated_date"),
+                    sync_id,
+                    json.dumps(record),
+                ),
+            )
+            self._connection.execute("DELETE FROM urls WHERE did = ?", (did,))
+            self._connection.executemany(
+                "INSERT INTO urls VALUES (?, ?)",
+                [(url, did) for url in record.get("urls") or []],
+            )
+
+        self._connection.executemany(
+            "UPDATE records SET sync_id = ? WHERE did = ?", unchanged_dids
+        )
+
+    def _get_state(self, key):
+        row = self._connection.execute(
+            "SELECT value FROM sync_state WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (key, value)
+        )
+
+    ### Lookups
+
+    def get_record(self, guid):
+        """
+        Get the record with the given guid.
+
+        Args:
+            guid (str): record id
+
+        Returns:
+            dict: json representing the index record, None if it doesn't exist
+        """
+        row = self._connection.execute(
+            "SELECT record FROM records WHERE did = ?", (guid,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_records(self, dids, return_missing=False):
+        """
+        Get the records of the given dids.
+
+        Args:
+            dids (list): record ids
+            return_missing (bool): also return the dids that aren't in the snapshot
+
+        Returns:
+            list: json representing index records, in the order of the dids
+            (list, list): records and missing dids, if return_missing
+        """
+        dids = list(dids)
+        records_by_did = {
+            did: json.loads(record)
+            for did, record in self._query_in(
+                "SELECT did, record FROM records WHERE did IN ({})", dids
+            )
+        }
+        records = [records_by_did[did] for did in dids if did in records_by_did]
+        if return_missing:
+            return records, [did for did in dids if did not in records_by_did]
+        return records
+
+    def get_by_md5(self, md5, size=None):
+        """
+        Get the records with the given md5 and, optionally, size.
+
+        Returns:
+            List[dict]: json representing index records
+        """
+        if size is None:
+            rows = self._connection.execute(
+                "SELECT record FROM records WHERE md5 = ?", (md5,)
+            )
+        else:
+            rows = self._connection.execute(
+                "SELECT record FROM records WHERE md5 = ? AND size = ?", (md5, size)
+            )
+        return [json.loads(row[0]) for row in rows]
+
+    def get_by_url(self, url):
+        """
+        Get the records with the given url among their urls.
+
+        Returns:
+            List[dict]: json representing index records
+        """
+        rows = self._connection.execute(
+            "SELECT record FROM records WHERE did IN "
+            "(SELECT did FROM urls WHERE url = ?)",
+            (url,),
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def get_by_file_name(self, file_name):
+        """
+        Get the records with the given file_name.
+
+        Returns:
+            List[dict]: json representing index records
+        """
+        rows = self._connection.execute(
+            "SELECT record FROM records WHERE file_name = ?", (file_name,)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def get_updated_since(self, updated_date):
+        """
+        Get the records updated after the given date, as of the last sync.
+
+        Args:
+            updated_date (str): indexd date, like "2020-01-31T00:00:00.000000"
+
+        Returns:
+            List[dict]: json representing index records
+        """
+        rows = self._connection.execute(
+            "SELECT record FROM records WHERE updated_date > ? ORDER BY did",
+            (updated_date,),
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_all_records(self):
+        """
+        Iterate over all the records in the snapshot, sorted by did.
+
+        Yields:
+            dict: json representing index records
+        """
+        for row in self._connection.execute("SELECT record FROM records ORDER BY did"):
+            yield json.loads(row[0])
+
+    def _query_in(self, query, values):
+        """
+        Run a query with an `IN ({})` clause over any number of values, in chunks
+        that fit SQLite's parameter limit.
+        """
+        rows = []
+        for i in range(0, len(values), _MAX_QUERY_PARAMETERS):
+            chunk = values[i : i + _MAX_QUERY_PARAMETERS]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(self._connection.execute(query.format(placeholders), chunk))
+        return rows
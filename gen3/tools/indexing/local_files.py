@@ -0,0 +1,307 @@
+"""
+Module for verifying that data files on a local or network disk match the md5 and
+file_size of their rows in a manifest, for example before indexing the manifest.
+Supports hashing files in parallel using a pool of processes.
+
+The manifest is parsed with the same `manifest_row_parsers` as `verify_manifest`.
+The file of a row is found with `local_path_parser`, by default the file_name of the
+row in `data_directory`.
+
+The size of a file is checked first, so files with the wrong size aren't hashed.
+Hashes are read in large chunks and can be cached in a SQLite file, keyed by the
+path, modification time and size of the file, so checking the same files again only
+hashes the ones that changed:
+
+```
+from gen3.tools.indexing.local_files import verify_local_files
+
+verify_local_files(
+    "object-manifest.csv",
+    data_directory="/mnt/data",
+    hash_cache_filename="md5-cache.db",
+)
+```
+
+The output is a file containing any errors in the format of `verify_manifest`:
+
+{guid}|{error_name}|expected {value_from_manifest}|actual {value_from_file}
+ex: dg.TEST/f2a39f98-6ae1-48a5-8d48-825a0c52a22b|md5|expected a1234567891234567890123456789012|actual b1234567891234567890123456789012
+
+where error_name is file_size, md5 or no_file. Rows without a guid are logged as
+`row:{row_number}`.
+
+Attributes:
+    HASH_BUFFER_SIZE (int): number of bytes read at once when hashing a file
+    PENDING_FILES_PER_PROCESS (int): number of files queued for each process, so
+        that the manifest is streamed instead of loaded into memory
+"""
+import collections
+import concurrent.futures
+import csv
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from gen3.tools.indexing.verify_manifest import (
+    ErrorReport,
+    format_error,
+    get_summary,
+    manifest_row_parsers,
+    parse_manifest_row,
+)
+
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+PENDING_FILES_PER_PROCESS = 4
+# number of hashes cached between commits, so that an interrupted run keeps them
+HASH_CACHE_COMMIT_INTERVAL = 1000
+
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT,
+    mtime_ns INTEGER,
+    size INTEGER,
+    md5 TEXT,
+    PRIMARY KEY (path, mtime_ns, size)
+);
+"""
+
+
+def verify_local_files(
+    manifest_file,
+    data_directory=".",
+    num_processes=None,
+    manifest_row_parsers=manifest_row_parsers,
+    manifest_file_delimiter=",",
+    local_path_parser=None,
+    log_output_filename=f"verify-local-files-errors-{time.time()}.log",
+    report_filename=None,
+    hash_cache_filename=None,
+):
+    """
+    Verify that the local file of every row of the manifest has the md5 and size of
+    the row.
+
+    Args:
+        manifest_file (str): the file to verify against
+        data_directory (str): directory the file_names of the rows are relative to
+        num_processes (int): number of parallel python processes hashing files,
+            defaults to the number of CPUs
+        manifest_row_parsers (Dict{indexd_field:func_to_parse_row}): Row parsers
+        manifest_file_delimiter (str): delimeter in manifest_file
+        local_path_parser (func_to_parse_row): returns the path of the file of a
+            row, instead of its file_name in data_directory
+        log_output_filename (str): filename for output logs
+        report_filename (str): also write the errors to this structured report,
+            see `verify_manifest.verify_object_manifest`
+        hash_cache_filename (str): SQLite file to cache hashes in, created if it
+            doesn't exist
+
+    Returns:
+        dict: summary of the verification, with the numbers of files "hashed" and
+        of hashes read from the cache ("cached")
+    """
+    start_time = time.time()
+    logging.info(f"start time: {start_time}")
+
+    cache = _HashCache(hash_cache_filename) if hash_cache_filename else None
+    report = ErrorReport(report_filename) if report_filename else None
+    num_processes = num_processes or os.cpu_count()
+    error_counts = collections.Counter()
+    counts = collections.Counter()
+
+    def _log_errors(row_number, key, errors):
+        if errors:
+            counts["rows_with_errors"] += 1
+        for error_name, expected, actual in errors:
+            error_counts[error_name] += 1
+            output = format_error(key, error_name, expected, actual)
+            outfile.write(output)
+            logging.error(output)
+            if report:
+                report.write(
+                    {
+                        "row": row_number,
+                        "guid": key,
+                        "error": error_name,
+                        "expected": expected,
+                        "actual": actual,
+                    }
+                )
+
+    def _finish_check(row_number, key, errors, hashing):
+        if hashing:
+            path, stat, expected_md5, future = hashing
+            try:
+                md5 = future.result()
+            except OSError as exc:
+                errors = [("no_file", path, exc)]
+            else:
+                counts["hashed"] += 1
+                if cache:
+                    cache.set(path, stat, md5)
+                if md5 != expected_md5.lower():
+                    errors = [("md5", expected_md5, md5)]
+        _log_errors(row_number, key, errors)
+
+    try:
+        with open(
+            log_output_filename, "w", encoding="utf8"
+        ) as outfile, concurrent.futures.ProcessPoolExecutor(
+            max_workers=num_processes
+        ) as executor:
+            # checks in the order of the manifest, so that errors are written in
+            # that order even though files are hashed concurrently
+            pending_checks = collections.deque()
+
+            for row_number, row in _iter_manifest_rows(
+                manifest_file, manifest_file_delimiter
+            ):
+                counts["rows"] += 1
+                expected = parse_manifest_row(row, manifest_row_parsers)
+                key = expected["guid"] or f"row:{row_number}"
+                if local_path_parser:
+                    path = local_path_parser(row)
+                else:
+                    path = os.path.join(data_directory, expected["file_name"] or "")
+
+                errors, md5_to_hash = _check_file_without_hashing(
+                    path, expected, cache, counts
+                )
+                hashing = None
+                if md5_to_hash:
+                    stat, expected_md5 = md5_to_hash
+                    future = executor.submit(get_file_md5, path)
+                    hashing = (path, stat, expected_md5, future)
+                pending_checks.append((row_number, key, errors, hashing))
+
+                max_pending_checks = num_processes * PENDING_FILES_PER_PROCESS
+                while len(pending_checks) >= max_pending_checks:
+                    _finish_check(*pending_checks.popleft())
+
+            while pending_checks:
+                _finish_check(*pending_checks.popleft())
+    finally:
+        if report:
+            report.close()
+        if cache:
+            cache.close()
+
+    summary = get_summary(
+        counts["rows"],
+        counts["rows"],
+        counts["rows_with_errors"],
+        dict(sorted(error_counts.items())),
+    )
+    summary.update(hashed=counts["hashed"], cached=counts["cached"])
+    logging.info(f"verification summary: {summary}")
+    if report_filename:
+        with open(report_filename + ".summary.json", "w", encoding="utf8") as file:
+            json.dump(summary, file, indent=2)
+
+    end_time = time.time()
+    logging.info(f"end time: {end_time}")
+    logging.info(f"run time: {end_time-start_time}")
+
+    return summary
+
+
+def _check_file_without_hashing(path, expected, cache, counts):
+    """
+    Check everything about the file of a row that doesn't need hashing it.
+
+    Returns:
+        Tuple[List[Tuple[str, Any, Any]], Tuple[os.stat_result, str]]: errors found,
+        and the stat of the file and its expected md5 if it still needs hashing
+    """
+    try:
+        stat = os.stat(path)
+    except OSError as exc:
+        return [("no_file", path, exc)], None
+
+    expected_size = expected["file_size"]
+    if expected_size not in (None, "") and stat.st_size != expected_size:
+        # no need to hash a file of the wrong size
+        return [("file_size", expected_size, stat.st_size)], None
+
+    if not expected["md5"]:
+        return [], None
+
+    md5 = cache.get(path, stat) if cache else None
+    if md5 is None:
+        return [], (stat, expected["md5"])
+
+    counts["cached"] += 1
+    if md5 != expected["md5"].lower():
+        return [("md5", expected["md5"], md5)], None
+    return [], None
+
+
+def get_file_md5(path):
+    """
+    Return the md5 sum of a file, reading it in chunks of HASH_BUFFER_SIZE bytes.
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        str: hex md5 sum of the file
+    """
+    md5 = hashlib.md5()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as file:
+        while True:
+            size = file.readinto(buffer)
+            if not size:
+                break
+            md5.update(view[:size])
+    return md5.hexdigest()
+
+
+def _iter_manifest_rows(manifest_file, manifest_file_delimiter):
+    """
+    Yield (row number, row) for every row of the manifest.
+    """
+    with open(manifest_file, encoding="utf-8-sig") as csvfile:
+        manifest_reader = csv.DictReader(csvfile, delimiter=manifest_file_delimiter)
+        for row_number, row in enumerate(manifest_reader, start=1):
+            yield row_number, {key.strip(" "): value for key, value in row.items()}
+
+
+class _HashCache:
+    """
+    md5 sums of files stored in a SQLite file, keyed by path, modification time and
+    size so that a file that changed is hashed again.
+
+    Hashes are committed every HASH_CACHE_COMMIT_INTERVAL new hashes, so that they
+    aren't lost if the run is interrupted.
+    """
+
+    def __init__(self, filename):
+        self._connection = sqlite3.connect(filename)
+        self._connection.executescript(_CACHE_SCHEMA)
+        self._uncommitted = 0
+
+    def get(self, path, stat):
+        row = self._connection.execute(
+            "SELECT md5 FROM hashes WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (os.path.abspath(path), stat.st_mtime_ns, stat.st_size),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, path, stat, md5):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+            (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, md5),
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= HASH_CACHE_COMMIT_INTERVAL:
+            self._connection.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
@@ -0,0 +1,423 @@
+"""
+Module for comparing object manifests without loading them into memory.
+
+Manifests are sorted by guid with an external merge sort (sorted chunks spilled to
+temporary files, then merged), and the sorted manifests are walked side by side
+with a merge join. Memory use only depends on `SORT_CHUNK_SIZE`, not on the size of
+the manifests.
+
+`write_delta_manifests` compares a previous export of indexd with a current one
+and writes the records that were added, changed or deleted to three manifests:
+
+```
+from gen3.tools.indexing.manifest_diff import write_delta_manifests
+
+write_delta_manifests(
+    "object-manifest-yesterday.csv",
+    "object-manifest-today.csv",
+    output_filename="object-manifest-delta.csv",
+)
+# writes object-manifest-delta.added.csv, object-manifest-delta.changed.csv
+# and object-manifest-delta.deleted.csv
+```
+
+`verify_object_manifest_offline` verifies a manifest against a manifest downloaded
+from indexd with `download_manifest`, instead of requesting indexd, and writes the
+same errors as `verify_manifest.verify_object_manifest`:
+
+```
+from gen3.tools.indexing.manifest_diff import verify_object_manifest_offline
+
+verify_object_manifest_offline("expected-manifest.csv", "object-manifest.csv")
+```
+
+Attributes:
+    SORT_CHUNK_SIZE (int): maximum number of records sorted in memory at once
+    DELTA_CHANGES (List[str]): kinds of changes in a delta
+"""
+import collections
+import csv
+import heapq
+import io
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+
+from gen3.tools.indexing.index_snapshot import IndexSnapshot
+from gen3.tools.indexing.manifest_writers import (
+    LIST_FIELDS,
+    MANIFEST_FIELDS,
+    get_manifest_format,
+    get_manifest_record,
+    get_manifest_writer,
+    open_compressed,
+    pyarrow,
+)
+from gen3.tools.indexing.verify_manifest import (
+    compare_manifest_records,
+    format_error,
+    manifest_row_parsers,
+)
+
+SORT_CHUNK_SIZE = 500000
+DELTA_CHANGES = ["added", "changed", "deleted"]
+
+
+def read_manifest_records(
+    manifest_file,
+    manifest_row_parsers=manifest_row_parsers,
+    manifest_file_delimiter=",",
+):
+    """
+    Iterate over the records of a manifest in any of the formats of
+    `manifest_writers`.
+
+    Args:
+        manifest_file (str): path of the manifest
+        manifest_row_parsers (Dict{indexd_field:func_to_parse_row}): Row parsers,
+            only used for CSV manifests
+        manifest_file_delimiter (str): delimeter in manifest_file, only used for CSV
+            manifests
+
+    Yields:
+        dict: manifest records with the fields of `MANIFEST_FIELDS`
+    """
+    manifest_format = get_manifest_format(manifest_file)
+
+    if manifest_format == "parquet":
+        if pyarrow is None:
+            raise ImportError("pyarrow is required to read Parquet manifests")
+        for batch in pyarrow.parquet.ParquetFile(manifest_file).iter_batches():
+            yield from batch.to_pylist()
+        return
+
+    with open_compressed(manifest_file, "rb") as binary_file:
+        manifest = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+        if manifest_format == "jsonl":
+            for line in manifest:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        manifest_reader = csv.DictReader(manifest, delimiter=manifest_file_delimiter)
+        for row in manifest_reader:
+            row = {key.strip(" "): value for key, value in row.items()}
+            yield {
+                "guid": manifest_row_parsers["guid"](row),
+                "urls": manifest_row_parsers["urls"](row),
+                "authz": manifest_row_parsers["authz"](row),
+                "acl": manifest_row_parsers["acl"](row),
+                "md5": manifest_row_parsers["md5"](row) or None,
+                "file_size": manifest_row_parsers["file_size"](row),
+                "file_name": manifest_row_parsers["file_name"](row) or None,
+            }
+
+
+def sort_records_by_guid(records, chunk_size=None):
+    """
+    Sort manifest records by guid, spilling sorted chunks to temporary files when
+    there are more than chunk_size records.
+
+    Args:
+        records (Iterable[dict]): manifest records
+        chunk_size (int, optional): maximum number of records sorted in memory at
+            once, defaults to SORT_CHUNK_SIZE
+
+    Yields:
+        dict: the records, sorted by guid
+    """
+    chunks = _iter_chunks(records, chunk_size or SORT_CHUNK_SIZE)
+    first_chunk = next(chunks, [])
+    second_chunk = next(chunks, None)
+    if second_chunk is None:
+        yield from sorted(first_chunk, key=_get_guid)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        chunk_files = []
+        for number, chunk in enumerate(
+            itertools.chain([first_chunk, second_chunk], chunks)
+        ):
+            chunk_file = os.path.join(directory, f"{number}.jsonl")
+            with open(chunk_file, "w", encoding="utf8") as file:
+                for record in sorted(chunk, key=_get_guid):
+                    file.write(json.dumps(record) + "\n")
+            chunk_files.append(chunk_file)
+        logging.debug(f"merging {len(chunk_files)} sorted chunks")
+
+        yield from heapq.merge(*map(_read_chunk, chunk_files), key=_get_guid)
+
+
+def merge_join_records(left_records, right_records):
+    """
+    Pair the records of two iterables sorted by guid.
+
+    Args:
+        left_records (Iterable[dict]): records sorted by guid
+        right_records (Iterable[dict]): records sorted by guid
+
+    Yields:
+        Tuple[str, dict, dict]: guid, and its left and right records, None on the
+        side it's missing from
+    """
+    left_records = iter(left_records)
+    right_records = iter(right_records)
+    left = next(left_records, None)
+    right = next(right_records, None)
+
+    while left is not None or right is not None:
+        if right is None or (left is not None and _get_guid(left) < _get_guid(right)):
+            yield _get_guid(left), left, None
+            left = next(left_records, None)
+        elif left is None or _get_guid(right) < _get_guid(left):
+            yield _get_guid(right), None, right
+            right = next(right_records, None)
+        else:
+            yield _get_guid(left), left, right
+            left = next(left_records, None)
+            right = next(right_records, None)
+
+
+def diff_manifest_records(previous_records, current_records, chunk_size=None):
+    """
+    Compare two sets of manifest records.
+
+    Args:
+        previous_records (Iterable[dict]): manifest records of the previous export,
+            or indexd records, which are converted to manifest records
+        current_records (Iterable[dict]): manifest records of the current export,
+            or indexd records
+        chunk_size (int, optional): maximum number of records sorted in memory at
+            once, defaults to SORT_CHUNK_SIZE
+
+    Yields:
+        Tuple[str, dict]: "added", "changed" or "deleted", and the current record,
+        or the previous one if it was deleted. Sorted by guid.
+    """
+    for _, previous, current in merge_join_records(
+        sort_records_by_guid(map(_as_manifest_record, previous_records), chunk_size),
+        sort_records_by_guid(map(_as_manifest_record, current_records), chunk_size),
+    ):
+        if previous is None:
+            yield "added", current
+        elif current is None:
+            yield "deleted", previous
+        elif records_differ(previous, current):
+            yield "changed", current
+
+
+def records_differ(previous, current):
+    """
+    Return whether two manifest records of the same guid differ, ignoring the
+    order of list fields.
+    """
+    for field in MANIFEST_FIELDS:
+        if field in LIST_FIELDS:
+            if sorted(previous.get(field) or []) != sorted(current.get(field) or []):
+                return True
+        elif previous.get(field) != current.get(field):
+            return True
+    return False
+
+
+def write_delta_manifests(
+    previous_manifest,
+    current_manifest,
+    output_filename,
+    output_format=None,
+    manifest_row_parsers=manifest_row_parsers,
+    manifest_file_delimiter=",",
+    chunk_size=None,
+):
+    """
+    Write the records added, changed and deleted between two exports of indexd to
+    three manifests.
+
+    Args:
+        previous_manifest (str|IndexSnapshot|Iterable[dict]): path of the previous
+            manifest, a snapshot of indexd, or manifest or indexd records
+        current_manifest (str|IndexSnapshot|Iterable[dict]): path of the current
+            manifest, a snapshot of indexd, or manifest or indexd records
+        output_filename (str): filename the delta manifest names are derived from,
+            see `get_delta_filenames`
+        output_format (str, optional): key of `manifest_writers.manifest_writers`,
+            guessed from the extension of output_filename if not provided
+        manifest_row_parsers (Dict{indexd_field:func_to_parse_row}): Row parsers for
+            CSV manifests
+        manifest_file_delimiter (str): delimeter in CSV manifests
+        chunk_size (int, optional): maximum number of records sorted in memory at
+            once, defaults to SORT_CHUNK_SIZE
+
+    Returns:
+        Dict[str, int]: number of records "added", "changed" and "deleted"
+    """
+    previous_manifest = _get_records(
+        previous_manifest, manifest_row_parsers, manifest_file_delimiter
+    )
+    current_manifest = _get_records(
+        current_manifest, manifest_row_parsers, manifest_file_delimiter
+    )
+
+    filenames = get_delta_filenames(output_filename)
+    counts = dict.fromkeys(DELTA_CHANGES, 0)
+    writers = {}
+    try:
+        for change in DELTA_CHANGES:
+            writers[change] = get_manifest_writer(filenames[change], output_format)
+        for change, record in diff_manifest_records(
+            previous_manifest, current_manifest, chunk_size
+        ):
+            writers[change].write_records([record])
+            counts[change] += 1
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    logging.info(f"wrote delta manifests {list(filenames.values())}: {counts}")
+    return counts
+
+
+def verify_object_manifest_offline(
+    manifest_file,
+    indexd_manifest_file,
+    log_output_filename=f"verify-manifest-errors-{time.time()}.log",
+    manifest_row_parsers=manifest_row_parsers,
+    manifest_file_delimiter=",",
+    chunk_size=None,
+):
+    """
+    Verify the records of a manifest against a manifest of all the records in
+    indexd, like the one written by `download_manifest`, without sending any
+    request to indexd.
+
+    Both manifests are sorted by guid and merge joined, so manifests larger than
+    memory can be verified. Errors are written sorted by guid, in the format of
+    `verify_manifest`:
+
+    {guid}|{error_name}|expected {value_from_manifest}|actual {value_from_indexd}
+
+    Args:
+        manifest_file (str): the file to verify
+        indexd_manifest_file (str): manifest of the records in indexd, in any format
+            of `manifest_writers`
+        log_output_filename (str): filename for output logs
+        manifest_row_parsers (Dict{indexd_field:func_to_parse_row}): Row parsers for
+            manifest_file
+        manifest_file_delimiter (str): delimeter in manifest_file
+        chunk_size (int, optional): maximum number of records sorted in memory at
+            once, defaults to SORT_CHUNK_SIZE
+
+    Returns:
+        Dict[str, int]: number of errors per error name
+    """
+    expected_records = read_manifest_records(
+        manifest_file, manifest_row_parsers, manifest_file_delimiter
+    )
+    actual_records = read_manifest_records(indexd_manifest_file)
+
+    error_counts = collections.Counter()
+    matched_guid = matched_record = None
+    with open(log_output_filename, "w", encoding="utf8") as output:
+        for guid, expected, actual in merge_join_records(
+            sort_records_by_guid(expected_records, chunk_size),
+            sort_records_by_guid(actual_records, chunk_size),
+        ):
+            if expected is None:
+                # not in the manifest, nothing to verify
+                continue
+            if actual is None and guid and guid == matched_guid:
+                # the guid is in the manifest more than once
+                actual = matched_record
+            matched_guid, matched_record = guid, actual
+
+            if actual is None:
+                errors = [
+                    (
+                        "no_record",
+                        expected,
+                        f"could not find record for GUID {guid} in "
+                        f"{indexd_manifest_file}",
+                    )
+                ]
+            else:
+                errors = compare_manifest_records(expected, actual)
+
+            for error_name, expected_value, actual_value in errors:
+                error_counts[error_name] += 1
+                output.write(
+                    format_error(guid, error_name, expected_value, actual_value)
+                )
+
+    logging.info(f"wrote errors to {log_output_filename}: {dict(error_counts)}")
+    return dict(error_counts)
+
+
+def get_delta_filenames(output_filename):
+    """
+    Return the names of the delta manifests, with the kind of change inserted
+    before the extensions of output_filename.
+
+    Args:
+        output_filename (str): like "object-manifest-delta.csv.gz"
+
+    Returns:
+        Dict[str, str]: like {"added": "object-manifest-delta.added.csv.gz", ...}
+    """
+    directory, name = os.path.split(output_filename)
+    stem, dot, extensions = name.partition(".")
+    return {
+        change: os.path.join(directory, f"{stem}.{change}{dot}{extensions}")
+        for change in DELTA_CHANGES
+    }
+
+
+def _get_guid(record):
+    return record.get("guid") or ""
+
+
+def _get_records(manifest, manifest_row_parsers, manifest_file_delimiter):
+    """
+    Return the records of a manifest path or an IndexSnapshot, or the records
+    themselves.
+    """
+    if isinstance(manifest, str):
+        return read_manifest_records(
+            manifest, manifest_row_parsers, manifest_file_delimiter
+        )
+    if isinstance(manifest, IndexSnapshot):
+        return manifest.iter_all_records()
+    return manifest
+
+
+def _as_manifest_record(record):
+    """
+    Return the manifest record of an indexd record, keyed by "did", and manifest
+    records as they are.
+
+    Raises:
+        ValueError: if the record has neither a "guid" nor a "did", so it can't be
+            compared
+    """
+    if "guid" in record:
+        return record
+    if "did" in record:
+        return get_manifest_record(record)
+    raise ValueError(f"record has neither a guid nor a did: {record}")
+
+
+def _iter_chunks(records, chunk_size):
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _read_chunk(chunk_file):
+    with open(chunk_file, encoding="utf8") as file:
+        for line in file:
+            yield json.loads(line)
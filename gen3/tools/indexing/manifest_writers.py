@@ -0,0 +1,307 @@
+"""
+Module for writing object manifests in different file formats.
+
+The format is picked from the extension of the output file:
+
+    - `.csv` (and any unknown extension): Comma-Separated Value file with a header
+      row, list fields (urls, authz and acl) separated with spaces
+    - `.jsonl`, `.ndjson`: JSON Lines, one object per record with list fields as
+      JSON arrays
+    - `.parquet`: Parquet with list-typed urls, authz and acl columns, requires
+      `pyarrow`
+
+CSV and JSON Lines files are compressed if the name also ends with `.gz`, or
+`.zst` which requires `zstandard`. For example, `object-manifest.jsonl.gz`.
+
+Writers are looked up by format name in `manifest_writers`, so you can add your
+own or replace the default ones:
+
+```
+from gen3.tools.indexing.manifest_writers import ManifestWriter, manifest_writers
+
+class TSVManifestWriter(ManifestWriter):
+    ...
+
+manifest_writers["tsv"] = TSVManifestWriter
+```
+
+Attributes:
+    MANIFEST_FIELDS (List[str]): fields of a manifest record, in order
+    LIST_FIELDS (List[str]): fields whose values are lists
+    WRITE_BATCH_SIZE (int): number of records per Parquet row group
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    # only needed to write Parquet manifests
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:
+    # only needed for zstd compressed manifests
+    zstandard = None
+
+MANIFEST_FIELDS = ["guid", "urls", "authz", "acl", "md5", "file_size", "file_name"]
+LIST_FIELDS = ["urls", "authz", "acl"]
+WRITE_BATCH_SIZE = 100000
+
+_CSV_HEADER = "guid, urls, authz, acl, md5, file_size, file_name\n"
+
+
+class ManifestWriter:
+    """
+    Base class for writing manifest records to a file.
+
+    Subclasses implement `write_records`, and can override `write_csv_file` when
+    they can copy CSV rows faster than by parsing them.
+
+    Args:
+        file_name (str): path of the file to write
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_records(self, records):
+        """
+        Args:
+            records (Iterable[dict]): manifest records, see `get_manifest_record`
+        """
+        raise NotImplementedError()
+
+    def write_csv_file(self, file_name):
+        """
+        Write the rows of a header-less CSV file written by `download_manifest`.
+
+        Args:
+            file_name (str): path of the CSV file
+        """
+        self.write_records(iter_csv_file_records(file_name))
+
+    def close(self):
+        pass
+
+
+class CSVManifestWriter(ManifestWriter):
+    """
+    Write a CSV manifest with a header row, compressed depending on the extension.
+    """
+
+    def __init__(self, file_name):
+        super().__init__(file_name)
+        self._file = open_compressed(file_name)
+        self._file.write(_CSV_HEADER.encode("utf8"))
+        self._text = io.TextIOWrapper(
+            self._file, encoding="utf8", newline="", write_through=True
+        )
+        self._csv_writer = csv.writer(self._text)
+
+    def write_records(self, records):
+        self._csv_writer.writerows(
+            [
+                " ".join(record[field] or []) if field in LIST_FIELDS else record[field]
+                for field in MANIFEST_FIELDS
+            ]
+            for record in records
+        )
+
+    def write_csv_file(self, file_name):
+        with open(file_name, "rb") as csv_file:
+            shutil.copyfileobj(csv_file, self._file)
+
+    def close(self):
+        self._text.detach()
+        self._file.close()
+
+
+class JSONLinesManifestWriter(ManifestWriter):
+    """
+    Write a JSON Lines manifest, compressed depending on the extension.
+    """
+
+    def __init__(self, file_name):
+        super().__init__(file_name)
+        self._file = open_compressed(file_name)
+
+    def write_records(self, records):
+        self._file.write(
+            "".join(json.dumps(record) + "\n" for record in records).encode("utf8")
+        )
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetManifestWriter(ManifestWriter):
+    """
+    Write a Parquet manifest with list-typed urls, authz and acl columns.
+    """
+
+    def __init__(self, file_name):
+        if pyarrow is None:
+            raise ImportError("pyarrow is required to write Parquet manifests")
+        super().__init__(file_name)
+        self._schema = pyarrow.schema(
+            [
+                ("guid", pyarrow.string()),
+                ("urls", pyarrow.list_(pyarrow.string())),
+                ("authz", pyarrow.list_(pyarrow.string())),
+                ("acl", pyarrow.list_(pyarrow.string())),
+                ("md5", pyarrow.string()),
+                ("file_size", pyarrow.int64()),
+                ("file_name", pyarrow.string()),
+            ]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(file_name, self._schema)
+        self._batch = []
+
+    def write_records(self, records):
+        for record in records:
+            self._batch.append(record)
+            if len(self._batch) >= WRITE_BATCH_SIZE:
+                self._write_batch()
+
+    def _write_batch(self):
+        if self._batch:
+            self._writer.write_table(
+                pyarrow.Table.from_pylist(self._batch, schema=self._schema)
+            )
+            self._batch = []
+
+    def close(self):
+        self._write_batch()
+        self._writer.close()
+
+
+manifest_writers = {
+    "csv": CSVManifestWriter,
+    "jsonl": JSONLinesManifestWriter,
+    "parquet": ParquetManifestWriter,
+}
+
+
+def get_manifest_writer(file_name, output_format=None):
+    """
+    Create the writer for the format of the file.
+
+    Args:
+        file_name (str): path of the file to write
+        output_format (str, optional): key of `manifest_writers`, guessed from the
+            extension of file_name if not provided
+
+    Returns:
+        ManifestWriter: writer for the file
+    """
+    output_format = output_format or get_manifest_format(file_name)
+    return manifest_writers[output_format](file_name)
+
+
+def get_manifest_format(file_name):
+    """
+    Guess the format of a manifest from the extension of its name.
+
+    Args:
+        file_name (str): path of the manifest
+
+    Returns:
+        str: key of `manifest_writers`, "csv" if the extension is unknown
+    """
+    root, extension = os.path.splitext(file_name.lower())
+    if extension in (".gz", ".zst"):
+        extension = os.path.splitext(root)[1]
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".parquet":
+        return "parquet"
+    return "csv"
+
+
+def get_manifest_record(record):
+    """
+    Return the manifest record of an indexd record.
+
+    Args:
+        record (dict): json representing an index record
+
+    Returns:
+        dict: guid, urls, authz, acl, md5, file_size and file_name
+    """
+    return {
+        "guid": record.get("did"),
+        "urls": record.get("urls") or [],
+        "authz": record.get("authz") or [],
+        "acl": record.get("acl") or [],
+        "md5": (record.get("hashes") or {}).get("md5"),
+        "file_size": record.get("size"),
+        "file_name": record.get("file_name"),
+    }
+
+
+def iter_csv_file_records(file_name):
+    """
+    Iterate over the manifest records of a header-less CSV file written by
+    `download_manifest`.
+
+    Args:
+        file_name (str): path of the CSV file
+
+    Yields:
+        dict: manifest records
+    """
+    with open(file_name, encoding="utf8", newline="") as csv_file:
+        yield from map(_parse_csv_row, csv.reader(csv_file))
+
+
+def _parse_csv_row(row):
+    """
+    Return the manifest record of a CSV manifest row, with list fields split and
+    empty values as None.
+    """
+    record = {}
+    for field, value in zip(MANIFEST_FIELDS, row):
+        if field in LIST_FIELDS:
+            record[field] = value.split(" ") if value else []
+        elif field == "file_size":
+            record[field] = int(value) if value else None
+        else:
+            record[field] = value or None
+    return record
+
+
+def open_compressed(file_name, mode="wb"):
+    """
+    Open a binary file for writing, or reading with mode "rb", compressed
+    depending on the extension.
+
+    Args:
+        file_name (str): path of the file, ending in ".gz" for gzip or ".zst"
+            for zstd compression
+        mode (str): "wb" to write or "rb" to read
+
+    Returns:
+        binary file object
+    """
+    if file_name.endswith(".gz"):
+        return gzip.open(file_name, mode)
+    if file_name.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("zstandard is required for zstd manifests")
+        if mode == "rb":
+            return zstandard.ZstdDecompressor().stream_reader(open(file_name, "rb"))
+        return zstandard.ZstdCompressor().stream_writer(open(file_name, "wb"))
+    return open(file_name, mode)
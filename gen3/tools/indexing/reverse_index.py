@@ -0,0 +1,225 @@
+"""
+Module for looking up GUIDs by url, md5 and size, or file_name without sending
+a request to indexd for every lookup.
+
+A `ReverseIndex` is built in memory in a single pass over indexd records, for
+example from `Gen3Index.iter_all_records` or an `IndexSnapshot`, or over the rows
+of a manifest such as the one written by `download_manifest`. Every url of a
+record is indexed, not only the first one.
+
+```
+from gen3.index import Gen3Index
+from gen3.tools.indexing.reverse_index import ReverseIndex
+
+reverse_index = ReverseIndex.from_records(
+    Gen3Index(COMMONS).iter_all_records(limit=1024, prefetch=True)
+)
+# or: reverse_index = ReverseIndex.from_manifest("object-manifest.csv")
+
+guids_by_file_name = reverse_index.get_guids_for_file_names(file_names)
+```
+
+Each key maps to the guid string itself when only one record has that key, so
+an index of millions of records costs little more than the keys themselves.
+"""
+import logging
+
+from gen3.tools.indexing.manifest_diff import read_manifest_records
+from gen3.tools.indexing.verify_manifest import manifest_row_parsers
+
+
+class ReverseIndex:
+    """
+    In-memory mapping of urls, (md5, size) and file_names to the GUIDs of the
+    records that have them.
+
+    Lookups return lists of GUIDs, empty if there isn't any match, in the order
+    the records were added.
+    """
+
+    def __init__(self):
+        self._by_url = {}
+        self._by_md5_size = {}
+        self._by_file_name = {}
+        self.record_count = 0
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a reverse index from indexd records.
+
+        Args:
+            records (Iterable[dict]): json representing index records
+
+        Returns:
+            ReverseIndex: index of the records
+        """
+        reverse_index = cls()
+        for record in records:
+            reverse_index.add_record(record)
+        return reverse_index
+
+    @classmethod
+    def from_manifest(
+        cls,
+        manifest_file,
+        manifest_row_parsers=manifest_row_parsers,
+        manifest_file_delimiter=",",
+    ):
+        """
+        Build a reverse index from a manifest with a row per record, in any of
+        the formats `manifest_diff.read_manifest_records` reads, like the
+        compressed, JSON Lines and Parquet manifests of `download_manifest`.
+
+        Args:
+            manifest_file (str): path to the manifest
+            manifest_row_parsers (Dict{indexd_field:func_to_parse_row}): Row parsers
+                for the guid, urls, md5, file_size and file_name fields of CSV
+                manifests
+            manifest_file_delimiter (str): delimeter in CSV manifests
+
+        Returns:
+            ReverseIndex: index of the manifest rows
+        """
+        reverse_index = cls()
+        for record in read_manifest_records(
+            manifest_file, manifest_row_parsers, manifest_file_delimiter
+        ):
+            reverse_index.add(
+                record["guid"],
+                urls=record["urls"],
+                md5=record["md5"],
+                size=record["file_size"],
+                file_name=record["file_name"],
+            )
+        logging.info(
+            f"indexed {reverse_index.record_count} records from {manifest_file}"
+        )
+        return reverse_index
+
+    def add_record(self, record):
+        """
+        Add an indexd record to the index.
+
+        Args:
+            record (dict): json representing an index record
+        """
+        self.add(
+            record["did"],
+            urls=record.get("urls"),
+            md5=(record.get("hashes") or {}).get("md5"),
+            size=record.get("size"),
+            file_name=record.get("file_name"),
+        )
+
+    def add(self, guid, urls=None, md5=None, size=None, file_name=None):
+        """
+        Add a GUID to the index under each of the given keys.
+
+        Args:
+            guid (str): record id
+            urls (List[str]): urls of the record
+            md5 (str): md5 sum of the record
+            size (int): size of the record, indexed together with the md5
+            file_name (str): file_name of the record
+        """
+        self.record_count += 1
+        for url in set(urls or []):
+            _add_to_mapping(self._by_url, url, guid)
+        if md5:
+            _add_to_mapping(self._by_md5_size, (md5, _get_size_key(size)), guid)
+        if file_name:
+            _add_to_mapping(self._by_file_name, file_name, guid)
+
+    def get_guids_for_url(self, url):
+        """
+        Returns:
+            List[str]: GUIDs of the records with the given url among their urls
+        """
+        return _get_from_mapping(self._by_url, url)
+
+    def get_guids_for_md5(self, md5, size):
+        """
+        Returns:
+            List[str]: GUIDs of the records with the given md5 and size
+        """
+        return _get_from_mapping(self._by_md5_size, (md5, _get_size_key(size)))
+
+    def get_guids_for_file_name(self, file_name):
+        """
+        Returns:
+            List[str]: GUIDs of the records with the given file_name
+        """
+        return _get_from_mapping(self._by_file_name, file_name)
+
+    def get_guids_for_urls(self, urls):
+        """
+        Args:
+            urls (Iterable[str]): urls to look up
+
+        Returns:
+            Dict[str, List[str]]: GUIDs of the records with each url
+        """
+        return {url: self.get_guids_for_url(url) for url in urls}
+
+    def get_guids_for_md5s(self, md5s_and_sizes):
+        """
+        Args:
+            md5s_and_sizes (Iterable[Tuple[str, int]]): (md5, size) pairs to look up
+
+        Returns:
+            Dict[Tuple[str, int], List[str]]: GUIDs of the records with each md5
+            and size
+        """
+        return {
+            (md5, size): self.get_guids_for_md5(md5, size)
+            for md5, size in md5s_and_sizes
+        }
+
+    def get_guids_for_file_names(self, file_names):
+        """
+        Args:
+            file_names (Iterable[str]): file_names to look up
+
+        Returns:
+            Dict[str, List[str]]: GUIDs of the records with each file_name
+        """
+        return {
+            file_name: self.get_guids_for_file_name(file_name)
+            for file_name in file_names
+        }
+
+
+def _add_to_mapping(mapping, key, guid):
+    """
+    Add guid to the GUIDs of key, keeping a single GUID as a plain string and
+    only creating an insertion-ordered dict once a key is shared by several GUIDs.
+    """
+    guids = mapping.get(key)
+    if guids is None:
+        mapping[key] = guid
+    elif isinstance(guids, str):
+        if guids != guid:
+            mapping[key] = {guids: None, guid: None}
+    else:
+        guids[guid] = None
+
+
+def _get_from_mapping(mapping, key):
+    guids = mapping.get(key)
+    if guids is None:
+        return []
+    if isinstance(guids, str):
+        return [guids]
+    return list(guids)
+
+
+def _get_size_key(size):
+    """
+    Return size as an int so that sizes read from manifests as strings match the
+    ones from indexd.
+    """
+    try:
+        return int(size)
+    except (TypeError, ValueError):
+        return size
@@ -26,14 +26,34 @@ manifest_row_parsers["authz"] = _get_authz_from_row
 indexing.verify_object_manifest(COMMONS)
 ```
 
+Rows are verified in batches: the records of a batch of rows are fetched with a
+single bulk request, then every row is compared with its record locally. The
+comparison is done by `compare_manifest_records`, which can compare a manifest
+with records from any other source.
+
 The output from this verification is a file containing any errors in the following
 format:
 
 {guid}|{error_name}|expected {value_from_manifest}|actual {value_from_indexd}
 ex: 93d9af72-b0f1-450c-a5c6-7d3d8d2083b4|authz|expected ['']|actual ['/programs/DEV/projects/test']
 
+Errors are in the order of the rows of the manifest. Pass a `report_filename` to
+also get them in a structured JSON Lines or CSV report, with the row number, guid,
+error name, expected and actual values of each error, and a summary with the number
+of errors per error name.
+
+For a quick statistical check instead of a full pass, pass a `sample_rate` to only
+verify a random (or stratified, with `sample_stratify_by`) fraction of the rows. The
+summary then estimates the error rate of the whole manifest with a confidence
+interval.
+
 Attributes:
     CURRENT_DIR (str): abs path of current directory where this file lives
+    VERIFY_BATCH_SIZE (int): number of rows whose records are fetched at once
+    QUEUED_BATCHES_PER_PROCESS (int): number of batches of rows read ahead of each
+        process, so that memory use doesn't grow with the size of the manifest
+    SAMPLE_CONFIDENCE (float): confidence level of the error rate interval
+        estimated in sample mode
     manifest_row_parsers (TYPE): Description
     TMP_FOLDER (str): Folder directory for placing temporary files
         NOTE: We have to use a temporary folder b/c Python's file writing is not
@@ -41,23 +61,35 @@ Attributes:
               To workaround this, we have each process write to a file and concat
               them all post-processing.
 """
+import collections
 import csv
 import glob
+import hashlib
+import heapq
+import io
+import json
 import logging
-import fnmatch
-from multiprocessing import Pool, Process, Manager, Queue
+from multiprocessing import Process, Queue
 import multiprocessing
 import os
-import sys
-import shutil
+import queue
 import math
+import statistics
 import time
-import urllib.parse
 
-from gen3.index import Gen3Index
+from gen3.index import BULK_DOCUMENTS_BATCH_SIZE, Gen3Index
+from gen3.tools.indexing.index_snapshot import IndexSnapshot
+from gen3.tools.indexing.manifest_writers import (
+    get_manifest_format,
+    get_manifest_record,
+    open_compressed,
+)
 
 TMP_FOLDER = os.path.abspath("./tmp") + "/"
 CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+VERIFY_BATCH_SIZE = BULK_DOCUMENTS_BATCH_SIZE
+QUEUED_BATCHES_PER_PROCESS = 2
+SAMPLE_CONFIDENCE = 0.95
 
 
 def _get_guid_from_row(row):
@@ -199,6 +231,12 @@ def verify_object_manifest(
     manifest_row_parsers=manifest_row_parsers,
     manifest_file_delimiter=",",
     log_output_filename=f"verify-manifest-errors-{time.time()}.log",
+    index_snapshot_filename=None,
+    batch_size=VERIFY_BATCH_SIZE,
+    report_filename=None,
+    sample_rate=None,
+    sample_stratify_by=None,
+    sample_seed=0,
 ):
     """
     Verify all the indexd records provided in the manifest file.
@@ -210,7 +248,32 @@ def verify_object_manifest(
         manifest_file (str): the file to verify against
         manifest_row_parsers (Dict{indexd_field:func_to_parse_row}): Row parsers
         manifest_file_delimiter (str): delimeter in manifest_file
+        index_snapshot_filename (str): verify against this local IndexSnapshot
+            file instead of sending requests to indexd
+        batch_size (int): number of rows whose records are fetched at once
+        report_filename (str): also write the errors to this structured report,
+            JSON Lines if it ends with ".jsonl" and CSV otherwise, optionally
+            followed by ".gz" or ".zst", and the summary to the same name followed
+            by ".summary.json"
+        sample_rate (float): only verify this fraction of the rows, between 0 and
+            1, and estimate the error rate of the whole manifest from them
+        sample_stratify_by (str): field of `manifest_row_parsers` to stratify the
+            sample by, so that every value of the field gets its share of the
+            sampled rows. Rows are sampled at random if not provided.
+        sample_seed (int): seed of the random sample, the same seed samples the
+            same rows
+
+    Returns:
+        dict: summary of the verification, see `get_summary`
+
+    Raises:
+        RuntimeError: if a verification process exited with an error, so some rows
+            were not verified. Errors of the verified rows are still in the log.
     """
+    if report_filename:
+        # fail before verifying rather than after
+        ErrorReport.get_format(report_filename)
+
     start_time = time.time()
     logging.info(f"start time: {start_time}")
 
@@ -221,19 +284,31 @@ def verify_object_manifest(
         if os.path.isfile(file_path):
             os.unlink(file_path)
 
-    _verify_all_index_records_in_file(
+    sampler = None
+    if sample_rate is not None:
+        sampler = _RowSampler(
+            sample_rate, manifest_row_parsers, sample_stratify_by, sample_seed
+        )
+
+    summary = _verify_all_index_records_in_file(
         commons_url,
         log_output_filename,
         num_processes,
         manifest_file,
         manifest_row_parsers,
         manifest_file_delimiter,
+        index_snapshot_filename,
+        batch_size,
+        report_filename,
+        sampler,
     )
 
     end_time = time.time()
     logging.info(f"end time: {end_time}")
     logging.info(f"run time: {end_time-start_time}")
 
+    return summary
+
 
 def _verify_all_index_records_in_file(
     commons_url,
@@ -242,61 +317,325 @@ def _verify_all_index_records_in_file(
     manifest_file,
     manifest_row_parsers,
     manifest_file_delimiter,
+    index_snapshot_filename=None,
+    batch_size=VERIFY_BATCH_SIZE,
+    report_filename=None,
+    sampler=None,
 ):
     """
-    Verify all the indexd records provided in the manifest file by creating a thread-safe
-    queue and dumping all the rows from the manifest into it. Then start up processes
-    to parallelly pop off the queue and verify the manifest row against indexd's API.
-    Then combine all the output logs into a single file.
+    Verify all the indexd records provided in the manifest file by starting up
+    processes that parallelly pop batches of rows off a thread-safe queue and verify
+    them against indexd's API, while the manifest is streamed into the queue. The
+    queue is bounded so that reading the manifest waits for the processes instead of
+    loading it into memory. Then combine all the output logs into a single file,
+    ordered like the manifest.
     """
-    index = Gen3Index(commons_url)
+    rows_queue = Queue(maxsize=num_processes * QUEUED_BATCHES_PER_PROCESS)
+    # rows the processes actually verified, rather than the rows put in the queue
+    verified_rows_counter = multiprocessing.Value("q", 0)
 
-    queue = Queue()
+    processes = _start_processes(
+        rows_queue,
+        commons_url,
+        num_processes,
+        manifest_row_parsers,
+        index_snapshot_filename,
+        verified_rows_counter,
+    )
 
     logging.info(f"adding rows from {manifest_file} to queue...")
 
+    manifest_rows = 0
+    queued_rows = 0
     with open(manifest_file, encoding="utf-8-sig") as csvfile:
         manifest_reader = csv.DictReader(csvfile, delimiter=manifest_file_delimiter)
-        for row in manifest_reader:
+        rows = []
+        for row_number, row in enumerate(manifest_reader, start=1):
             row = {key.strip(" "): value for key, value in row.items()}
-            queue.put(row)
+            manifest_rows += 1
+            if sampler and not sampler.is_sampled(row_number, row):
+                continue
+            queued_rows += 1
+            rows.append((row_number, row))
+            if len(rows) >= batch_size:
+                _put_in_queue(rows_queue, rows, processes)
+                rows = []
+        if rows:
+            _put_in_queue(rows_queue, rows, processes)
 
     logging.info(
         f"done adding to queue, sending {num_processes} STOP messages b/c {num_processes} processes"
     )
 
     for x in range(num_processes):
-        queue.put("STOP")
+        _put_in_queue(rows_queue, "STOP", processes)
 
-    _start_processes_and_process_queue(
-        queue, commons_url, num_processes, manifest_row_parsers
-    )
+    logging.info(f"waiting for processes to finish processing queue...")
+
+    for process in processes:
+        process.join()
+    failed_processes = [process for process in processes if process.exitcode != 0]
+    verified_rows = verified_rows_counter.value
 
     logging.info(
         f"done processing queue, combining outputs to single file {log_output_filename}"
     )
 
-    # remove existing output if it exists
-    if os.path.isfile(log_output_filename):
-        os.unlink(log_output_filename)
-
-    with open(log_output_filename, "wb") as outfile:
-        for filename in glob.glob(TMP_FOLDER + "*"):
-            if log_output_filename == filename:
-                # don't want to copy the output into the output
-                continue
-            logging.info(f"combining {filename} into {log_output_filename}")
-            with open(filename, "rb") as readfile:
-                shutil.copyfileobj(readfile, outfile)
+    error_counts, rows_with_errors = _combine_error_files(
+        log_output_filename, report_filename
+    )
 
     logging.info(f"done writing output to file {log_output_filename}")
 
+    if failed_processes:
+        # the summary would report the rows of the failed batches as clean
+        raise RuntimeError(
+            f"{len(failed_processes)} verification process(es) exited with errors, "
+            f"{queued_rows - verified_rows} of {queued_rows} rows were not verified"
+        )
+
+    summary = get_summary(
+        manifest_rows,
+        verified_rows,
+        rows_with_errors,
+        error_counts,
+        sampler.sample_rate if sampler else None,
+    )
+    logging.info(f"verification summary: {summary}")
+    if report_filename:
+        with open(report_filename + ".summary.json", "w", encoding="utf8") as file:
+            json.dump(summary, file, indent=2)
+
+    return summary
+
+
+def _combine_error_files(log_output_filename, report_filename=None):
+    """
+    Merge the errors the processes wrote into the output log, and the report if
+    report_filename is provided, ordered by row number.
+
+    Every process verifies its batches in the order of the manifest, so their files
+    are already ordered and are merged without loading them into memory.
+
+    Returns:
+        Tuple[Dict[str, int], int]: number of errors per error name, and number of
+        rows with at least one error
+    """
+    error_files = [open(name, encoding="utf8") for name in _get_error_filenames()]
+    report = None
+    try:
+        if report_filename:
+            report = ErrorReport(report_filename)
+
+        error_counts = collections.Counter()
+        rows_with_errors = 0
+        last_row_number = None
+        with open(log_output_filename, "w", encoding="utf8") as outfile:
+            for error in heapq.merge(
+                *(map(json.loads, file) for file in error_files),
+                key=lambda error: error["row"],
+            ):
+                outfile.write(
+                    format_error(
+                        error["guid"],
+                        error["error"],
+                        error["expected"],
+                        error["actual"],
+                    )
+                )
+                if report:
+                    report.write(error)
+                error_counts[error["error"]] += 1
+                if error["row"] != last_row_number:
+                    rows_with_errors += 1
+                    last_row_number = error["row"]
+    finally:
+        if report:
+            report.close()
+        for file in error_files:
+            file.close()
+
+    return dict(sorted(error_counts.items())), rows_with_errors
+
+
+def _get_error_filenames():
+    return sorted(glob.glob(TMP_FOLDER + "*.jsonl"))
+
+
+class ErrorReport:
+    """
+    Structured report of verification errors, JSON Lines if the filename ends with
+    ".jsonl" and CSV otherwise, compressed if it also ends with ".gz" or ".zst".
+    """
+
+    FIELDS = ["row", "guid", "error", "expected", "actual"]
+
+    def __init__(self, file_name):
+        self._format = self.get_format(file_name)
+        self._file = io.TextIOWrapper(
+            open_compressed(file_name), encoding="utf8", newline=""
+        )
+        self._csv_writer = None
+        if self._format != "jsonl":
+            self._csv_writer = csv.writer(self._file)
+            self._csv_writer.writerow(self.FIELDS)
+
+    @staticmethod
+    def get_format(file_name):
+        """
+        Return the format of a report file name, raising a ValueError for formats
+        that can't hold a report, like Parquet.
+        """
+        report_format = get_manifest_format(file_name)
+        if report_format not in ("csv", "jsonl"):
+            raise ValueError(
+                f"Unsupported error report format '{report_format}' for {file_name},"
+                " use a .csv or .jsonl file name"
+            )
+        return report_format
+
+    def write(self, error):
+        """
+        Write an error, a dict with the keys of FIELDS.
+        """
+        # values that aren't JSON, like exceptions, are written as they're formatted
+        if self._csv_writer is None:
+            self._file.write(json.dumps(error, default=str) + "\n")
+        else:
+            self._csv_writer.writerow(
+                [
+                    value if isinstance(value, str) else json.dumps(value, default=str)
+                    for value in (error[field] for field in self.FIELDS)
+                ]
+            )
+
+    def close(self):
+        self._file.close()
+
 
-def _start_processes_and_process_queue(
-    queue, commons_url, num_processes, manifest_row_parsers
+def get_summary(
+    manifest_rows, verified_rows, rows_with_errors, error_counts, sample_rate=None
 ):
     """
-    Startup num_processes and wait for them to finish processing the provided queue.
+    Summarize a verification.
+
+    When only a sample of the rows was verified, the summary also has the Wilson
+    score interval of the error rate of the whole manifest, at the
+    SAMPLE_CONFIDENCE level, and the estimated number of rows with errors.
+
+    Args:
+        manifest_rows (int): number of rows of the manifest
+        verified_rows (int): number of rows that were verified
+        rows_with_errors (int): number of verified rows with at least one error
+        error_counts (Dict[str, int]): number of errors per error name
+        sample_rate (float): fraction of the rows that was meant to be verified,
+            if only a sample was
+
+    Returns:
+        dict: "manifest_rows", "verified_rows", "rows_with_errors", "error_rate" (of
+        the verified rows) and "errors" (number of errors per error name), and
+        "sample_rate", "sampled_fraction" (the fraction of the rows that was
+        actually verified), "confidence", "error_rate_interval" and
+        "estimated_rows_with_errors" for a sample
+    """
+    error_rate = rows_with_errors / verified_rows if verified_rows else 0.0
+    summary = {
+        "manifest_rows": manifest_rows,
+        "verified_rows": verified_rows,
+        "rows_with_errors": rows_with_errors,
+        "error_rate": error_rate,
+        "errors": error_counts,
+    }
+    if sample_rate is not None:
+        low, high = _get_wilson_interval(rows_with_errors, verified_rows)
+        summary.update(
+            sample_rate=sample_rate,
+            sampled_fraction=verified_rows / manifest_rows if manifest_rows else 0.0,
+            confidence=SAMPLE_CONFIDENCE,
+            error_rate_interval=[low, high],
+            estimated_rows_with_errors=round(error_rate * manifest_rows),
+        )
+    return summary
+
+
+def _get_wilson_interval(successes, trials):
+    """
+    Return the Wilson score interval of a proportion at the SAMPLE_CONFIDENCE level.
+    """
+    if not trials:
+        return 0.0, 1.0
+    z = statistics.NormalDist().inv_cdf(0.5 + SAMPLE_CONFIDENCE / 2)
+    proportion = successes / trials
+    denominator = 1 + z**2 / trials
+    center = (proportion + z**2 / (2 * trials)) / denominator
+    margin = (
+        z
+        * math.sqrt(proportion * (1 - proportion) / trials + z**2 / (4 * trials**2))
+        / denominator
+    )
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class _RowSampler:
+    """
+    Decide which manifest rows are verified in sample mode.
+
+    Without a field to stratify by, each row is sampled with probability
+    sample_rate, from a hash of its guid and the seed so that the same rows are
+    sampled every time. With one, the rows of every value of the field are sampled
+    systematically, one every 1/sample_rate rows starting at a random offset, so
+    every value gets its share of the sample (up to rounding) and every row still
+    has a sample_rate chance to be sampled, keeping the sample representative.
+    """
+
+    def __init__(self, sample_rate, manifest_row_parsers, stratify_by=None, seed=0):
+        if not 0 < sample_rate <= 1:
+            raise ValueError(f"sample_rate must be in (0, 1], got {sample_rate}")
+        self.sample_rate = sample_rate
+        self._manifest_row_parsers = manifest_row_parsers
+        self._stratify_by = stratify_by
+        self._seed = seed
+        self._stratum_counts = collections.Counter()
+        self._stratum_offsets = {}
+
+    def is_sampled(self, row_number, row):
+        if self._stratify_by:
+            stratum = self._manifest_row_parsers[self._stratify_by](row)
+            if isinstance(stratum, list):
+                stratum = tuple(sorted(stratum))
+            if stratum not in self._stratum_offsets:
+                self._stratum_offsets[stratum] = self._get_uniform(repr(stratum))
+            offset = self._stratum_offsets[stratum]
+            count = self._stratum_counts[stratum]
+            self._stratum_counts[stratum] += 1
+            return math.floor((count + 1) * self.sample_rate + offset) > math.floor(
+                count * self.sample_rate + offset
+            )
+
+        key = self._manifest_row_parsers["guid"](row) or f"row:{row_number}"
+        return self._get_uniform(key) < self.sample_rate
+
+    def _get_uniform(self, key):
+        """
+        Return a number in [0, 1) derived from the key and the seed.
+        """
+        digest = hashlib.sha256(f"{self._seed}:{key}".encode("utf8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2**64
+
+
+def _start_processes(
+    rows_queue,
+    commons_url,
+    num_processes,
+    manifest_row_parsers,
+    index_snapshot_filename=None,
+    verified_rows_counter=None,
+):
+    """
+    Startup num_processes processing the provided queue.
+
+    Returns:
+        List[multiprocessing.Process]: the started processes
     """
     logging.info(f"starting {num_processes} processes..")
 
@@ -304,109 +643,207 @@ def _start_processes_and_process_queue(
     for x in range(num_processes):
         p = Process(
             target=_verify_records_in_indexd,
-            args=(queue, commons_url, manifest_row_parsers),
+            args=(
+                rows_queue,
+                commons_url,
+                manifest_row_parsers,
+                index_snapshot_filename,
+                verified_rows_counter,
+            ),
         )
         p.start()
         processes.append(p)
 
-    logging.info(f"waiting for processes to finish processing queue...")
+    return processes
 
-    for process in processes:
-        process.join()
 
+def _put_in_queue(rows_queue, item, processes):
+    """
+    Put an item in the bounded queue, waiting for the processes to make room.
 
-def _verify_records_in_indexd(queue, commons_url, manifest_row_parsers):
+    Raises:
+        RuntimeError: if all the processes exited, so nothing would make room
     """
-    Keep getting items from the queue and verifying that indexd contains the expected
-    fields from that row. If there are any issues, log errors into a file. Return
-    when nothing is left in the queue.
+    while True:
+        try:
+            rows_queue.put(item, timeout=1)
+            return
+        except queue.Full:
+            if not any(process.is_alive() for process in processes):
+                raise RuntimeError("all the verification processes exited")
+
+
+def _verify_records_in_indexd(
+    rows_queue,
+    commons_url,
+    manifest_row_parsers,
+    index_snapshot_filename=None,
+    verified_rows_counter=None,
+):
     """
-    index = Gen3Index(commons_url)
-    row = queue.get()
-    process_name = multiprocessing.current_process().name
-    file_name = TMP_FOLDER + str(process_name) + ".log"
-
-    with open(file_name, "w+", encoding="utf8") as file:
-        while row != "STOP":
-            guid = manifest_row_parsers["guid"](row)
-            authz = manifest_row_parsers["authz"](row)
-            acl = manifest_row_parsers["acl"](row)
-            file_size = manifest_row_parsers["file_size"](row)
-            md5 = manifest_row_parsers["md5"](row)
-            urls = manifest_row_parsers["urls"](row)
-            file_name = manifest_row_parsers["file_name"](row)
-
-            try:
-                actual_record = index.get_record(guid)
-                if not actual_record:
-                    raise Exception(
-                        f"Index client could not find record for GUID: {guid}"
-                    )
-            except Exception as exc:
-                output = f"{guid}|no_record|expected {row}|actual {exc}\n"
-                file.write(output)
-                logging.error(output)
-                row = queue.get()
-                continue
+    Keep getting batches of rows from the queue and verifying that indexd contains
+    the expected fields from those rows. If there are any issues, log errors into a
+    file. Return when nothing is left in the queue.
 
-            logging.info(f"verifying {guid}...")
+    Records are read from the local snapshot instead of indexd if
+    index_snapshot_filename is provided. The number of rows of every verified batch
+    is added to verified_rows_counter if it is provided.
+    """
+    if index_snapshot_filename:
+        index = IndexSnapshot(index_snapshot_filename)
+    else:
+        index = Gen3Index(commons_url)
+    process_name = multiprocessing.current_process().name
+    file_name = TMP_FOLDER + str(process_name) + ".jsonl"
 
-            if sorted(authz) != sorted(actual_record["authz"]):
-                output = (
-                    f"{guid}|authz|expected {authz}|actual {actual_record['authz']}\n"
-                )
-                file.write(output)
-                logging.error(output)
-
-            if sorted(acl) != sorted(actual_record["acl"]):
-                output = f"{guid}|acl|expected {acl}|actual {actual_record['acl']}\n"
-                file.write(output)
-                logging.error(output)
-
-            if file_size != actual_record["size"]:
-                if (
-                    not file_size
-                    and file_size != 0
-                    and not actual_record["size"]
-                    and actual_record["size"] != 0
-                ):
-                    # actual and expected are both either empty string or None
-                    # so even though they're not equal, they represent null value so
-                    # we don't need to consider this an error in validation
-                    pass
-                else:
-                    output = f"{guid}|file_size|expected {file_size}|actual {actual_record['size']}\n"
-                    file.write(output)
-                    logging.error(output)
-
-            if md5 != actual_record["hashes"].get("md5"):
-                if (
-                    not md5
-                    and md5 != 0
-                    and not actual_record["hashes"].get("md5")
-                    and actual_record["hashes"].get("md5") != 0
-                ):
-                    # actual and expected are both either empty string or None
-                    # so even though they're not equal, they represent null value so
-                    # we don't need to consider this an error in validation
-                    pass
-                else:
-                    output = f"{guid}|md5|expected {md5}|actual {actual_record['hashes'].get('md5')}\n"
-                    file.write(output)
-                    logging.error(output)
-
-            if sorted(urls) != sorted(actual_record["urls"]):
-                output = f"{guid}|urls|expected {urls}|actual {actual_record['urls']}\n"
-                file.write(output)
-                logging.error(output)
-
-            if not actual_record["file_name"] and file_name:
-                # if the actual record name is "" or None but something was specified
-                # in the manifest, we have a problem
-                output = f"{guid}|file_name|expected {file_name}|actual {actual_record['file_name']}\n"
-                file.write(output)
-                logging.error(output)
-
-            row = queue.get()
+    with open(file_name, "w", encoding="utf8") as file:
+        rows = rows_queue.get()
+        while rows != "STOP":
+            _verify_rows(index, rows, manifest_row_parsers, file)
+            if verified_rows_counter is not None:
+                with verified_rows_counter.get_lock():
+                    verified_rows_counter.value += len(rows)
+            rows = rows_queue.get()
 
     logging.info(f"{process_name}:Stop")
+
+
+def _verify_rows(index, rows, manifest_row_parsers, file):
+    """
+    Fetch the records of a batch of manifest rows at once and write the errors of
+    every row to the file, one JSON object per line.
+
+    Args:
+        index (Gen3Index|IndexSnapshot): where to get the records from
+        rows (List[Tuple[int, dict]]): row numbers and manifest rows,
+            column_name:row_value
+        manifest_row_parsers (Dict{indexd_field:func_to_parse_row}): Row parsers
+        file (file): file to write the errors to
+    """
+    expected_records = [
+        parse_manifest_row(row, manifest_row_parsers) for _, row in rows
+    ]
+    guids = [expected["guid"] for expected in expected_records if expected["guid"]]
+
+    lookup_error = None
+    try:
+        records = {record["did"]: record for record in index.get_records(guids) or []}
+    except Exception as exc:
+        records = {}
+        lookup_error = exc
+
+    for (row_number, row), expected in zip(rows, expected_records):
+        guid = expected["guid"]
+        actual_record = records.get(guid)
+        if not actual_record:
+            _write_error(
+                file,
+                row_number,
+                guid,
+                "no_record",
+                row,
+                lookup_error
+                or Exception(f"Index client could not find record for GUID: {guid}"),
+            )
+            continue
+
+        logging.info(f"verifying {guid}...")
+        for error_name, expected_value, actual_value in compare_manifest_records(
+            expected, get_manifest_record(actual_record)
+        ):
+            _write_error(
+                file, row_number, guid, error_name, expected_value, actual_value
+            )
+
+
+def parse_manifest_row(row, manifest_row_parsers):
+    """
+    Return the fields of a manifest row, in the form of the records of
+    `manifest_writers.get_manifest_record`.
+
+    Args:
+        row (dict): manifest row, by column name
+        manifest_row_parsers (Dict{indexd_field:func_to_parse_row}): Row parsers
+
+    Returns:
+        dict: the fields of the row, by indexd field
+    """
+    return {
+        field: manifest_row_parsers[field](row)
+        for field in ["guid", "urls", "authz", "acl", "md5", "file_size", "file_name"]
+    }
+
+
+def compare_manifest_records(expected, actual):
+    """
+    Compare the expected fields of a record with its actual fields.
+
+    List fields are compared regardless of order, an empty md5 or file_size
+    matches a missing one, and file_name is only an error when it's missing from
+    the actual record.
+
+    Args:
+        expected (dict): expected fields, like a row parsed with
+            `manifest_row_parsers`
+        actual (dict): actual fields, like the output of
+            `manifest_writers.get_manifest_record` for an indexd record
+
+    Returns:
+        List[Tuple[str, Any, Any]]: (field, expected value, actual value) for every
+        field that doesn't match
+    """
+    errors = []
+    for field in ["authz", "acl"]:
+        if sorted(expected[field]) != sorted(actual[field] or []):
+            errors.append((field, expected[field], actual[field]))
+
+    for field in ["file_size", "md5"]:
+        if expected[field] != actual[field] and not (
+            _is_empty(expected[field]) and _is_empty(actual[field])
+        ):
+            # empty string and None both represent a null value, so they aren't
+            # considered an error even though they're not equal
+            errors.append((field, expected[field], actual[field]))
+
+    if sorted(expected["urls"]) != sorted(actual["urls"] or []):
+        errors.append(("urls", expected["urls"], actual["urls"]))
+
+    if not actual["file_name"] and expected["file_name"]:
+        # if the actual record name is "" or None but something was specified
+        # in the manifest, we have a problem
+        errors.append(("file_name", expected["file_name"], actual["file_name"]))
+
+    return errors
+
+
+def _is_empty(value):
+    return not value and value != 0
+
+
+def _write_error(file, row_number, guid, error_name, expected, actual):
+    error = {
+        "row": row_number,
+        "guid": guid,
+        "error": error_name,
+        "expected": expected,
+        "actual": actual,
+    }
+    # values that aren't JSON, like exceptions, are written as they're formatted
+    file.write(json.dumps(error, default=str) + "\n")
+    logging.error(format_error(guid, error_name, expected, actual))
+
+
+def format_error(guid, error_name, expected, actual):
+    """
+    Format a verification error as a line of the plain text error log.
+
+    Args:
+        guid (str): GUID of the record with the error
+        error_name (str): name of the mismatched field
+        expected: value from the manifest
+        actual: value that was found
+
+    Returns:
+        str: "guid|error_name|expected ...|actual ..." line
+    """
+    return f"{guid}|{error_name}|expected {expected}|actual {actual}\n"
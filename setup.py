@@ -41,6 +41,7 @@ setup(
         "backoff",
         "click",
     ],
+    extras_require={"parquet": ["pyarrow"], "zstd": ["zstandard"]},
     dependency_links=[
         "git+https://github.com/uc-cdis/indexclient.git@1.6.2#egg=indexclient"
     ],
@@ -0,0 +1,167 @@
+"""
+Minimal in-memory stand-in for the indexd API, served over HTTP from a
+background thread so both the sync and async clients can talk to it without
+a database. Only covers the endpoints the SDK uses.
+"""
+import json
+import threading
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class IndexdStub:
+    def __init__(self, records=None):
+        self.records = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        # number of upcoming requests to answer with a server error, by
+        # (method, path) like the ones in self.requests
+        self.fail_requests = {}
+        for record in records or []:
+            self.add_record(record)
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub._handle(self, "GET")
+
+            def do_POST(self):
+                stub._handle(self, "POST")
+
+            def do_PUT(self):
+                stub._handle(self, "PUT")
+
+            def do_DELETE(self):
+                stub._handle(self, "DELETE")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_record(self, record):
+        record = dict(record)
+        record.setdefault("did", str(uuid.uuid4()))
+        record.setdefault("baseid", str(uuid.uuid4()))
+        record.setdefault("rev", uuid.uuid4().hex[:8])
+        record.setdefault("form", "object")
+        for field in ["urls", "acl", "authz"]:
+            record.setdefault(field, [])
+        for field in ["file_name", "version", "uploader"]:
+            record.setdefault(field, None)
+        record.setdefault("hashes", {})
+        record.setdefault("size", None)
+        record.setdefault("metadata", {})
+        record.setdefault("urls_metadata", {url: {} for url in record["urls"]})
+        record.setdefault("created_date", "2020-01-01T00:00:00.000000")
+        record.setdefault("updated_date", record["created_date"])
+        self.records[record["did"]] = record
+        return record
+
+    def count_requests(self, method, path):
+        return len([r for r in self.requests if r == (method, path)])
+
+    def _handle(self, handler, method):
+        parsed = urllib.parse.urlparse(handler.path)
+        path = urllib.parse.unquote(parsed.path)
+        params = dict(urllib.parse.parse_qsl(parsed.query, keep_blank_values=True))
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = json.loads(handler.rfile.read(length)) if length else None
+
+        if path.startswith("/index/"):
+            path = path[len("/index") :]
+
+        with self.lock:
+            request = (method, path.rstrip("/") or "/")
+            self.requests.append(request)
+            if self.fail_requests.get(request):
+                self.fail_requests[request] -= 1
+                status, response = 500, {"error": "stub failure"}
+            else:
+                status, response = self._route(method, path, params, body)
+
+        data = json.dumps(response).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _route(self, method, path, params, body):
+        if path == "/_stats":
+            return 200, {"fileCount": len(self.records)}
+        if path == "/_version":
+            return 200, {"version": "stub"}
+        if path == "/bulk/documents" and method == "POST":
+            docs = [self.records[did] for did in body if did in self.records]
+            return 200, docs
+        if path.rstrip("/") == "/index":
+            if method == "GET":
+                return 200, {"records": self._list(params)}
+            if method == "POST":
+                if body.get("did") in self.records:
+                    return 409, {"error": "record already exists"}
+                return 200, self._create(body)
+        if path.startswith("/index/"):
+            did = path[len("/index/") :]
+            if method == "POST":
+                return self._create_version(did, body)
+            if did not in self.records:
+                return 404, {"error": "no record found"}
+            if method == "GET":
+                return 200, self.records[did]
+            if params.get("rev") != self.records[did]["rev"]:
+                return 409, {"error": "revision mismatch"}
+            if method == "PUT":
+                self.records[did].update(body)
+                self.records[did]["rev"] = uuid.uuid4().hex[:8]
+                return 200, self._id(did)
+            if method == "DELETE":
+                del self.records[did]
+                return 200, {}
+        did = path.lstrip("/")
+        if method == "GET" and did in self.records:
+            return 200, self.records[did]
+        return 404, {"error": "no record found"}
+
+    def _list(self, params):
+        dids = sorted(self.records)
+        if params.get("start"):
+            dids = [did for did in dids if did > params["start"]]
+        limit = int(params.get("limit", 100))
+        offset = int(params.get("page", 0)) * limit
+        return [self.records[did] for did in dids[offset : offset + limit]]
+
+    def _create(self, body):
+        record = self.add_record(body)
+        return self._id(record["did"])
+
+    def _create_version(self, did, body):
+        if did not in self.records:
+            return 404, {"error": "no record found"}
+        body = dict(body)
+        body["baseid"] = self.records[did]["baseid"]
+        return 200, self._create(body)
+
+    def _id(self, did):
+        record = self.records[did]
+        return {"did": did, "rev": record["rev"], "baseid": record["baseid"]}
@@ -1,5 +1,10 @@
+import asyncio
 import pytest, os, requests
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+
+from aiohttp import web
+
+from gen3.submission import AsyncGen3Submission
 
 
 def test_get(sub):
@@ -10,7 +15,7 @@ def test_get(sub):
         get_dictionary_all
 
     """
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.get().text = '{ "key": "value" }'
         assert sub.get_programs()
@@ -30,7 +35,7 @@ def test_exportnode(sub):
         export_node
 
     """
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.get().text = '{ "key": "value" }'
         resp = sub.export_node("DEV", "test", "experiment", "json", "node_file.json")
@@ -41,7 +46,7 @@ def test_exportnode(sub):
 
 def test_create_program(sub):
 
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.json.return_value = '{ "key": "value" }'
         p = sub.create_program(
@@ -56,7 +61,7 @@ def test_create_program(sub):
 
 def test_delete_program(sub):
 
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.json.return_value = '{ "key": "value" }'
         sub.delete_program("programmjm")
@@ -64,7 +69,7 @@ def test_delete_program(sub):
 
 def test_create_project(sub):
 
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.json.return_value = '{ "key": "value" }'
         pj = sub.create_project(
@@ -83,21 +88,21 @@ def test_create_project(sub):
 
 def test_delete_project(sub):
 
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.json.return_value = '{ "key": "value" }'
         dpj = sub.delete_project("programmjm", "projectmjm")
 
 
 def test_open_project(sub):
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.json.return_value = '{ "key": "value" }'
         assert sub.open_project("programmjm", "projectmjm")
 
 
 def test_submit_record(sub):
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.json.return_value = '{ "key": "value" }'
         rec = sub.submit_record(
@@ -113,7 +118,7 @@ def test_submit_record(sub):
 
 
 def test_export_record(sub):
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.get().text = '{ "key": "value" }'
         sub.export_record("prog1", "proj1", "id", "json", "record_file.json")
@@ -123,20 +128,79 @@ def test_export_record(sub):
 
 
 def test_delete_record(sub):
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.json.return_value = '{ "key": "value" }'
         sub.delete_record("prog1", "proj1", "id")
 
 
 def test_query(sub):
-    with patch("gen3.submission.requests") as mock_request:
+    with patch.object(sub, "_session") as mock_request:
         mock_request.status_code = 200
         mock_request.post().text = '{ "key": "value" }'
         res = sub.query("{ experiment { submitter_id } }")
         assert res == {"key": "value"}
 
 
+async def _run_with_sheepdog_stub(test):
+    """
+    Start a local stub of the submission API and run the given coroutine
+    function with its url. The stub rejects the first request with a 401.
+    """
+    calls = []
+
+    async def graphql(request):
+        calls.append(request.headers.get("Authorization"))
+        if len(calls) == 1:
+            return web.json_response({"error": "expired"}, status=401)
+        body = await request.json()
+        return web.json_response({"data": {"query": body["query"]}})
+
+    async def submit(request):
+        calls.append(request.headers.get("Authorization"))
+        return web.json_response({"code": 200, "entities": await request.json()})
+
+    app = web.Application()
+    app.router.add_post("/api/v0/submission/graphql", graphql)
+    app.router.add_put("/api/v0/submission/{program}/{project}", submit)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        await test("http://127.0.0.1:{}".format(port), calls)
+    finally:
+        await runner.cleanup()
+
+
+def test_async_query_and_submit():
+    """
+    tests:
+    AsyncGen3Submission.query retries with a new access token after a 401
+    AsyncGen3Submission.submit_record
+    """
+    auth = MagicMock()
+    tokens = iter(["Bearer old", "Bearer new", "Bearer new"])
+
+    async def _auth_value():
+        return next(tokens)
+
+    auth.async_get_auth_value.side_effect = _auth_value
+
+    async def _test(endpoint, calls):
+        async with AsyncGen3Submission(endpoint, auth) as sub:
+            res = await sub.query("{ experiment { submitter_id } }")
+            assert res == {"data": {"query": "{ experiment { submitter_id } }"}}
+            auth._expire_access_token.assert_called_once_with("Bearer old")
+
+            rec = await sub.submit_record("prog1", "proj1", [{"type": "experiment"}])
+            assert rec["entities"] == [{"type": "experiment"}]
+        assert calls == ["Bearer old", "Bearer new", "Bearer new"]
+
+    asyncio.run(_run_with_sheepdog_stub(_test))
+
+
 """ Not tested:
 
     - query : more tests
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from gen3.index import AsyncGen3Index
+from tests.indexd_stub import IndexdStub
+
+
+@pytest.fixture
+def indexd_stub():
+    with IndexdStub() as stub:
+        yield stub
+
+
+def test_async_record_crud(indexd_stub):
+    """
+    Test creating, reading, updating and deleting records with the async client.
+    """
+
+    async def _test():
+        async with AsyncGen3Index(indexd_stub.url, ("admin", "admin")) as index:
+            assert (await index.get_stats())["fileCount"] == 0
+
+            records = await asyncio.gather(
+                *(
+                    index.create_record(
+                        did=f"dg.TEST/{i}",
+                        hashes={"md5": f"{i:032d}"},
+                        size=i,
+                        urls=[f"s3://bucket/{i}.txt"],
+                        acl=["DEV"],
+                    )
+                    for i in range(10)
+                )
+            )
+            assert [rec["did"] for rec in records] == [
+                f"dg.TEST/{i}" for i in range(10)
+            ]
+
+            rec = await index.get_record("dg.TEST/3")
+            assert rec["size"] == 3
+            assert rec["urls"] == ["s3://bucket/3.txt"]
+            assert await index.get_record("dg.TEST/missing") is None
+            assert (await index.get("dg.TEST/3"))["did"] == "dg.TEST/3"
+
+            updated = await index.update_record("dg.TEST/3", file_name="three.txt")
+            assert updated["file_name"] == "three.txt"
+            assert updated["urls"] == ["s3://bucket/3.txt"]
+            assert updated["rev"] != rec["rev"]
+
+            bulk = await index.get_records(["dg.TEST/1", "dg.TEST/3", "dg.TEST/x"])
+            assert sorted(rec["did"] for rec in bulk) == ["dg.TEST/1", "dg.TEST/3"]
+
+            page = await index.get_records_on_page(limit=4, page=1)
+            assert [rec["did"] for rec in page] == [f"dg.TEST/{i}" for i in range(4, 8)]
+
+            new_version = await index.create_new_version(
+                "dg.TEST/3", hashes={"md5": "f" * 32}, size=33
+            )
+            assert new_version["baseid"] == updated["baseid"]
+
+            deleted = await index.delete_record("dg.TEST/3")
+            assert deleted["did"] == "dg.TEST/3"
+            assert await index.get_record("dg.TEST/3") is None
+            assert await index.delete_record("dg.TEST/3") is None
+
+    asyncio.run(_test())
@@ -0,0 +1,177 @@
+import base64
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from gen3.auth import Gen3Auth, decode_token
+
+
+def _make_token(exp):
+    """
+    Build an unsigned JWT with the given expiration. Gen3Auth only reads
+    the claims, so no signature is needed.
+    """
+    header = base64.urlsafe_b64encode(json.dumps({"alg": "none"}).encode("utf-8"))
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode("utf-8"))
+    return ".".join(
+        [header.decode("utf-8").rstrip("="), payload.decode("utf-8").rstrip("="), ""]
+    )
+
+
+def test_decode_token():
+    exp = int(time.time()) + 1200
+    assert decode_token(_make_token(exp)) == {"exp": exp}
+    assert decode_token("not-a-jwt") == {}
+
+
+def test_token_reused_until_expiration_margin():
+    """
+    Test that the access token is only requested again when it is within
+    the expiration margin, not on every request.
+    """
+    auth = Gen3Auth(
+        "https://example.com", refresh_token={"api_key": "123"}, expiration_margin=60
+    )
+    with patch("gen3.auth.requests") as mock_request:
+        mock_request.post().json.return_value = {
+            "access_token": _make_token(time.time() + 1200)
+        }
+        mock_request.post.reset_mock()
+
+        auth(MagicMock())
+        auth(MagicMock())
+        assert mock_request.post.call_count == 1
+
+        # token now expires within the margin
+        auth._access_token_expiration = time.time() + 30
+        auth(MagicMock())
+        assert mock_request.post.call_count == 2
+
+
+def test_token_without_expiration_is_reused():
+    auth = Gen3Auth("https://example.com", refresh_token={"api_key": "123"})
+    with patch("gen3.auth.requests") as mock_request:
+        mock_request.post().json.return_value = {"access_token": "opaque"}
+        mock_request.post.reset_mock()
+
+        request = MagicMock()
+        request.headers = {}
+        auth(request)
+        auth(MagicMock())
+        assert mock_request.post.call_count == 1
+        assert request.headers["Authorization"] == "Bearer opaque"
+
+
+@pytest.fixture
+def fence_stub():
+    """
+    Local stub of Fence's access token endpoint that counts how many access
+    tokens were requested.
+    """
+
+    class FenceStubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with server.lock:
+                server.refresh_count += 1
+            # widen the window in which concurrent callers could stampede
+            time.sleep(0.2)
+            body = json.dumps({"access_token": _make_token(time.time() + 1200)})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FenceStubHandler)
+    server.lock = threading.Lock()
+    server.refresh_count = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_refresh_is_single_flight(fence_stub):
+    """
+    Test that many threads sharing one Gen3Auth only request one access
+    token per expiration window.
+    """
+    endpoint = "http://127.0.0.1:{}".format(fence_stub.server_address[1])
+    auth = Gen3Auth(endpoint, refresh_token={"api_key": "123"})
+
+    def _call(_):
+        request = MagicMock()
+        request.headers = {}
+        auth(request)
+        return request.headers["Authorization"]
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        values = set(pool.map(_call, range(200)))
+    assert fence_stub.refresh_count == 1
+    assert len(values) == 1
+
+    # simulate the token reaching the expiration margin
+    auth._access_token_expiration = time.time()
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        list(pool.map(_call, range(200)))
+    assert fence_stub.refresh_count == 2
+
+
+def test_concurrent_401_only_expires_token_once():
+    auth = Gen3Auth("https://example.com", refresh_token={"api_key": "123"})
+    auth._access_token = "new"
+    auth._expire_access_token("Bearer old")
+    assert auth._access_token == "new"
+    auth._expire_access_token("Bearer new")
+    assert auth._access_token is None
+
+
+def test_token_cache_file_shared_between_instances(tmp_path):
+    """
+    Test that a second Gen3Auth (like one in another process) reads the access
+    token from the token cache file instead of requesting a new one.
+    """
+    cache_file = str(tmp_path / "token_cache.json")
+    refresh_token = {"api_key": "123", "key_id": "abc"}
+    first = Gen3Auth(
+        "https://example.com", refresh_token=refresh_token, token_cache_file=cache_file
+    )
+    second = Gen3Auth(
+        "https://example.com", refresh_token=refresh_token, token_cache_file=cache_file
+    )
+    access_token = _make_token(time.time() + 1200)
+
+    with patch("gen3.auth.requests") as mock_request:
+        mock_request.post().json.return_value = {"access_token": access_token}
+        mock_request.post.reset_mock()
+
+        first(MagicMock())
+        second(MagicMock())
+        assert mock_request.post.call_count == 1
+        assert second._access_token == access_token
+
+        with open(cache_file) as cache:
+            tokens = json.load(cache)
+        assert tokens == {"https://example.com|abc": access_token}
+        assert "123" not in json.dumps(tokens)
+
+        # a rejected token is removed from the cache for every process
+        second._expire_access_token("Bearer " + access_token)
+        with open(cache_file) as cache:
+            assert json.load(cache) == {}
+
+        mock_request.post().json.return_value = {
+            "access_token": _make_token(time.time() + 1200)
+        }
+        mock_request.post.reset_mock()
+        second(MagicMock())
+        assert mock_request.post.call_count == 1
@@ -0,0 +1,143 @@
+import time
+
+import pytest
+import requests
+
+from gen3.index import DEFAULT_CACHE_TTL, Gen3Index
+from tests.indexd_stub import IndexdStub
+
+
+@pytest.fixture
+def indexd_stub():
+    records = [
+        {
+            "did": f"dg.TEST/{i:04d}",
+            "hashes": {"md5": f"{i:032d}"},
+            "size": i,
+            "urls": [f"s3://bucket/{i}.txt"],
+        }
+        for i in range(25)
+    ]
+    with IndexdStub(records) as stub:
+        yield stub
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_iter_all_records(indexd_stub, prefetch):
+    """
+    Test that iterating over all records follows the start cursor and returns
+    every record exactly once.
+    """
+    index = Gen3Index(indexd_stub.url)
+
+    dids = [rec["did"] for rec in index.iter_all_records(limit=10, prefetch=prefetch)]
+    assert dids == [f"dg.TEST/{i:04d}" for i in range(25)]
+    # the last page is shorter than the limit so no empty page is requested
+    assert indexd_stub.count_requests("GET", "/index") == 3
+
+    pages = list(index.iter_all_records(limit=5, yield_pages=True, prefetch=prefetch))
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 5]
+
+    dids = [rec["did"] for rec in index.iter_all_records(start="dg.TEST/0019")]
+    assert dids == [f"dg.TEST/{i:04d}" for i in range(20, 25)]
+
+
+def test_get_all_records(indexd_stub):
+    index = Gen3Index(indexd_stub.url)
+    assert len(index.get_all_records(limit=10, paginate=True)) == 25
+    assert len(index.get_all_records(limit=10)) == 10
+
+
+def test_get_records_in_batches(indexd_stub):
+    """
+    Test that bulk lookups are split into batches and merged back in the order
+    of the requested dids, with missing dids reported separately.
+    """
+    index = Gen3Index(indexd_stub.url)
+    dids = [f"dg.TEST/{i:04d}" for i in reversed(range(25))]
+    dids.insert(10, "dg.TEST/missing")
+
+    records, missing = index.get_records(
+        dids, batch_size=7, max_concurrent_requests=3, return_missing=True
+    )
+    assert [rec["did"] for rec in records] == [
+        did for did in dids if did != "dg.TEST/missing"
+    ]
+    assert missing == ["dg.TEST/missing"]
+    assert indexd_stub.count_requests("POST", "/bulk/documents") == 4
+
+    # like the single bulk request it replaced, None if no did is found
+    assert index.get_records(["dg.TEST/missing"]) is None
+    assert index.get_records(["dg.TEST/missing"], return_missing=True) == (
+        [],
+        ["dg.TEST/missing"],
+    )
+
+    batches = list(index.iter_records(iter(dids), batch_size=10))
+    assert [len(batch) for batch, _ in batches] == [10, 9, 6]
+    assert [missing for _, missing in batches] == [[], ["dg.TEST/missing"], []]
+
+
+def test_read_timeouts_retried(indexd_stub, monkeypatch):
+    """
+    Test that requests through the pooled session are retried on read timeouts,
+    like the requests of indexclient.
+    """
+    index = Gen3Index(indexd_stub.url)
+    session_request = index.client.session.request
+    timeouts = [requests.exceptions.ReadTimeout()] * 2
+
+    def request(*args, **kwargs):
+        if timeouts:
+            raise timeouts.pop()
+        return session_request(*args, **kwargs)
+
+    monkeypatch.setattr(index.client.session, "request", request)
+    assert index.get_record("dg.TEST/0001")["size"] == 1
+    assert indexd_stub.count_requests("GET", "/index/dg.TEST/0001") == 1
+
+
+def test_record_cache(indexd_stub, monkeypatch):
+    """
+    Test that cached reads don't hit indexd again until they're invalidated by a
+    write through the same client, evicted or expired.
+    """
+    index = Gen3Index(indexd_stub.url, ("admin", "admin"), cache_size=3)
+    assert Gen3Index(indexd_stub.url).cache_info() is None
+
+    rec = index.get_record("dg.TEST/0001")
+    rec["size"] = 1000
+    assert index.get_record("dg.TEST/0001")["size"] == 1
+    assert index.get("dg.TEST/0001")["did"] == "dg.TEST/0001"
+    assert index.get("dg.TEST/0001")["did"] == "dg.TEST/0001"
+    assert indexd_stub.count_requests("GET", "/index/dg.TEST/0001") == 1
+    assert indexd_stub.count_requests("GET", "/dg.TEST/0001") == 1
+    assert index.cache_info() == (2, 2, 3, 2)
+
+    # missing records are not cached
+    assert index.get_record("dg.TEST/missing") is None
+    assert index.get_record("dg.TEST/missing") is None
+    assert indexd_stub.count_requests("GET", "/index/dg.TEST/missing") == 2
+
+    index.update_record("dg.TEST/0001", file_name="one.txt")
+    assert index.get_record("dg.TEST/0001")["file_name"] == "one.txt"
+    assert index.get("dg.TEST/0001")["file_name"] == "one.txt"
+
+    index.delete_record("dg.TEST/0001")
+    assert index.get_record("dg.TEST/0001") is None
+
+    # least recently used records are evicted first
+    for i in [2, 3, 4, 2, 5]:
+        index.get_record(f"dg.TEST/{i:04d}")
+    assert index.cache_info().currsize == 3
+    requests_before = len(indexd_stub.requests)
+    index.get_record("dg.TEST/0002")
+    assert len(indexd_stub.requests) == requests_before
+    index.get_record("dg.TEST/0003")
+    assert len(indexd_stub.requests) == requests_before + 1
+
+    # expired records are requested again
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + DEFAULT_CACHE_TTL + 1)
+    index.get_record("dg.TEST/0002")
+    assert len(indexd_stub.requests) == requests_before + 2
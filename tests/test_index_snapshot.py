@@ -0,0 +1,108 @@
+import pytest
+
+from gen3.index import Gen3Index
+from gen3.tools.indexing.index_snapshot import IndexSnapshot
+from tests.indexd_stub import IndexdStub
+
+
+@pytest.fixture
+def indexd_stub():
+    records = [
+        {
+            "did": f"dg.TEST/{i:04d}",
+            "hashes": {"md5": f"{i % 5:032d}"},
+            "size": i % 5,
+            "urls": [f"s3://bucket/{i}.txt", f"gs://bucket/{i}.txt"],
+            "file_name": f"{i}.txt",
+        }
+        for i in range(25)
+    ]
+    with IndexdStub(records) as stub:
+        yield stub
+
+
+def test_snapshot_sync_and_lookups(indexd_stub, tmp_path):
+    """
+    Test that a synced snapshot answers lookups offline and that syncing again
+    only picks up what changed in indexd.
+    """
+    index = Gen3Index(indexd_stub.url)
+    filename = str(tmp_path / "snapshot.db")
+
+    with IndexSnapshot(filename) as snapshot:
+        counts = snapshot.sync(index, page_size=10)
+        assert counts == {"added": 25, "updated": 0, "unchanged": 0, "deleted": 0}
+        assert len(snapshot) == 25
+
+    requests_after_sync = len(indexd_stub.requests)
+    with IndexSnapshot(filename) as snapshot:
+        assert snapshot.get_record("dg.TEST/0003")["size"] == 3
+        assert snapshot.get_record("dg.TEST/missing") is None
+        assert [rec["did"] for rec in snapshot.get_by_md5(f"{2:032d}", 2)] == [
+            "dg.TEST/0002",
+            "dg.TEST/0007",
+            "dg.TEST/0012",
+            "dg.TEST/0017",
+            "dg.TEST/0022",
+        ]
+        assert snapshot.get_by_md5(f"{2:032d}", 3) == []
+        assert [rec["did"] for rec in snapshot.get_by_url("gs://bucket/9.txt")] == [
+            "dg.TEST/0009"
+        ]
+        assert [rec["did"] for rec in snapshot.get_by_file_name("11.txt")] == [
+            "dg.TEST/0011"
+        ]
+        records, missing = snapshot.get_records(
+            ["dg.TEST/0020", "dg.TEST/x", "dg.TEST/0001"], return_missing=True
+        )
+        assert [rec["did"] for rec in records] == ["dg.TEST/0020", "dg.TEST/0001"]
+        assert missing == ["dg.TEST/x"]
+    assert len(indexd_stub.requests) == requests_after_sync
+
+    indexd_stub.records["dg.TEST/0004"].update(
+        rev="changed",
+        urls=["s3://other/4.txt"],
+        updated_date="2021-01-01T00:00:00.000000",
+    )
+    del indexd_stub.records["dg.TEST/0005"]
+    indexd_stub.add_record({"did": "dg.TEST/9999", "file_name": "new.txt"})
+
+    with IndexSnapshot(filename) as snapshot:
+        counts = snapshot.sync(index, page_size=10)
+        assert counts == {"added": 1, "updated": 1, "unchanged": 23, "deleted": 1}
+        assert len(snapshot) == 25
+        assert snapshot.get_record("dg.TEST/0005") is None
+        assert snapshot.get_by_url("s3://bucket/4.txt") == []
+        assert snapshot.get_by_url("s3://other/4.txt")[0]["did"] == "dg.TEST/0004"
+        assert [
+            rec["did"] for rec in snapshot.get_updated_since("2020-06-01T00:00:00")
+        ] == ["dg.TEST/0004"]
+
+
+def test_snapshot_sync_resumes(indexd_stub, tmp_path):
+    """
+    Test that an interrupted sync resumes from its last cursor instead of
+    walking indexd from the beginning again.
+    """
+    index = Gen3Index(indexd_stub.url)
+    filename = str(tmp_path / "snapshot.db")
+
+    class InterruptedIndex:
+        def iter_all_records(self, **kwargs):
+            for page_number, page in enumerate(index.iter_all_records(**kwargs)):
+                if page_number == 2:
+                    raise KeyboardInterrupt()
+                yield page
+
+    with IndexSnapshot(filename) as snapshot:
+        with pytest.raises(KeyboardInterrupt):
+            snapshot.sync(InterruptedIndex(), page_size=5)
+        assert len(snapshot) == 10
+
+    indexd_stub.requests.clear()
+    with IndexSnapshot(filename) as snapshot:
+        counts = snapshot.sync(index, page_size=5)
+        assert counts == {"added": 25, "updated": 0, "unchanged": 0, "deleted": 0}
+        assert len(snapshot) == 25
+    # 3 pages for the 15 remaining records, then an empty page ends the walk
+    assert indexd_stub.count_requests("GET", "/index") == 4
@@ -0,0 +1,129 @@
+import hashlib
+import os
+
+from gen3.tools.indexing import verify_local_files
+from gen3.tools.indexing import local_files
+
+
+def _write_manifest(manifest_file, rows):
+    with open(manifest_file, "w") as file:
+        file.write("guid,file_name,file_size,md5\n")
+        for row in rows:
+            file.write(",".join(str(value) for value in row) + "\n")
+
+
+def test_verify_local_files(monkeypatch, tmp_path):
+    """
+    Test that local files are checked against the size and md5 of their rows,
+    that files of the wrong size aren't hashed and that hashes are cached.
+    """
+    monkeypatch.setattr(local_files, "HASH_BUFFER_SIZE", 7)
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    contents = {f"{i}.txt": f"file number {i}\n".encode() * i for i in range(1, 9)}
+    for name, content in contents.items():
+        (data_directory / name).write_bytes(content)
+
+    def _row(i, guid=True):
+        content = contents[f"{i}.txt"]
+        return [
+            f"dg.TEST/{i}" if guid else "",
+            f"{i}.txt",
+            len(content),
+            hashlib.md5(content).hexdigest(),
+        ]
+
+    rows = [_row(i) for i in range(1, 9)]
+    rows[2][3] = "f" * 32
+    rows[4][2] = 1
+    rows[5] = _row(6, guid=False)
+    rows[5][3] = "0" * 32
+    rows.append(["dg.TEST/9", "missing.txt", 1, "0" * 32])
+    manifest_file = str(tmp_path / "manifest.csv")
+    _write_manifest(manifest_file, rows)
+
+    log_output_filename = str(tmp_path / "errors.log")
+    report_filename = str(tmp_path / "report.jsonl")
+    hash_cache_filename = str(tmp_path / "cache.db")
+    summary = verify_local_files(
+        manifest_file,
+        data_directory=str(data_directory),
+        num_processes=2,
+        log_output_filename=log_output_filename,
+        report_filename=report_filename,
+        hash_cache_filename=hash_cache_filename,
+    )
+
+    assert summary["rows_with_errors"] == 4
+    assert summary["errors"] == {"file_size": 1, "md5": 2, "no_file": 1}
+    # the file of the wrong size isn't hashed
+    assert summary["hashed"] == 7
+    assert summary["cached"] == 0
+    with open(log_output_filename) as file:
+        lines = file.read().splitlines()
+    assert lines[:3] == [
+        f"dg.TEST/3|md5|expected {'f' * 32}|actual {_row(3)[3]}",
+        f"dg.TEST/5|file_size|expected 1|actual {len(contents['5.txt'])}",
+        f"row:6|md5|expected {'0' * 32}|actual {_row(6)[3]}",
+    ]
+    assert lines[3].startswith(
+        f"dg.TEST/9|no_file|expected {data_directory / 'missing.txt'}|actual "
+    )
+    with open(report_filename) as file:
+        assert len(file.readlines()) == 4
+
+    # changed files are hashed again, the others come from the cache
+    (data_directory / "3.txt").write_bytes(b"x" * len(contents["3.txt"]))
+    os.utime(data_directory / "3.txt", ns=(0, 0))
+    summary = verify_local_files(
+        manifest_file,
+        data_directory=str(data_directory),
+        num_processes=2,
+        log_output_filename=log_output_filename,
+        hash_cache_filename=hash_cache_filename,
+    )
+    assert summary["errors"] == {"file_size": 1, "md5": 2, "no_file": 1}
+    assert summary["hashed"] == 1
+    assert summary["cached"] == 6
+
+
+def test_verify_local_files_upper_case_md5(tmp_path):
+    """
+    Test that md5 sums are compared regardless of the case of their hex digits.
+    """
+    content = b"file number 1\n"
+    (tmp_path / "1.txt").write_bytes(content)
+    manifest_file = str(tmp_path / "manifest.csv")
+    md5 = hashlib.md5(content).hexdigest().upper()
+    _write_manifest(manifest_file, [["dg.TEST/1", "1.txt", len(content), md5]])
+
+    for _ in range(2):
+        summary = verify_local_files(
+            manifest_file,
+            data_directory=str(tmp_path),
+            num_processes=1,
+            log_output_filename=str(tmp_path / "errors.log"),
+            hash_cache_filename=str(tmp_path / "cache.db"),
+        )
+        assert summary["errors"] == {}
+    # the second run compared the cached hash
+    assert summary["cached"] == 1
+
+
+def test_hash_cache_commits(monkeypatch, tmp_path):
+    """
+    Test that cached hashes are committed as they're added, not only on close.
+    """
+    monkeypatch.setattr(local_files, "HASH_CACHE_COMMIT_INTERVAL", 2)
+    path = tmp_path / "1.txt"
+    path.write_bytes(b"1")
+    stat = os.stat(path)
+    cache_filename = str(tmp_path / "cache.db")
+
+    cache = local_files._HashCache(cache_filename)
+    cache.set(str(path), stat, "0" * 32)
+    assert local_files._HashCache(cache_filename).get(str(path), stat) is None
+    cache.set(str(path), stat, "1" * 32)
+    # an interrupted run still has the committed hashes
+    assert local_files._HashCache(cache_filename).get(str(path), stat) == "1" * 32
+    cache.close()
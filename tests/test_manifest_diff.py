@@ -0,0 +1,228 @@
+import asyncio
+import csv
+import random
+
+import pytest
+
+from gen3.index import Gen3Index
+from gen3.tools.indexing import download_manifest
+from gen3.tools.indexing import async_download_object_manifest
+from gen3.tools.indexing.manifest_diff import (
+    get_delta_filenames,
+    merge_join_records,
+    read_manifest_records,
+    sort_records_by_guid,
+    verify_object_manifest_offline,
+    write_delta_manifests,
+)
+from gen3.tools.indexing.index_snapshot import IndexSnapshot
+from gen3.tools.indexing.manifest_writers import get_manifest_writer
+from tests.indexd_stub import IndexdStub
+
+
+def _record(i, **fields):
+    record = {
+        "guid": f"dg.TEST/{i:04d}",
+        "urls": [f"s3://bucket/{i}.txt", f"gs://bucket/{i}.txt"],
+        "authz": ["/programs/DEV"],
+        "acl": ["DEV"],
+        "md5": f"{i:032d}",
+        "file_size": i,
+        "file_name": None,
+    }
+    record.update(fields)
+    return record
+
+
+def test_sort_records_by_guid_spills_chunks():
+    records = [_record(i) for i in range(100)]
+    shuffled = list(records)
+    random.shuffle(shuffled)
+
+    assert list(sort_records_by_guid(shuffled, chunk_size=7)) == records
+    assert list(sort_records_by_guid(shuffled, chunk_size=1000)) == records
+    assert list(sort_records_by_guid([], chunk_size=7)) == []
+
+
+def test_merge_join_records():
+    left = [_record(i) for i in [1, 2, 4]]
+    right = [_record(i) for i in [2, 3, 4, 5]]
+    assert [
+        (guid[-1], bool(left), bool(right))
+        for guid, left, right in merge_join_records(left, right)
+    ] == [
+        ("1", True, False),
+        ("2", True, True),
+        ("3", False, True),
+        ("4", True, True),
+        ("5", False, True),
+    ]
+
+
+@pytest.mark.parametrize("extension", [".csv", ".jsonl.gz"])
+def test_write_delta_manifests(tmp_path, extension):
+    """
+    Test that records added, changed and deleted between two manifests are
+    written to the delta manifests, and that reordered lists aren't changes.
+    """
+    previous = [_record(i) for i in range(20)]
+    current = [_record(i) for i in range(2, 22)]
+    current[0]["urls"].reverse()
+    current[1]["acl"] = ["DEV", "test"]
+    current[2]["file_size"] = 1000
+    random.shuffle(current)
+
+    previous_file = str(tmp_path / f"previous{extension}")
+    current_file = str(tmp_path / f"current{extension}")
+    for file_name, records in [(previous_file, previous), (current_file, current)]:
+        with get_manifest_writer(file_name) as writer:
+            writer.write_records(records)
+
+    output_filename = str(tmp_path / f"delta{extension}")
+    counts = write_delta_manifests(
+        previous_file, current_file, output_filename, chunk_size=6
+    )
+    assert counts == {"added": 2, "changed": 2, "deleted": 2}
+
+    filenames = get_delta_filenames(output_filename)
+    assert filenames["added"] == str(tmp_path / f"delta.added{extension}")
+    delta = {
+        change: list(read_manifest_records(filename))
+        for change, filename in filenames.items()
+    }
+    assert [rec["guid"] for rec in delta["added"]] == ["dg.TEST/0020", "dg.TEST/0021"]
+    assert [rec["guid"] for rec in delta["deleted"]] == ["dg.TEST/0000", "dg.TEST/0001"]
+    assert delta["changed"] == [
+        _record(3, acl=["DEV", "test"]),
+        _record(4, file_size=1000),
+    ]
+
+
+def test_write_delta_manifests_from_snapshot(tmp_path):
+    """
+    Test that the records of an IndexSnapshot, keyed by did, are compared by guid
+    with the records of a manifest.
+    """
+    records = [
+        {
+            "did": f"dg.TEST/{i:04d}",
+            "hashes": {"md5": f"{i:032d}"},
+            "size": i,
+            "urls": [f"s3://bucket/{i}.txt", f"gs://bucket/{i}.txt"],
+            "authz": ["/programs/DEV"],
+            "acl": ["DEV"],
+        }
+        for i in range(5)
+    ]
+    current = [_record(i) for i in range(1, 6)]
+    current[0]["file_size"] = 1000
+
+    output_filename = str(tmp_path / "delta.jsonl")
+    with IndexdStub(records) as indexd_stub:
+        with IndexSnapshot(str(tmp_path / "snapshot.db")) as snapshot:
+            snapshot.sync(Gen3Index(indexd_stub.url))
+            counts = write_delta_manifests(snapshot, current, output_filename)
+    assert counts == {"added": 1, "changed": 1, "deleted": 1}
+
+    filenames = get_delta_filenames(output_filename)
+    assert list(read_manifest_records(filenames["changed"])) == [
+        _record(1, file_size=1000)
+    ]
+    assert list(read_manifest_records(filenames["deleted"])) == [_record(0)]
+
+    with pytest.raises(ValueError):
+        write_delta_manifests([{"size": 1}], current, output_filename)
+
+
+def test_download_delta_manifest(monkeypatch, tmp_path):
+    """
+    Test that downloading with a previous manifest writes the delta since then.
+    """
+    records = [
+        {
+            "did": f"dg.TEST/{i:04d}",
+            "hashes": {"md5": f"{i:032d}"},
+            "size": i,
+            "urls": [f"s3://bucket/{i}.txt"],
+            "acl": ["DEV"],
+        }
+        for i in range(12)
+    ]
+    monkeypatch.setattr(download_manifest, "INDEXD_RECORD_PAGE_SIZE", 5)
+    previous_manifest = str(tmp_path / "previous.csv")
+    output_filename = str(tmp_path / "current.csv")
+
+    with IndexdStub(records) as indexd_stub:
+        asyncio.run(
+            async_download_object_manifest(
+                indexd_stub.url, previous_manifest, num_processes=2
+            )
+        )
+
+        del indexd_stub.records["dg.TEST/0003"]
+        indexd_stub.records["dg.TEST/0005"]["acl"] = ["DEV", "test"]
+        indexd_stub.add_record({"did": "dg.TEST/9999", "urls": ["s3://bucket/new"]})
+
+        asyncio.run(
+            async_download_object_manifest(
+                indexd_stub.url,
+                output_filename,
+                num_processes=2,
+                previous_manifest=previous_manifest,
+            )
+        )
+
+    def _read_guids(file_name):
+        with open(file_name) as file:
+            return [row[0] for row in csv.reader(file)][1:]
+
+    assert len(_read_guids(output_filename)) == 12
+    filenames = get_delta_filenames(output_filename)
+    assert _read_guids(filenames["added"]) == ["dg.TEST/9999"]
+    assert _read_guids(filenames["changed"]) == ["dg.TEST/0005"]
+    assert _read_guids(filenames["deleted"]) == ["dg.TEST/0003"]
+
+
+def test_verify_object_manifest_offline(tmp_path):
+    """
+    Test that a manifest verified against a downloaded indexd manifest gets the
+    error lines of verify_manifest, sorted by guid.
+    """
+    indexd_manifest = str(tmp_path / "object-manifest.jsonl")
+    with get_manifest_writer(indexd_manifest) as writer:
+        writer.write_records(_record(i) for i in range(20))
+
+    manifest_file = str(tmp_path / "expected.csv")
+    rows = list(range(21)) + [7]
+    random.shuffle(rows)
+    with open(manifest_file, "w", newline="") as file:
+        csv_writer = csv.writer(file)
+        csv_writer.writerow(["guid", "authz", "acl", "file_size", "md5", "urls"])
+        for i in rows:
+            record = _record(i)
+            csv_writer.writerow(
+                [
+                    record["guid"],
+                    "/programs/DEV",
+                    "DEV test" if i == 7 else "DEV",
+                    record["file_size"],
+                    "f" * 32 if i == 5 else record["md5"],
+                    " ".join(reversed(record["urls"])),
+                ]
+            )
+
+    log_output_filename = str(tmp_path / "errors.log")
+    counts = verify_object_manifest_offline(
+        manifest_file, indexd_manifest, log_output_filename, chunk_size=4
+    )
+
+    assert counts == {"md5": 1, "acl": 2, "no_record": 1}
+    with open(log_output_filename) as file:
+        lines = file.read().splitlines()
+    assert lines[:3] == [
+        f"dg.TEST/0005|md5|expected {'f' * 32}|actual {5:032d}",
+        "dg.TEST/0007|acl|expected ['DEV', 'test']|actual ['DEV']",
+        "dg.TEST/0007|acl|expected ['DEV', 'test']|actual ['DEV']",
+    ]
+    assert lines[3].startswith("dg.TEST/0020|no_record|expected {")
+    assert len(lines) == 4
@@ -0,0 +1,169 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from gen3.tools.indexing.manifest_writers import (
+    get_manifest_format,
+    get_manifest_record,
+    get_manifest_writer,
+)
+
+RECORDS = [
+    {
+        "did": "dg.TEST/1",
+        "urls": ["s3://bucket/1.txt", "gs://bucket/1.txt"],
+        "authz": ["/programs/DEV"],
+        "acl": ["DEV", "test"],
+        "hashes": {"md5": "a1234567891234567890123456789012"},
+        "size": 123,
+        "file_name": "1.txt",
+    },
+    {
+        "did": "dg.TEST/2",
+        "urls": [],
+        "authz": [],
+        "acl": [],
+        "hashes": {},
+        "size": None,
+        "file_name": None,
+    },
+]
+
+
+@pytest.fixture
+def csv_part_file(tmp_path):
+    """
+    Header-less CSV file like the temporary files of download_manifest.
+    """
+    file_name = str(tmp_path / "part.csv")
+    with open(file_name, "w", encoding="utf8", newline="") as file:
+        csv_writer = csv.writer(file)
+        for record in RECORDS:
+            csv_writer.writerow(
+                [
+                    record["did"],
+                    " ".join(record["urls"]),
+                    " ".join(record["authz"]),
+                    " ".join(record["acl"]),
+                    record["hashes"].get("md5"),
+                    record["size"],
+                    record["file_name"],
+                ]
+            )
+    return file_name
+
+
+@pytest.mark.parametrize(
+    "file_name,expected_format",
+    [
+        ("object-manifest.csv", "csv"),
+        ("object-manifest", "csv"),
+        ("object-manifest.csv.gz", "csv"),
+        ("object-manifest.JSONL.zst", "jsonl"),
+        ("object-manifest.ndjson", "jsonl"),
+        ("object-manifest.parquet", "parquet"),
+    ],
+)
+def test_get_manifest_format(file_name, expected_format):
+    assert get_manifest_format(file_name) == expected_format
+
+
+def test_write_csv_gz(tmp_path, csv_part_file):
+    """
+    Test that compressed CSV manifests have the same content as plain ones.
+    """
+    plain = str(tmp_path / "manifest.csv")
+    compressed = str(tmp_path / "manifest.csv.gz")
+    for file_name in [plain, compressed]:
+        with get_manifest_writer(file_name) as writer:
+            writer.write_csv_file(csv_part_file)
+            writer.write_records(map(get_manifest_record, RECORDS))
+
+    with open(plain, "rb") as file:
+        content = file.read()
+    with gzip.open(compressed, "rb") as file:
+        assert file.read() == content
+
+    rows = list(csv.reader(io.StringIO(content.decode("utf8"))))
+    assert [field.strip() for field in rows[0]] == [
+        "guid",
+        "urls",
+        "authz",
+        "acl",
+        "md5",
+        "file_size",
+        "file_name",
+    ]
+    assert rows[1:3] == rows[3:5]
+    assert rows[1] == [
+        "dg.TEST/1",
+        "s3://bucket/1.txt gs://bucket/1.txt",
+        "/programs/DEV",
+        "DEV test",
+        "a1234567891234567890123456789012",
+        "123",
+        "1.txt",
+    ]
+
+
+def test_write_jsonl(tmp_path, csv_part_file):
+    """
+    Test that JSON Lines manifests keep lists as arrays and empty values as null,
+    whether the records come from a CSV file or from indexd.
+    """
+    file_name = str(tmp_path / "manifest.jsonl.gz")
+    with get_manifest_writer(file_name) as writer:
+        writer.write_csv_file(csv_part_file)
+        writer.write_records(map(get_manifest_record, RECORDS))
+
+    with gzip.open(file_name, "rt") as file:
+        records = [json.loads(line) for line in file]
+    assert records[:2] == records[2:]
+    assert records[0] == {
+        "guid": "dg.TEST/1",
+        "urls": ["s3://bucket/1.txt", "gs://bucket/1.txt"],
+        "authz": ["/programs/DEV"],
+        "acl": ["DEV", "test"],
+        "md5": "a1234567891234567890123456789012",
+        "file_size": 123,
+        "file_name": "1.txt",
+    }
+    assert records[1] == {
+        "guid": "dg.TEST/2",
+        "urls": [],
+        "authz": [],
+        "acl": [],
+        "md5": None,
+        "file_size": None,
+        "file_name": None,
+    }
+
+
+def test_write_parquet(tmp_path, csv_part_file):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+
+    file_name = str(tmp_path / "manifest.parquet")
+    with get_manifest_writer(file_name) as writer:
+        writer.write_csv_file(csv_part_file)
+
+    table = pyarrow_parquet.read_table(file_name)
+    assert table.column("urls").to_pylist() == [
+        ["s3://bucket/1.txt", "gs://bucket/1.txt"],
+        [],
+    ]
+    assert table.column("file_size").to_pylist() == [123, None]
+
+
+def test_write_zstd(tmp_path, csv_part_file):
+    zstandard = pytest.importorskip("zstandard")
+
+    file_name = str(tmp_path / "manifest.csv.zst")
+    with get_manifest_writer(file_name) as writer:
+        writer.write_csv_file(csv_part_file)
+
+    with open(file_name, "rb") as file:
+        content = zstandard.ZstdDecompressor().stream_reader(file).read()
+    assert content.decode("utf8").startswith("guid, urls")
@@ -1,21 +1,41 @@
 import asyncio
+import csv
 import os
 import glob
+import gzip
+import json
 import sys
 import shutil
 import logging
+import uuid
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from gen3.tools.indexing import verify_object_manifest
 from gen3.tools.indexing import download_manifest
+from gen3.tools.indexing import verify_manifest
+from gen3.tools.indexing.verify_manifest import manifest_row_parsers
 from gen3.tools.indexing.download_manifest import _get_records_and_write_to_file
-from gen3.tools.indexing.download_manifest import TMP_FOLDER
 from gen3.tools.indexing import async_download_object_manifest
+from gen3.tools.indexing import index_object_manifest
+from tests.indexd_stub import IndexdStub
 
 
 CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
 
 
+@pytest.fixture
+def tmp_folder(monkeypatch, tmp_path):
+    """
+    Keep the temporary files of manifest downloads out of the package, and away
+    from the downloads of other tests.
+    """
+    folder = str(tmp_path / "tmp") + "/"
+    monkeypatch.setattr(download_manifest, "TMP_FOLDER", folder)
+    return folder
+
+
 @patch("gen3.tools.indexing.verify_manifest.Gen3Index")
 def test_verify_manifest(mock_index):
     """
@@ -24,7 +44,7 @@ def test_verify_manifest(mock_index):
 
     NOTE: records in indexd are mocked
     """
-    mock_index.return_value.get_record.side_effect = _mock_get_guid
+    mock_index.return_value.get_records.side_effect = _mock_get_records
     verify_object_manifest(
         "http://localhost",
         CURRENT_DIR + "/test_manifest.csv",
@@ -72,7 +92,234 @@ def test_verify_manifest(mock_index):
     assert "no_record" in logs["dg.TEST/9c205cd7-c399-4503-9f49-5647188bde66"]
 
 
-def test_download_manifest(monkeypatch, gen3_index):
+def test_verify_manifest_batched(tmp_path):
+    """
+    Test that verify manifest fetches the records of a batch of rows with one
+    bulk request and still reports the errors of every row.
+    """
+    records = [
+        {
+            "did": f"dg.TEST/{i:02d}",
+            "hashes": {"md5": f"{i:032d}"},
+            "size": i,
+            "urls": [f"s3://bucket/{i}.txt"],
+            "authz": ["/programs/DEV"],
+            "acl": ["DEV"],
+        }
+        for i in range(11)
+    ]
+    manifest_file = str(tmp_path / "manifest.csv")
+    with open(manifest_file, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["guid", "authz", "acl", "file_size", "md5", "urls"])
+        for i in range(12):
+            md5 = f"{i:032d}" if i != 3 else "f" * 32
+            url = f"s3://bucket/{i}.txt"
+            writer.writerow([f"dg.TEST/{i:02d}", "/programs/DEV", "DEV", i, md5, url])
+
+    log_output_filename = str(tmp_path / "errors.log")
+    with IndexdStub(records) as indexd_stub:
+        verify_object_manifest(
+            indexd_stub.url,
+            manifest_file,
+            num_processes=1,
+            log_output_filename=log_output_filename,
+            batch_size=5,
+        )
+        assert indexd_stub.count_requests("POST", "/bulk/documents") == 3
+        assert indexd_stub.count_requests("GET", "/index/dg.TEST/00") == 0
+
+    with open(log_output_filename) as file:
+        errors = sorted(line.split("|")[:2] for line in file)
+    assert errors == [["dg.TEST/03", "md5"], ["dg.TEST/11", "no_record"]]
+
+
+def _get_md5_or_fail(row):
+    if row["guid"] == "dg.TEST/05":
+        raise ValueError("unparseable row")
+    return row["md5"]
+
+
+def test_verify_manifest_process_fails(tmp_path):
+    """
+    Test that verify manifest fails instead of reporting the rows of a batch that
+    a process could not verify as verified.
+    """
+    records = [
+        {
+            "did": f"dg.TEST/{i:02d}",
+            "hashes": {"md5": f"{i:032d}"},
+            "size": i,
+            "urls": [f"s3://bucket/{i}.txt"],
+            "authz": ["/programs/DEV"],
+            "acl": ["DEV"],
+        }
+        for i in range(10)
+    ]
+    manifest_file = str(tmp_path / "manifest.csv")
+    with open(manifest_file, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["guid", "authz", "acl", "file_size", "md5", "urls"])
+        for i in range(10):
+            url = f"s3://bucket/{i}.txt"
+            writer.writerow(
+                [f"dg.TEST/{i:02d}", "/programs/DEV", "", i, f"{i:032d}", url]
+            )
+
+    row_parsers = dict(manifest_row_parsers, md5=_get_md5_or_fail)
+    with IndexdStub(records) as indexd_stub:
+        with pytest.raises(RuntimeError, match="2 of 10 rows were not verified"):
+            verify_object_manifest(
+                indexd_stub.url,
+                manifest_file,
+                num_processes=2,
+                manifest_row_parsers=row_parsers,
+                log_output_filename=str(tmp_path / "errors.log"),
+                batch_size=2,
+            )
+
+
+@pytest.mark.parametrize("report_extension", [".jsonl", ".csv", ".csv.gz"])
+def test_verify_manifest_report(tmp_path, report_extension):
+    """
+    Test that verify manifest writes its errors in the order of the manifest to a
+    structured report with a summary, and that sample mode only verifies part of
+    the rows and estimates the error rate.
+    """
+    records = [
+        {
+            "did": f"dg.TEST/{i:02d}",
+            "hashes": {"md5": f"{i:032d}"},
+            "size": i,
+            "urls": [f"s3://bucket/{i}.txt"],
+            "authz": [f"/programs/{i % 2}"],
+            "acl": ["DEV"],
+        }
+        for i in range(40)
+    ]
+    manifest_file = str(tmp_path / "manifest.csv")
+    with open(manifest_file, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["guid", "authz", "acl", "file_size", "md5", "urls"])
+        for i in reversed(range(40)):
+            size = i + 1 if i % 10 == 0 else i
+            url = f"s3://bucket/{i}.txt"
+            writer.writerow(
+                [f"dg.TEST/{i:02d}", f"/programs/{i % 2}", "", size, f"{i:032d}", url]
+            )
+
+    log_output_filename = str(tmp_path / "errors.log")
+    report_filename = str(tmp_path / f"report{report_extension}")
+    with IndexdStub(records) as indexd_stub:
+        summary = verify_object_manifest(
+            indexd_stub.url,
+            manifest_file,
+            num_processes=3,
+            log_output_filename=log_output_filename,
+            batch_size=4,
+            report_filename=report_filename,
+        )
+        assert summary == {
+            "manifest_rows": 40,
+            "verified_rows": 40,
+            "rows_with_errors": 40,
+            "error_rate": 1.0,
+            "errors": {"acl": 40, "file_size": 4},
+        }
+        with open(report_filename + ".summary.json") as file:
+            assert json.load(file) == summary
+
+        with open(log_output_filename) as file:
+            lines = file.read().splitlines()
+        assert lines[:3] == [
+            "dg.TEST/39|acl|expected []|actual ['DEV']",
+            "dg.TEST/38|acl|expected []|actual ['DEV']",
+            "dg.TEST/37|acl|expected []|actual ['DEV']",
+        ]
+        assert lines[-2:] == [
+            "dg.TEST/00|acl|expected []|actual ['DEV']",
+            "dg.TEST/00|file_size|expected 1|actual 0",
+        ]
+
+        opener = gzip.open if report_extension.endswith(".gz") else open
+        with opener(report_filename, "rt", newline="") as file:
+            if report_extension == ".jsonl":
+                report = [json.loads(line) for line in file]
+            else:
+                report = list(csv.DictReader(file))
+        assert len(report) == len(lines)
+        assert report[-1]["row"] in (40, "40")
+        assert report[-1]["guid"] == "dg.TEST/00"
+        assert report[-1]["error"] == "file_size"
+        assert report[-1]["expected"] in (1, "1")
+
+        summary = verify_object_manifest(
+            indexd_stub.url,
+            manifest_file,
+            num_processes=2,
+            log_output_filename=log_output_filename,
+            sample_rate=0.25,
+            sample_stratify_by="authz",
+        )
+    # a quarter of each of the 2 authz values
+    assert summary["verified_rows"] == 10
+    assert summary["sample_rate"] == 0.25
+    assert summary["sampled_fraction"] == 0.25
+    assert summary["confidence"] == 0.95
+    low, high = summary["error_rate_interval"]
+    assert 0.7 < low < 1.0 and high == 1.0
+    assert summary["estimated_rows_with_errors"] == 40
+
+
+def test_verify_manifest_report_unsupported_format(tmp_path):
+    """
+    Test that verify manifest refuses a report format it can't write before
+    verifying anything.
+    """
+    manifest_file = str(tmp_path / "manifest.csv")
+    with open(manifest_file, "w", newline="") as file:
+        file.write("guid,authz,acl,file_size,md5,urls\n")
+
+    with pytest.raises(ValueError):
+        verify_object_manifest(
+            "http://localhost",
+            manifest_file,
+            log_output_filename=str(tmp_path / "errors.log"),
+            report_filename=str(tmp_path / "report.parquet"),
+        )
+    assert not os.path.exists(tmp_path / "errors.log")
+
+
+def test_verify_manifest_random_sample():
+    """
+    Test that random samples are reproducible with the same seed and close to the
+    sample rate.
+    """
+    rows = [{"guid": f"dg.TEST/{i}"} for i in range(2000)]
+
+    def sample(seed):
+        sampler = verify_manifest._RowSampler(0.1, manifest_row_parsers, seed=seed)
+        return [i for i, row in enumerate(rows) if sampler.is_sampled(i, row)]
+
+    assert sample(1) == sample(1)
+    assert sample(1) != sample(2)
+    assert 150 < len(sample(1)) < 250
+    with pytest.raises(ValueError):
+        verify_manifest._RowSampler(0, manifest_row_parsers)
+
+    # small strata aren't over-represented
+    rows = [
+        {"guid": f"dg.TEST/{i}", "authz": f"/programs/{i // 2}"} for i in range(1000)
+    ]
+    sampler = verify_manifest._RowSampler(0.05, manifest_row_parsers, "authz")
+    sampled = [i for i, row in enumerate(rows) if sampler.is_sampled(i, row)]
+    assert 30 < len(sampled) < 70
+
+    low, high = verify_manifest._get_wilson_interval(10, 100)
+    assert round(low, 4) == 0.0552 and round(high, 4) == 0.1744
+
+
+def test_download_manifest(monkeypatch, gen3_index, tmp_folder):
     """
     Test that dowload manifest generates a file with expected content.
     """
@@ -175,6 +422,278 @@ def test_download_manifest(monkeypatch, gen3_index):
     ).get("file_name")
 
 
+@pytest.mark.parametrize("num_did_ranges", [1, 7, 40])
+def test_download_manifest_did_ranges(
+    monkeypatch, tmp_path, num_did_ranges, tmp_folder
+):
+    """
+    Test that scanning did ranges with start cursors downloads every record
+    exactly once, including dids that don't share the common prefix.
+    """
+    dids = [f"dg.TEST/{uuid.uuid4()}" for _ in range(60)]
+    dids += [str(uuid.uuid4()) for _ in range(5)] + ["zz.OTHER/1"]
+    records = _get_stub_records(dids)
+    monkeypatch.setattr(download_manifest, "INDEXD_RECORD_PAGE_SIZE", 4)
+    output_filename = str(tmp_path / "object-manifest.csv")
+
+    with IndexdStub(records) as indexd_stub:
+        asyncio.run(
+            async_download_object_manifest(
+                indexd_stub.url,
+                output_filename=output_filename,
+                num_did_ranges=num_did_ranges,
+            )
+        )
+
+    with open(output_filename) as file:
+        guids = [row[0] for row in csv.reader(file)][1:]
+    assert sorted(guids) == sorted(dids)
+
+
+def test_download_manifest_pages_retried(monkeypatch, tmp_path, tmp_folder):
+    """
+    Test that the process pool downloads every record exactly once, even when
+    some requests fail and their page ranges have to be retried.
+    """
+    dids = sorted(f"dg.TEST/{uuid.uuid4()}" for _ in range(50))
+    records = _get_stub_records(dids)
+    monkeypatch.setattr(download_manifest, "INDEXD_RECORD_PAGE_SIZE", 3)
+    output_filename = str(tmp_path / "object-manifest.csv")
+
+    with IndexdStub(records) as indexd_stub:
+        indexd_stub.fail_requests[("GET", "/index")] = 5
+        asyncio.run(
+            async_download_object_manifest(
+                indexd_stub.url, output_filename=output_filename, num_processes=2
+            )
+        )
+        assert indexd_stub.fail_requests[("GET", "/index")] == 0
+
+    with open(output_filename) as file:
+        guids = [row[0] for row in csv.reader(file)][1:]
+    assert sorted(guids) == dids
+
+
+def test_download_manifest_adaptive_concurrency(monkeypatch, tmp_path, tmp_folder):
+    """
+    Test that the processes share an adaptive limiter that backs off when indexd
+    fails, and that the download still gets every record.
+    """
+    dids = sorted(f"dg.TEST/{uuid.uuid4()}" for _ in range(50))
+    records = _get_stub_records(dids)
+    monkeypatch.setattr(download_manifest, "INDEXD_RECORD_PAGE_SIZE", 3)
+    output_filename = str(tmp_path / "object-manifest.csv")
+
+    with IndexdStub(records) as indexd_stub:
+        indexd_stub.fail_requests[("GET", "/index")] = 2
+        limit = asyncio.run(
+            async_download_object_manifest(
+                indexd_stub.url,
+                output_filename=output_filename,
+                num_processes=2,
+                max_concurrent_requests=8,
+                adaptive_concurrency=True,
+            )
+        )
+        assert indexd_stub.fail_requests[("GET", "/index")] == 0
+
+    # halved once for the failures, then grown a little by the successful pages
+    assert 4 <= limit < 8
+    with open(output_filename) as file:
+        guids = [row[0] for row in csv.reader(file)][1:]
+    assert sorted(guids) == dids
+
+
+def test_download_manifest_writer_backpressure(monkeypatch, tmp_path):
+    """
+    Test that the writer writes every row in buffered chunks, and that pages
+    wait for the writer once the queue is full.
+    """
+    monkeypatch.setattr(download_manifest, "WRITE_BUFFER_SIZE", 200)
+    file_name = str(tmp_path / "pages.csv")
+    pages = [
+        [
+            {
+                "did": f"dg.TEST/{page}-{i}",
+                "hashes": {"md5": "a1234567891234567890123456789012"},
+                "size": i,
+                "urls": ["s3://testaws/aws/test.txt"],
+                "authz": [],
+                "acl": ["*"],
+            }
+            for i in range(3)
+        ]
+        for page in range(10)
+    ]
+
+    async def main():
+        queue = asyncio.Queue(maxsize=2)
+        for page in pages[:2]:
+            queue.put_nowait(page)
+        assert queue.full()
+
+        writer = asyncio.ensure_future(
+            download_manifest._parse_from_queue(queue, file_name)
+        )
+        for page in pages[2:]:
+            await queue.put(page)
+        await queue.put("DONE")
+        return await writer
+
+    assert asyncio.run(main()) == 30
+    with open(file_name, newline="") as file:
+        rows = list(csv.reader(file))
+    assert [row[0] for row in rows] == [
+        record["did"] for page in pages for record in page
+    ]
+    assert rows[0] == [
+        "dg.TEST/0-0",
+        "s3://testaws/aws/test.txt",
+        "",
+        "*",
+        "a1234567891234567890123456789012",
+        "0",
+        "",
+    ]
+
+
+def test_download_manifest_writer_fails(monkeypatch, tmp_path):
+    """
+    Test that a failing writer stops the page requests and raises its error
+    instead of leaving them blocked on the full queue.
+    """
+    records = [
+        {"did": f"dg.TEST/{i:02d}", "urls": [], "authz": [], "acl": []}
+        for i in range(30)
+    ]
+    monkeypatch.setattr(download_manifest, "INDEXD_RECORD_PAGE_SIZE", 3)
+    monkeypatch.setattr(download_manifest, "WRITE_QUEUE_SIZE", 1)
+
+    def _fail(records):
+        raise TypeError("can't format records")
+
+    monkeypatch.setattr(download_manifest, "_format_manifest_rows", _fail)
+
+    with IndexdStub(records) as indexd_stub:
+        with pytest.raises(TypeError, match="can't format records"):
+            asyncio.run(
+                asyncio.wait_for(
+                    _get_records_and_write_to_file(
+                        indexd_stub.url,
+                        range(10),
+                        1,
+                        4,
+                        output_filename=str(tmp_path / "pages.csv"),
+                    ),
+                    timeout=30,
+                )
+            )
+
+
+def test_download_manifest_jsonl(tmp_path, tmp_folder):
+    """
+    Test that the manifest is written as JSON Lines when the output filename has
+    a .jsonl extension.
+    """
+    records = [
+        {
+            "did": f"dg.TEST/{i}",
+            "hashes": {"md5": "a1234567891234567890123456789012"},
+            "size": i,
+            "urls": [f"s3://testaws/aws/{i}.txt", f"gs://test/{i}.txt"],
+            "acl": ["DEV", "test"],
+        }
+        for i in range(10)
+    ]
+    output_filename = str(tmp_path / "object-manifest.jsonl.gz")
+
+    with IndexdStub(records) as indexd_stub:
+        asyncio.run(
+            async_download_object_manifest(
+                indexd_stub.url, output_filename=output_filename, num_did_ranges=2
+            )
+        )
+
+    with gzip.open(output_filename, "rt") as file:
+        rows = sorted((json.loads(line) for line in file), key=lambda row: row["guid"])
+    assert [row["file_size"] for row in rows] == list(range(10))
+    assert rows[3]["urls"] == ["s3://testaws/aws/3.txt", "gs://test/3.txt"]
+    assert rows[3]["acl"] == ["DEV", "test"]
+    assert rows[3]["authz"] == []
+
+
+@pytest.mark.parametrize("num_did_ranges", [None, 3])
+def test_download_manifest_resume(monkeypatch, tmp_path, num_did_ranges, tmp_folder):
+    """
+    Test that resuming an interrupted download only requests the records that
+    weren't written yet and still writes every record exactly once.
+    """
+    dids = sorted(f"dg.TEST/{uuid.uuid4()}" for _ in range(40))
+    records = _get_stub_records(dids)
+    monkeypatch.setattr(download_manifest, "INDEXD_RECORD_PAGE_SIZE", 3)
+    output_filename = str(tmp_path / "object-manifest.csv")
+
+    def _download(resume):
+        asyncio.run(
+            async_download_object_manifest(
+                indexd_stub.url,
+                output_filename=output_filename,
+                num_processes=2,
+                num_did_ranges=num_did_ranges,
+                resume=resume,
+            )
+        )
+        with open(output_filename) as file:
+            return [row[0] for row in csv.reader(file)][1:]
+
+    with IndexdStub(records) as indexd_stub:
+        # nothing to resume, downloads everything
+        assert sorted(_download(resume=True)) == dids
+
+        # simulate an interruption
+        if num_did_ranges:
+            # range 0 had written 2 pages after its last checkpoint at 1 page
+            file_name = tmp_folder + "did-range-000000.csv"
+            with open(file_name, newline="") as file:
+                rows = file.readlines()
+            first_page = rows[:3]
+            with open(file_name + ".checkpoint", "w") as file:
+                json.dump(
+                    {
+                        "start": first_page[-1].split(",")[0],
+                        "size": len("".join(first_page)),
+                        "done": False,
+                    },
+                    file,
+                )
+            # the remaining pages of range 0, and maybe an empty last page
+            expected_requests = (len(rows) - 3) // 3 + 1
+        else:
+            # the first page range had not finished
+            os.unlink(tmp_folder + "pages-000000000-000000001.csv")
+            expected_requests = 2
+
+        indexd_stub.requests.clear()
+        assert sorted(_download(resume=True)) == dids
+        assert indexd_stub.count_requests("GET", "/index") == expected_requests
+
+        indexd_stub.requests.clear()
+        assert sorted(_download(resume=False)) == dids
+        assert indexd_stub.count_requests("GET", "/index") > expected_requests
+
+
+def _get_stub_records(dids):
+    return [
+        {
+            "did": did,
+            "hashes": {"md5": "a1234567891234567890123456789012"},
+            "size": 123,
+            "urls": ["s3://testaws/aws/test.txt"],
+        }
+        for did in dids
+    ]
+
+
 def _mock_get_guid(guid, **kwargs):
     if guid == "dg.TEST/f2a39f98-6ae1-48a5-8d48-825a0c52a22b":
         return {
@@ -224,6 +743,10 @@ def _mock_get_guid(guid, **kwargs):
         return None
 
 
+def _mock_get_records(dids, **kwargs):
+    return [record for record in map(_mock_get_guid, dids) if record]
+
+
 def _mock_get_records_on_page(page, limit, **kwargs):
     # for testing, the limit is 2
     if page == 0:
@@ -297,3 +820,125 @@ def _mock_get_records_on_page(page, limit, **kwargs):
         ]
     else:
         return []
+
+
+def test_index_manifest(tmp_path):
+    """
+    Test that indexing a manifest creates missing records, updates records that
+    differ, and that re-running it is idempotent and resumes from its progress log.
+    """
+    records = [
+        {
+            "did": "dg.TEST/f2a39f98-6ae1-48a5-8d48-825a0c52a22b",
+            "hashes": {"md5": "a1234567891234567890123456789012"},
+            "size": 123,
+            "acl": ["DEV"],
+            "authz": ["/programs/DEV/projects/test"],
+            "urls": ["gs://test/test.txt"],
+        },
+        {
+            "did": "dg.TEST/1e9d3103-cbe2-4c39-917c-b3abad4750d2",
+            "hashes": {"md5": "b1234567891234567890123456789012"},
+            "size": 235,
+            "acl": ["DEV"],
+            "authz": ["/programs/DEV/projects/test2"],
+            "urls": ["gs://test/test3.txt"],
+        },
+    ]
+    progress_log = str(tmp_path / "progress.log")
+
+    def _index():
+        return index_object_manifest(
+            stub.url,
+            CURRENT_DIR + "/test_manifest.csv",
+            auth=("admin", "admin"),
+            max_concurrent_requests=2,
+            progress_log_filename=progress_log,
+            batch_size=2,
+        )
+
+    with IndexdStub(records) as stub:
+        assert _index() == {"created": 1, "updated": 1, "error": 1}
+
+        created = stub.records["dg.TEST/9c205cd7-c399-4503-9f49-5647188bde66"]
+        assert created["hashes"] == {"md5": "b1334567891334567890133456789013"}
+        assert created["size"] == 334
+        assert sorted(created["acl"]) == ["DEV", "test3"]
+        updated = stub.records["dg.TEST/f2a39f98-6ae1-48a5-8d48-825a0c52a22b"]
+        assert sorted(updated["acl"]) == ["DEV", "test"]
+        assert sorted(updated["urls"]) == [
+            "gs://test/test.txt",
+            "s3://testaws/aws/test.txt",
+        ]
+        # md5 can't be updated, only reported
+        assert stub.records["dg.TEST/1e9d3103-cbe2-4c39-917c-b3abad4750d2"][
+            "hashes"
+        ] == {"md5": "b1234567891234567890123456789012"}
+
+        # only the failed row is retried
+        assert _index() == {"skipped": 2, "error": 1}
+        assert stub.count_requests("POST", "/index") == 1
+
+        os.unlink(progress_log)
+        assert _index() == {"unchanged": 2, "error": 1}
+        assert stub.count_requests("POST", "/index") == 1
+        assert stub.count_requests("PUT", "/index/" + updated["did"]) == 1
+
+        # errors with multi-line messages, or a truncated line, don't break resuming
+        with open(progress_log, "a") as file:
+            file.write("row:9|error|Failed to authenticate\nbad credentials\n")
+            file.write("truncated line\n")
+        assert _index() == {"skipped": 2, "error": 1}
+
+    with open(progress_log) as file:
+        error_line = file.read().splitlines()[-1]
+    assert error_line.startswith("dg.TEST/1e9d3103-cbe2-4c39-917c-b3abad4750d2|error|")
+
+
+def test_index_manifest_clears_fields_and_orders_duplicates(tmp_path):
+    """
+    Test that indexing a manifest clears the fields its rows leave empty, and that
+    rows with the same guid are applied in order instead of racing to create the
+    record.
+    """
+    records = [
+        {
+            "did": "dg.TEST/00",
+            "hashes": {"md5": "0" * 32},
+            "size": 0,
+            "acl": ["DEV"],
+            "authz": ["/programs/DEV"],
+            "urls": ["s3://bucket/0.txt"],
+        }
+    ]
+    manifest_file = str(tmp_path / "manifest.csv")
+    with open(manifest_file, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["guid", "authz", "acl", "file_size", "md5", "urls"])
+        writer.writerow(
+            ["dg.TEST/00", "/programs/DEV", "", 0, "0" * 32, "s3://bucket/0.txt"]
+        )
+        # the same row twice
+        for _ in range(2):
+            writer.writerow(
+                ["dg.TEST/01", "/programs/DEV", "", 1, "1" * 32, "s3://bucket/1.txt"]
+            )
+    progress_log = str(tmp_path / "progress.log")
+
+    def _index():
+        return index_object_manifest(
+            stub.url,
+            manifest_file,
+            auth=("admin", "admin"),
+            max_concurrent_requests=4,
+            progress_log_filename=progress_log,
+            batch_size=3,
+        )
+
+    with IndexdStub(records) as stub:
+        assert _index() == {"updated": 1, "created": 1, "unchanged": 1}
+        assert stub.records["dg.TEST/00"]["acl"] == []
+        assert stub.count_requests("POST", "/index") == 1
+
+        os.unlink(progress_log)
+        assert _index() == {"unchanged": 3}
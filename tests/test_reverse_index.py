@@ -0,0 +1,93 @@
+import os
+
+from gen3.tools.indexing.manifest_writers import get_manifest_writer
+from gen3.tools.indexing.reverse_index import ReverseIndex
+
+CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_reverse_index_from_records():
+    """
+    Test that every url, md5 and size, and file_name of the records maps back to
+    their GUIDs, including keys shared by several records.
+    """
+    records = [
+        {
+            "did": f"dg.TEST/{i}",
+            "urls": [f"s3://bucket/{i}.txt", f"gs://bucket/{i % 2}.txt"],
+            "hashes": {"md5": f"{i % 3:032d}"},
+            "size": i % 3,
+            "file_name": f"{i}.txt",
+        }
+        for i in range(6)
+    ]
+    reverse_index = ReverseIndex.from_records(iter(records))
+
+    assert reverse_index.record_count == 6
+    assert reverse_index.get_guids_for_url("s3://bucket/4.txt") == ["dg.TEST/4"]
+    assert reverse_index.get_guids_for_url("gs://bucket/1.txt") == [
+        "dg.TEST/1",
+        "dg.TEST/3",
+        "dg.TEST/5",
+    ]
+    assert reverse_index.get_guids_for_md5(f"{2:032d}", "2") == [
+        "dg.TEST/2",
+        "dg.TEST/5",
+    ]
+    assert reverse_index.get_guids_for_md5(f"{2:032d}", 1) == []
+    assert reverse_index.get_guids_for_file_names(["3.txt", "missing.txt"]) == {
+        "3.txt": ["dg.TEST/3"],
+        "missing.txt": [],
+    }
+
+    # adding a record twice doesn't duplicate its GUID
+    reverse_index.add_record(records[1])
+    assert reverse_index.get_guids_for_urls(["s3://bucket/1.txt"]) == {
+        "s3://bucket/1.txt": ["dg.TEST/1"]
+    }
+
+
+def test_reverse_index_from_manifest():
+    reverse_index = ReverseIndex.from_manifest(CURRENT_DIR + "/test_manifest.csv")
+
+    assert reverse_index.get_guids_for_url("s3://testaws/aws/test.txt") == [
+        "dg.TEST/f2a39f98-6ae1-48a5-8d48-825a0c52a22b"
+    ]
+    assert reverse_index.get_guids_for_url("gs://test/test.txt") == [
+        "dg.TEST/f2a39f98-6ae1-48a5-8d48-825a0c52a22b",
+        "dg.TEST/9c205cd7-c399-4503-9f49-5647188bde66",
+    ]
+    assert reverse_index.get_guids_for_md5s(
+        [("c1234567891234567890123456789012", 235)]
+    ) == {
+        ("c1234567891234567890123456789012", 235): [
+            "dg.TEST/1e9d3103-cbe2-4c39-917c-b3abad4750d2"
+        ]
+    }
+
+
+def test_reverse_index_from_compressed_manifest(tmp_path):
+    """
+    Test that a reverse index can be built from the compressed and JSON Lines
+    manifests download_manifest writes.
+    """
+    manifest_file = str(tmp_path / "object-manifest.jsonl.gz")
+    with get_manifest_writer(manifest_file) as writer:
+        writer.write_records(
+            {
+                "guid": f"dg.TEST/{i}",
+                "urls": [f"s3://bucket/{i}.txt"],
+                "authz": [],
+                "acl": [],
+                "md5": f"{i:032d}",
+                "file_size": i,
+                "file_name": f"{i}.txt",
+            }
+            for i in range(3)
+        )
+    reverse_index = ReverseIndex.from_manifest(manifest_file)
+
+    assert reverse_index.record_count == 3
+    assert reverse_index.get_guids_for_url("s3://bucket/2.txt") == ["dg.TEST/2"]
+    assert reverse_index.get_guids_for_md5(f"{1:032d}", 1) == ["dg.TEST/1"]
+    assert reverse_index.get_guids_for_file_name("0.txt") == ["dg.TEST/0"]
@@ -0,0 +1,101 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from gen3.file import Gen3File
+from gen3.index import Gen3Index
+from gen3.session import (
+    AdaptiveConcurrencyLimiter,
+    create_session,
+    get_default_session,
+    set_default_session,
+)
+from gen3.submission import Gen3Submission
+
+
+def test_create_session_pool_settings():
+    session = create_session(pool_connections=3, pool_maxsize=7, pool_block=True)
+    adapter = session.get_adapter("https://example.com")
+    assert adapter._pool_connections == 3
+    assert adapter._pool_maxsize == 7
+    assert adapter._pool_block
+    assert session.get_adapter("http://example.com") is adapter
+
+
+def test_sdk_classes_share_default_session():
+    """
+    Test that SDK classes reuse the same pooled session unless one is provided.
+    """
+    endpoint = "https://example.com"
+    session = get_default_session()
+    assert Gen3Submission(endpoint, None)._session is session
+    assert Gen3File(endpoint, None)._session is session
+    assert Gen3Index(endpoint).client.session is session
+
+    custom_session = create_session()
+    assert Gen3Submission(endpoint, None, session=custom_session)._session is (
+        custom_session
+    )
+    assert Gen3Index(endpoint, session=custom_session).client.session is (
+        custom_session
+    )
+
+    set_default_session(custom_session)
+    try:
+        assert Gen3File(endpoint, None)._session is custom_session
+    finally:
+        set_default_session(session)
+
+
+def test_adaptive_concurrency_limiter():
+    """
+    Test that the limiter caps requests in flight, grows additively on success
+    when the limit is reached, and halves on overload errors at most once per
+    cooldown.
+    """
+    # tolerate any latency so that event loop timings never decrease the limit
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=4, min_limit=1, max_limit=8, latency_tolerance=1000, cooldown=60
+    )
+    in_flight = []
+
+    async def request(error=None):
+        async with limiter.request():
+            in_flight.append(limiter.stats()["in_flight"])
+            await asyncio.sleep(0.001)
+            if error:
+                raise error
+
+    async def main(num_requests):
+        await asyncio.gather(*(request() for _ in range(num_requests)))
+
+    # requests that don't reach the limit don't raise it
+    for _ in range(20):
+        asyncio.run(main(2))
+    assert limiter.limit == 4
+
+    asyncio.run(main(400))
+    assert max(in_flight) <= 8
+    assert in_flight[:4] == [1, 2, 1, 2]
+    assert limiter.limit == 8
+    assert limiter.stats()["successes"] == 440
+
+    overloaded = aiohttp.ClientResponseError(None, (), status=503)
+    for _ in range(3):
+        with pytest.raises(aiohttp.ClientResponseError):
+            asyncio.run(request(overloaded))
+    # only the first failure decreases the limit during the cooldown
+    assert limiter.limit == 4
+    assert limiter.stats()["failures"] == 3
+    assert limiter.stats()["decreases"] == 1
+
+    # client errors don't mean that the service is overloaded
+    not_found = aiohttp.ClientResponseError(None, (), status=404)
+    for _ in range(10):
+        with pytest.raises(aiohttp.ClientResponseError):
+            asyncio.run(request(not_found))
+    assert limiter.stats()["failures"] == 3
+    assert limiter.stats()["successes"] == 440
+    assert limiter.stats()["in_flight"] == 0
+    assert limiter.limit == 4